@@ -0,0 +1,81 @@
+# Merges a board fragment written by `geomgen.cli --fragment` into the open
+# board. Kept free of pcbnew imports: the board, the loader and net creation
+# are passed in, so the merge can run against a stand-in board.
+
+GROUP_NAME = 'CapEncoderGen'
+
+
+def generated_items(board, name=GROUP_NAME):
+    """
+    The groups called `name`, and the zones named `name` that are not in a
+    group (zones created one by one carry only their name).
+    """
+    groups = [g for g in board.Groups() if g.GetName() == name]
+    zones = [z for z in board.Zones() if z.GetZoneName() == name and z.GetParentGroup() is None]
+    return groups, zones
+
+
+def remove_items(board, groups, zones):
+    """Removes `groups` together with their members, and `zones`."""
+    removed = 0
+    for g in groups:
+        for item in list(g.GetItems()):
+            board.Remove(item)
+            removed += 1
+        board.Remove(g)
+    for z in zones:
+        board.Remove(z)
+        removed += 1
+    return removed
+
+
+def fragment_items(fragment):
+    return list(fragment.Zones()) + list(fragment.GetTracks()) + list(fragment.GetDrawings()) + list(fragment.GetFootprints())
+
+
+def merge_fragment(board, path, load_board, new_net, name=GROUP_NAME):
+    """
+    Loads the fragment at `path` with `load_board` and moves its items and
+    its group into `board`, replacing what a previous run left there.
+    Nets are matched by name; `new_net(board, name)` creates missing ones.
+    Returns the number of items moved.
+    """
+    fragment = load_board(path)
+
+    # Found before the new items arrive and removed only once they are all
+    # in, so a failed merge leaves the previous run in place.
+    previous = generated_items(board, name)
+
+    nets = {}
+
+    def net_for(item):
+        net_name = item.GetNetname()
+        if net_name not in nets:
+            net = board.FindNet(net_name)
+            if net is None:
+                net = new_net(board, net_name)
+            nets[net_name] = net
+        return nets[net_name]
+
+    items = fragment_items(fragment)
+    groups = [g for g in fragment.Groups() if g.GetName() == name]
+
+    # Removing an item from a board detaches it from its group, so members
+    # are recorded now and added back once the group is on `board`.
+    members = [(g, list(g.GetItems())) for g in groups]
+
+    for item in items:
+        fragment.Remove(item)
+        board.Add(item)
+        if hasattr(item, 'GetNetname') and item.GetNetname():
+            item.SetNet(net_for(item))
+
+    for g, group_items in members:
+        fragment.Remove(g)
+        board.Add(g)
+        for item in group_items:
+            g.AddItem(item)
+
+    remove_items(board, *previous)
+
+    return len(items)
@@ -1,5 +1,7 @@
 import os
-import sys
+import json
+import signal
+import threading
 import subprocess
 
 
@@ -8,26 +10,82 @@ from .logger import get_logger
 
 class GeomgenCommand(object):
     def __init__(self):
-        pass
+        self.process = None
+        self.progress = {"phase": "starting", "percent": 0}
+        self.cancelled = False
+        self._out = []
+        self._err = []
+        self._readers = []
 
-    def run(self):
-        command = ['poetry', 'run', 'python', '-m', 'geomgen.cli']
+    def _popen(self, args):
+        command = ['poetry', 'run', 'python', '-m', 'geomgen.cli'] + list(args)
 
         env_command = ['env', '-u', 'PYTHONPATH', '-u', 'PYTHONHOME'] + command
         shell_command = ['zsh', '-lic', ' '.join(env_command)]
         working_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'geomgen'))
 
-        process = subprocess.Popen(shell_command,
+        # A new session, so that cancelling takes down the shell, poetry and
+        # python together.
+        return subprocess.Popen(shell_command,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            cwd=working_dir)
+            cwd=working_dir,
+            preexec_fn=os.setsid)
 
-        out, err = process.communicate()
-        return_code = process.poll()
-        out = out.decode(sys.stdin.encoding)
-        err = err.decode(sys.stdin.encoding)
+    def start(self, *args):
+        """
+        Starts the generator in the background. Progress events it writes to
+        stderr are kept in `self.progress`; see `poll()` and `result()`.
+        """
+        self.process = self._popen(args)
 
-        if return_code != 0:
+        def read_out():
+            for chunk in iter(lambda: self.process.stdout.read(1 << 16), b''):
+                self._out.append(chunk)
+
+        def read_err():
+            for line in iter(self.process.stderr.readline, b''):
+                try:
+                    event = json.loads(line.decode('utf-8'))
+                except ValueError:
+                    self._err.append(line)
+                    continue
+                if isinstance(event, dict) and 'phase' in event:
+                    self.progress = event
+                else:
+                    self._err.append(line)
+
+        self._readers = [threading.Thread(target=read_out), threading.Thread(target=read_err)]
+        for t in self._readers:
+            t.daemon = True
+            t.start()
+
+    def poll(self):
+        """Returns True while the generator is still running."""
+        return self.process is not None and self.process.poll() is None
+
+    def cancel(self):
+        self.cancelled = True
+        if self.poll():
+            try:
+                os.killpg(os.getpgid(self.process.pid), signal.SIGTERM)
+            except OSError:
+                pass
+        if self.process is not None:
+            self.process.wait()
+
+    def result(self):
+        self.process.wait()
+        for t in self._readers:
+            t.join()
+
+        out = b''.join(self._out).decode('utf-8')
+        err = b''.join(self._err).decode('utf-8', 'replace')
+
+        if self.cancelled:
+            raise RuntimeError("cancelled")
+
+        if self.process.returncode != 0:
             get_logger().info("error: %s", err)
             raise RuntimeError
 
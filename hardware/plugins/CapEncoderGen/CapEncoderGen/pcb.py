@@ -1,16 +1,54 @@
 import pcbnew
 
+from . import fragment
+
+GENERATED_ZONE_NAME = fragment.GROUP_NAME
+
+
+def _new_net(board, name):
+    net = pcbnew.NETINFO_ITEM(board, name)
+    board.Add(net)
+    return net
+
+
+def _point(p):
+    return pcbnew.wxPoint(int(p[0] * 1e6), int(p[1] * 1e6))
 
 
 class PCB(object):
     def __init__(self):
         self.board = pcbnew.GetBoard()
+        self.net_codes = {}
+        self.group = None
 
-    def remove_all_zones(self):
-        # Avoid mutating the list while iterating it.
-        all_zones = list(self.board.Zones())
-        for z in all_zones:
-            self.board.Remove(z)
+    def generated_group(self):
+        # Everything a run creates is collected in one group, so the next
+        # run can find and replace it, and a cancelled one can be undone.
+        if self.group is None:
+            self.group = pcbnew.PCB_GROUP(self.board)
+            self.group.SetName(GENERATED_ZONE_NAME)
+            self.board.Add(self.group)
+        return self.group
+
+    def previous_run(self):
+        # Taken before this run adds anything, so the two are never mixed up.
+        return fragment.generated_items(self.board, GENERATED_ZONE_NAME)
+
+    def remove_items(self, items):
+        fragment.remove_items(self.board, *items)
+
+    def discard_group(self):
+        # Undoes everything this run has added so far.
+        if self.group is not None:
+            fragment.remove_items(self.board, [self.group], [])
+            self.group = None
+
+    def merge_fragment(self, path):
+        # One load and one pass over the items, in place of building every
+        # zone outline and fill through the API.
+        self.group = None
+        self.net_codes = {}
+        return fragment.merge_fragment(self.board, path, pcbnew.LoadBoard, _new_net, GENERATED_ZONE_NAME)
 
     def add_zone(self, net, layer, points):
 
@@ -24,12 +62,155 @@ class PCB(object):
 
         p1 = pcbnew.wxPoint(int(points[0][0] * 1e6), int(points[0][1] * 1e6))
         zone = self.board.AddArea(None, net_id, layer_id, p1, pcbnew.ZONE_FILL_MODE_POLYGONS)
-        
+
+        zone.SetZoneName(GENERATED_ZONE_NAME)
+        self.generated_group().AddItem(zone)
+
         sps = zone.Outline()
         for p in points[1:]:
             sps.Append(int(p[0] * 1e6), int(p[1] * 1e6))
 
+        return zone
+
+    def add_merged_zone(self, net, layer, polygons):
+        if len(polygons) == 0:
+            raise ValueError("there must be at least one polygon")
+
+        net_id = self.find_or_create_net(net)
+        layer_id = self.board.GetLayerID(layer)
+
+        outline, holes = polygons[0]
+        p1 = pcbnew.wxPoint(int(outline[0][0] * 1e6), int(outline[0][1] * 1e6))
+        zone = self.board.AddArea(None, net_id, layer_id, p1, pcbnew.ZONE_FILL_MODE_POLYGONS)
+        zone.SetZoneName(GENERATED_ZONE_NAME)
+        self.generated_group().AddItem(zone)
+
+        sps = zone.Outline()
+        for i, (outline, holes) in enumerate(polygons):
+            if len(outline) < 3:
+                raise ValueError("there must be at least three points")
+
+            if i == 0:
+                points = outline[1:]
+            else:
+                sps.NewOutline()
+                points = outline
+
+            for p in points:
+                sps.Append(int(p[0] * 1e6), int(p[1] * 1e6), i)
+
+            for h in holes:
+                hole_id = sps.NewHole(i)
+                for p in h:
+                    sps.Append(int(p[0] * 1e6), int(p[1] * 1e6), i, hole_id)
+
+        return zone
+
+    def set_zone_fill(self, zone, layer, polygons, min_thickness):
+        # Installs a precomputed fill and marks it current, so KiCad keeps it
+        # instead of refilling the zone.
+        layer_id = self.board.GetLayerID(layer)
+
+        fill = pcbnew.SHAPE_POLY_SET()
+        for outline, holes in polygons:
+            i = fill.NewOutline()
+            for p in outline:
+                fill.Append(int(p[0] * 1e6), int(p[1] * 1e6), i)
+
+            for h in holes:
+                hole_id = fill.NewHole(i)
+                for p in h:
+                    fill.Append(int(p[0] * 1e6), int(p[1] * 1e6), i, hole_id)
+
+        fill.Fracture(pcbnew.SHAPE_POLY_SET.PM_FAST)
+
+        zone.SetMinThickness(int(min_thickness * 1e6))
+        zone.SetFilledPolysList(layer_id, fill)
+        zone.SetIsFilled(True)
+        zone.SetNeedRefill(False)
+
+    def add_tracks(self, tracks):
+        group = self.generated_group()
+        for t in tracks:
+            track = pcbnew.PCB_TRACK(self.board)
+            track.SetStart(_point(t['start']))
+            track.SetEnd(_point(t['end']))
+            track.SetWidth(int(t['width'] * 1e6))
+            track.SetLayer(self.board.GetLayerID(t['layer']))
+            track.SetNetCode(self.find_or_create_net(t['net']))
+            self.board.Add(track)
+            group.AddItem(track)
+
+    def add_vias(self, vias):
+        group = self.generated_group()
+        for v in vias:
+            via = pcbnew.PCB_VIA(self.board)
+            via.SetPosition(_point(v['point']))
+            via.SetWidth(int(v['size'] * 1e6))
+            via.SetDrill(int(v['drill'] * 1e6))
+            via.SetLayerPair(pcbnew.F_Cu, pcbnew.B_Cu)
+            via.SetNetCode(self.find_or_create_net(v['net']))
+            self.board.Add(via)
+            group.AddItem(via)
+
+    def add_graphics(self, graphics):
+        group = self.generated_group()
+        for g in graphics:
+            shape = pcbnew.PCB_SHAPE(self.board)
+            kind = g['shape']
+            if kind == 'line':
+                shape.SetShape(pcbnew.SHAPE_T_SEGMENT)
+                shape.SetStart(_point(g['start']))
+                shape.SetEnd(_point(g['end']))
+            elif kind == 'circle':
+                shape.SetShape(pcbnew.SHAPE_T_CIRCLE)
+                shape.SetCenter(_point(g['center']))
+                shape.SetEnd(_point([g['center'][0] + g['radius'], g['center'][1]]))
+            elif kind == 'arc':
+                shape.SetShape(pcbnew.SHAPE_T_ARC)
+                shape.SetCenter(_point(g['center']))
+                shape.SetStart(_point(g['start']))
+                shape.SetArcAngleAndEnd(g['angle'] * 10)
+            elif kind == 'polygon':
+                shape.SetShape(pcbnew.SHAPE_T_POLY)
+                shape.SetPolyPoints([_point(p) for p in g['points']])
+                shape.SetFilled(True)
+            else:
+                raise ValueError("unknown shape %s" % kind)
+
+            shape.SetWidth(int(g['width'] * 1e6))
+            shape.SetLayer(self.board.GetLayerID(g['layer']))
+            self.board.Add(shape)
+            group.AddItem(shape)
+
+    def add_holes(self, holes):
+        # Bare NPTH footprints, so no footprint library needs to be found.
+        group = self.generated_group()
+        for i, h in enumerate(holes):
+            footprint = pcbnew.FOOTPRINT(self.board)
+            footprint.SetReference("H%d" % (i + 1))
+            footprint.Reference().SetVisible(False)
+            footprint.Value().SetVisible(False)
+
+            diameter = int(h['diameter'] * 1e6)
+            pad = pcbnew.PAD(footprint)
+            pad.SetAttribute(pcbnew.PAD_ATTRIB_NPTH)
+            pad.SetShape(pcbnew.PAD_SHAPE_CIRCLE)
+            pad.SetSize(pcbnew.wxSize(diameter, diameter))
+            pad.SetDrillSize(pcbnew.wxSize(diameter, diameter))
+            pad.SetLayerSet(pad.UnplatedHoleMask())
+            footprint.Add(pad)
+
+            footprint.SetPosition(_point(h['point']))
+            self.board.Add(footprint)
+            group.AddItem(footprint)
+
     def find_or_create_net(self, net):
+        # Bulk creation looks nets up thousands of times; GetNetsByName
+        # copies the whole map, so codes are remembered.
+        if net in self.net_codes:
+            return self.net_codes[net]
+
         net_map = self.board.GetNetsByName()
         if net_map.has_key(net):
             net_info = net_map[net]
@@ -37,4 +218,5 @@ class PCB(object):
             net_info = pcbnew.NETINFO_ITEM(self.board, net)
             self.board.Add(net_info)
 
-        return net_info.GetNetCode()
+        self.net_codes[net] = net_info.GetNetCode()
+        return self.net_codes[net]
@@ -1,12 +1,24 @@
 import os
 import json
-import time
+import tempfile
+import wx
 import pcbnew
 
 from .pcb import PCB
 from .geomgen import GeomgenCommand
 from .logger import get_logger, log_exception
 
+# Generation takes the first part of the progress bar, applying the result to
+# the board the rest. Items are applied a chunk at a time so the dialog (and
+# the editor behind it) keep handling events.
+GENERATE_RANGE = 80
+ZONE_CHUNK = 2
+ITEM_CHUNK = 500
+POLL_INTERVAL_MS = 50
+
+# Have geomgen write a .kicad_pcb fragment and merge it in one pass, rather
+# than creating every item through the API.
+BULK_FRAGMENT = True
 
 
 class CapEncoderGenPlugin(pcbnew.ActionPlugin, object):
@@ -22,20 +34,106 @@ class CapEncoderGenPlugin(pcbnew.ActionPlugin, object):
 
         self.logger = get_logger()
 
-    @log_exception(reraise=True)
-    def Run(self):
+    def generate(self, dialog, *args):
         c = GeomgenCommand()
-        output = c.run()
+        c.start('--merge', '--progress', *args)
 
-        self.logger.info("result: %s", output)
+        while c.poll():
+            event = c.progress
+            message = "%s (%d zones)" % (event['phase'], event.get('zones', 0))
+            keep_going, _ = dialog.Update(int(event['percent'] * GENERATE_RANGE / 100), message)
+            if not keep_going:
+                c.cancel()
+                return None
+            wx.MilliSleep(POLL_INTERVAL_MS)
 
-        geom = json.loads(output)
+        return c.result()
 
-        pcb = PCB()
-        pcb.remove_all_zones()
-
-        for z in geom['zones']:
-            net = z['net']
-            layer = z['layer']
+    def apply_zone(self, pcb, z):
+        net = z['net']
+        layer = z['layer']
+        if 'polygons' in z:
+            polygons = [(p['points'], p['holes']) for p in z['polygons']]
+            zone = pcb.add_merged_zone(net, layer, polygons)
+        else:
             points = z['points']
-            pcb.add_zone(net, layer, points)
+            zone = pcb.add_zone(net, layer, points)
+
+        if 'fill' in z:
+            fill = [(p['points'], p['holes']) for p in z['fill']]
+            pcb.set_zone_fill(zone, layer, fill, z['min_thickness'])
+
+    def apply_items(self, dialog, pcb, geom):
+        # The previous run stays until the last chunk lands, and a cancel
+        # removes the partial new one, so the board is never half-generated.
+        previous = pcb.previous_run()
+
+        def apply_zones(zones):
+            for z in zones:
+                self.apply_zone(pcb, z)
+
+        steps = [
+            ('zones', geom['zones'], apply_zones, ZONE_CHUNK),
+            ('tracks', geom.get('tracks', []), pcb.add_tracks, ITEM_CHUNK),
+            ('vias', geom.get('vias', []), pcb.add_vias, ITEM_CHUNK),
+            ('graphics', geom.get('graphics', []), pcb.add_graphics, ITEM_CHUNK),
+            ('holes', geom.get('holes', []), pcb.add_holes, ITEM_CHUNK)
+        ]
+
+        total = max(1, sum(len(items) for _, items, _, _ in steps))
+        done = 0
+        for name, items, apply, chunk in steps:
+            for i in range(0, len(items), chunk):
+                apply(items[i:i + chunk])
+
+                done += len(items[i:i + chunk])
+                percent = GENERATE_RANGE + (100 - GENERATE_RANGE) * done // total
+                keep_going, _ = dialog.Update(min(99, percent), "applying %s (%d/%d)" % (name, done, total))
+                if not keep_going:
+                    pcb.discard_group()
+                    self.logger.info("cancelled after %d items, rolled back", done)
+                    return
+
+        pcb.remove_items(previous)
+
+    def run_fragment(self, dialog):
+        fd, path = tempfile.mkstemp(suffix='.kicad_pcb', prefix='capencodergen-')
+        os.close(fd)
+        try:
+            output = self.generate(dialog, '--fragment', path)
+            if output is None:
+                self.logger.info("cancelled")
+                return
+
+            self.logger.info("fragment: %s", output)
+            dialog.Update(GENERATE_RANGE, "merging into board")
+
+            pcb = PCB()
+            moved = pcb.merge_fragment(path)
+            self.logger.info("merged %d items", moved)
+        finally:
+            os.remove(path)
+
+    def run_items(self, dialog):
+        output = self.generate(dialog)
+        if output is None:
+            self.logger.info("cancelled")
+            return
+
+        self.logger.info("result: %d bytes", len(output))
+        self.apply_items(dialog, PCB(), json.loads(output))
+
+    @log_exception(reraise=True)
+    def Run(self):
+        dialog = wx.ProgressDialog(
+            self.name, "starting", maximum=100,
+            style=wx.PD_CAN_ABORT | wx.PD_APP_MODAL | wx.PD_AUTO_HIDE | wx.PD_ELAPSED_TIME)
+
+        try:
+            if BULK_FRAGMENT:
+                self.run_fragment(dialog)
+            else:
+                self.run_items(dialog)
+        finally:
+            dialog.Destroy()
+            pcbnew.Refresh()
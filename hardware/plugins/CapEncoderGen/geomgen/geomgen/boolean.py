@@ -0,0 +1,426 @@
+import math
+import numpy as np
+from fractions import Fraction
+from collections import defaultdict
+
+# Polygon booleans on an integer grid. Coordinates are expected to already be
+# integers (see to_grid), so every orientation and side test below is exact.
+# Only new intersection points are rounded back onto the grid.
+
+GRID_SCALE = 1000000
+
+
+def to_grid(vertices, scale=GRID_SCALE):
+    return [(int(round(v[0] * scale)), int(round(v[1] * scale))) for v in vertices]
+
+
+def from_grid(vertices, scale=GRID_SCALE):
+    return [(v[0] / float(scale), v[1] / float(scale)) for v in vertices]
+
+
+def signed_area2(vertices):
+    a = 0
+    n = len(vertices)
+    for i in range(n):
+        x0, y0 = vertices[i]
+        x1, y1 = vertices[(i + 1) % n]
+        a += x0 * y1 - x1 * y0
+    return a
+
+
+def polygon_area(vertices):
+    return abs(signed_area2(vertices)) / 2.0
+
+
+def _cross(o, a, b):
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def _normalize(vertices):
+    vs = []
+    for v in vertices:
+        v = (v[0], v[1])
+        if not vs or vs[-1] != v:
+            vs.append(v)
+    while len(vs) > 1 and vs[0] == vs[-1]:
+        vs.pop()
+
+    vs = _drop_collinear(vs)
+    if len(vs) < 3:
+        return None
+
+    a = signed_area2(vs)
+    if a == 0:
+        return None
+    if a < 0:
+        vs.reverse()
+    return vs
+
+
+def _drop_collinear(vs):
+    changed = True
+    while changed and len(vs) >= 3:
+        changed = False
+        out = []
+        n = len(vs)
+        for i in range(n):
+            p = vs[i - 1]
+            q = vs[i]
+            r = vs[(i + 1) % n]
+            if _cross(p, q, r) == 0 and (q[0] - p[0]) * (r[0] - q[0]) + (q[1] - p[1]) * (r[1] - q[1]) > 0:
+                changed = True
+                continue
+            out.append(q)
+        vs = out
+    return vs
+
+
+def _bbox(vertices):
+    xs = [v[0] for v in vertices]
+    ys = [v[1] for v in vertices]
+    return (min(xs), min(ys), max(xs), max(ys))
+
+
+def _clusters(polygons):
+    # Groups polygons whose bounding boxes touch, so that isolated polygons
+    # can skip the boolean stage entirely.
+    parent = list(range(len(polygons)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    boxes = [_bbox(p) for p in polygons]
+    order = sorted(range(len(polygons)), key=lambda i: boxes[i][0])
+
+    active = []
+    for i in order:
+        b = boxes[i]
+        active = [j for j in active if boxes[j][2] >= b[0]]
+        for j in active:
+            c = boxes[j]
+            if c[1] <= b[3] and b[1] <= c[3]:
+                parent[find(i)] = find(j)
+        active.append(i)
+
+    groups = defaultdict(list)
+    for i in range(len(polygons)):
+        groups[find(i)].append(i)
+    return [groups[k] for k in sorted(groups)]
+
+
+def _on_segment(p, a, b):
+    return (min(a[0], b[0]) <= p[0] <= max(a[0], b[0]) and
+            min(a[1], b[1]) <= p[1] <= max(a[1], b[1]))
+
+
+def _split_edges(edges):
+    # Rounding a crossing onto the grid nudges both pieces slightly, which
+    # can create new crossings; repeat until the arrangement is stable.
+    for _ in range(8):
+        segments = _split_once(edges)
+        if len(segments) == len(edges):
+            break
+        edges = segments
+    return segments
+
+
+def _split_once(edges):
+    splits = [set() for _ in edges]
+
+    boxes = [(min(a[0], b[0]), max(a[0], b[0]), min(a[1], b[1]), max(a[1], b[1])) for a, b, _ in edges]
+    order = sorted(range(len(edges)), key=lambda i: boxes[i][0])
+
+    active = []
+    for i in order:
+        bi = boxes[i]
+        active = [j for j in active if boxes[j][1] >= bi[0]]
+        for j in active:
+            bj = boxes[j]
+            if bj[2] > bi[3] or bi[2] > bj[3]:
+                continue
+            _intersect(edges[i][:2], edges[j][:2], splits[i], splits[j])
+        active.append(i)
+
+    segments = []
+    for (a, b, tag), pts in zip(edges, splits):
+        dx = b[0] - a[0]
+        dy = b[1] - a[1]
+        inner = sorted((p for p in pts if p != a and p != b),
+                       key=lambda p: (p[0] - a[0]) * dx + (p[1] - a[1]) * dy)
+        chain = [a] + inner + [b]
+        for k in range(len(chain) - 1):
+            if chain[k] != chain[k + 1]:
+                segments.append((chain[k], chain[k + 1], tag))
+    return segments
+
+
+def _intersect(e, f, se, sf):
+    p1, p2 = e
+    p3, p4 = f
+
+    d1 = _cross(p3, p4, p1)
+    d2 = _cross(p3, p4, p2)
+    d3 = _cross(p1, p2, p3)
+    d4 = _cross(p1, p2, p4)
+
+    if d1 == 0 and d2 == 0:
+        # Collinear: split each edge at the other's endpoints.
+        for p in (p3, p4):
+            if _on_segment(p, p1, p2):
+                se.add(p)
+        for p in (p1, p2):
+            if _on_segment(p, p3, p4):
+                sf.add(p)
+        return
+
+    if ((d1 > 0 and d2 > 0) or (d1 < 0 and d2 < 0) or
+            (d3 > 0 and d4 > 0) or (d3 < 0 and d4 < 0)):
+        return
+
+    if d1 == 0:
+        sf.add(p1)
+        return
+    if d2 == 0:
+        sf.add(p2)
+        return
+    if d3 == 0:
+        se.add(p3)
+        return
+    if d4 == 0:
+        se.add(p4)
+        return
+
+    t = Fraction(d1, d1 - d2)
+    p = (int(round(p1[0] + (p2[0] - p1[0]) * t)), int(round(p1[1] + (p2[1] - p1[1]) * t)))
+    se.add(p)
+    sf.add(p)
+
+
+def _right_windings(keys, segments, operands):
+    # Winding number of every operand just to the right of the midpoint of
+    # each key segment, found by casting a ray parallel to the segment.
+    # Coordinates are doubled so that midpoints stay on the integer grid.
+    # The final side test is done in floating point and re-checked with
+    # exact integers wherever the result is too close to call.
+    origin = np.array(keys[0][0], dtype=np.int64)
+
+    a = np.array([k[0] for k in keys], dtype=np.int64) - origin
+    b = np.array([k[1] for k in keys], dtype=np.int64) - origin
+    p = 2 * (np.array([s[0] for s in segments], dtype=np.int64) - origin)
+    q = 2 * (np.array([s[1] for s in segments], dtype=np.int64) - origin)
+    tags = np.array([s[2] for s in segments], dtype=np.int64)
+
+    u = b - a
+    m = a + b
+
+    windings = np.zeros((len(keys), operands), dtype=np.int64)
+
+    chunk = max(1, 2000000 // max(1, len(segments)))
+    for lo in range(0, len(keys), chunk):
+        ux = u[lo:lo + chunk, 0:1]
+        uy = u[lo:lo + chunk, 1:2]
+        mx = m[lo:lo + chunk, 0:1]
+        my = m[lo:lo + chunk, 1:2]
+
+        px = p[None, :, 0] - mx
+        py = p[None, :, 1] - my
+        qx = q[None, :, 0] - mx
+        qy = q[None, :, 1] - my
+
+        c0 = ux * py - uy * px
+        c1 = ux * qy - uy * qx
+        crossing = (c0 < 0) != (c1 < 0)
+
+        t0 = ux * px + uy * py
+        t1 = ux * qx + uy * qy
+
+        # The crossing lies ahead of the midpoint when t1 * c0 - t0 * c1
+        # has the same sign as c0 - c1.
+        f0 = t1.astype(float) * c0.astype(float)
+        f1 = t0.astype(float) * c1.astype(float)
+        num = f0 - f1
+        bound = 1e-12 * (np.abs(f0) + np.abs(f1))
+        ahead = (num > 0) == (c0 > c1)
+        ahead &= np.abs(num) > bound
+
+        for i, j in zip(*np.nonzero(crossing & (np.abs(num) <= bound))):
+            exact = int(t1[i, j]) * int(c0[i, j]) - int(t0[i, j]) * int(c1[i, j])
+            ahead[i, j] = exact != 0 and (exact > 0) == (c0[i, j] > c1[i, j])
+
+        sign = np.where(c0 < 0, 1, -1) * (crossing & ahead)
+        for k in range(operands):
+            windings[lo:lo + chunk, k] = (sign * (tags == k)[None, :]).sum(axis=1)
+
+    return windings
+
+
+def _boundary(segments, operands, keep):
+    directed = {}
+    for a, b, tag in segments:
+        if a < b:
+            key, d = (a, b), 1
+        else:
+            key, d = (b, a), -1
+        if key not in directed:
+            directed[key] = [0] * operands
+        directed[key][tag] += d
+
+    keys = list(directed)
+    if not keys:
+        return []
+
+    w_right = _right_windings(keys, segments, operands)
+
+    boundary = []
+    for (a, b), wr in zip(keys, w_right):
+        wl = [r + n for r, n in zip(wr, directed[(a, b)])]
+        inside_left = keep(wl)
+        inside_right = keep(wr)
+        if inside_left and not inside_right:
+            boundary.append((a, b))
+        elif inside_right and not inside_left:
+            boundary.append((b, a))
+    return boundary
+
+
+def _link(boundary):
+    outgoing = defaultdict(list)
+    for a, b in boundary:
+        outgoing[a].append(b)
+
+    loops = []
+    while outgoing:
+        start = next(iter(outgoing))
+        loop = [start]
+        prev = None
+        cur = start
+        while True:
+            candidates = outgoing.get(cur)
+            if not candidates:
+                break
+            if prev is None or len(candidates) == 1:
+                k = 0
+            else:
+                dix = cur[0] - prev[0]
+                diy = cur[1] - prev[1]
+
+                def turn(n):
+                    dox = n[0] - cur[0]
+                    doy = n[1] - cur[1]
+                    return math.atan2(dix * doy - diy * dox, dix * dox + diy * doy)
+
+                k = max(range(len(candidates)), key=lambda i: turn(candidates[i]))
+            nxt = candidates.pop(k)
+            if not candidates:
+                del outgoing[cur]
+            prev, cur = cur, nxt
+            if cur == start:
+                break
+            loop.append(cur)
+
+        loop = _drop_collinear(loop)
+        if len(loop) >= 3 and signed_area2(loop) != 0:
+            loops.append(loop)
+    return loops
+
+
+def _point_in_polygon(p, vertices):
+    inside = False
+    n = len(vertices)
+    for i in range(n):
+        a = vertices[i]
+        b = vertices[(i + 1) % n]
+        if (a[1] > p[1]) != (b[1] > p[1]):
+            c = _cross(a, b, p)
+            if (c > 0) == (b[1] > a[1]):
+                inside = not inside
+    return inside
+
+
+def _assemble(loops):
+    outers = [l for l in loops if signed_area2(l) > 0]
+    holes = [l for l in loops if signed_area2(l) < 0]
+
+    result = [(o, []) for o in outers]
+    for h in holes:
+        owner = None
+        for k, (o, _) in enumerate(result):
+            if all(_point_in_polygon(v, o) or v in o for v in h):
+                if owner is None or signed_area2(o) < signed_area2(result[owner][0]):
+                    owner = k
+        if owner is not None:
+            result[owner][1].append(h)
+    return result
+
+
+def _boolean(subjects, clips, keep):
+    polys = [(p, 0) for p in (_normalize(p) for p in subjects) if p is not None]
+    polys += [(p, 1) for p in (_normalize(p) for p in clips) if p is not None]
+
+    result = []
+    for group in _clusters([p for p, _ in polys]):
+        if all(polys[i][1] != 0 for i in group):
+            continue
+
+        if len(group) == 1:
+            result.append((polys[group[0]][0], []))
+            continue
+
+        edges = []
+        for i in group:
+            p, tag = polys[i]
+            edges += [(p[k], p[(k + 1) % len(p)], tag) for k in range(len(p))]
+
+        segments = _split_edges(edges)
+        result += _assemble(_link(_boundary(segments, 2, keep)))
+    return result
+
+
+def union(polygons):
+    """
+    Union of integer polygons. Returns a list of (outline, holes) pairs with
+    counter-clockwise outlines and clockwise holes.
+    """
+    return _boolean(polygons, [], lambda w: w[0] > 0)
+
+
+def difference(subjects, clips):
+    """
+    Area covered by `subjects` but not by `clips`, in the same form as union.
+    """
+    return _boolean(subjects, clips, lambda w: w[0] > 0 and w[1] <= 0)
+
+
+def fracture(outline, holes):
+    """
+    Joins holes into their outline with zero-width bridges, producing the
+    single point list that KiCad uses for filled zone polygons.
+    """
+    vs = list(outline)
+
+    for hole in sorted(holes, key=lambda h: -max(v[0] for v in h)):
+        k = max(range(len(hole)), key=lambda i: hole[i][0])
+        m = hole[k]
+
+        best = None
+        for i in range(len(vs)):
+            a = vs[i]
+            b = vs[(i + 1) % len(vs)]
+            if (a[1] > m[1]) == (b[1] > m[1]) or a[1] == b[1]:
+                continue
+            x = a[0] + (m[1] - a[1]) * (b[0] - a[0]) / float(b[1] - a[1])
+            if x >= m[0] and (best is None or x < best[0]):
+                best = (x, i)
+
+        if best is None:
+            continue
+
+        x, i = best
+        bridge = (x, m[1])
+        ring = hole[k:] + hole[:k]
+        vs = vs[:i + 1] + [bridge, m] + ring[1:] + [m, bridge] + vs[i + 1:]
+
+    return vs
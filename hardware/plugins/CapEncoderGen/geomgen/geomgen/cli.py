@@ -1,7 +1,13 @@
+import os
+import sys
 import json
+import time
+import argparse
 
-from .geometry import StatorComponent
-
+from .geometry import StatorComponent, STAGE_DEFINITIONS
+from .graph import Pipeline, DEFAULT_SPEC, load_spec, build_component
+from .fragment import write_fragment
+from .metrics import signal_metrics, write_csv
 
 
 def test():
@@ -39,40 +45,180 @@ def test():
     }
     """)
 
-def main():
-    component = StatorComponent(30, 61.4, 100)
+class Progress:
+    def __init__(self, enabled, stream=None):
+        self.enabled = enabled
+        self.stream = stream if stream is not None else sys.stderr
+
+    def __call__(self, phase, percent, **extra):
+        # One JSON object per line on stderr, so stdout stays a single
+        # geometry document.
+        if not self.enabled:
+            return
+        event = {"phase": phase, "percent": round(percent, 1)}
+        event.update(extra)
+        self.stream.write(json.dumps(event) + "\n")
+        self.stream.flush()
+
+
+WATCH_INTERVAL = 0.2
+
+
+def watch(path, stream=None, interval=WATCH_INTERVAL, revisions=None):
+    """
+    Regenerates whenever `path` changes and writes one JSON line per
+    revision holding only the outputs that changed.
+    """
+    stream = stream if stream is not None else sys.stdout
+
+    pipeline = None
+    seen = {}
+    mtime = None
+    revision = 0
+
+    while revisions is None or revision < revisions:
+        try:
+            current = os.stat(path).st_mtime_ns
+        except OSError:
+            # Editors often replace the file by renaming; try again.
+            time.sleep(interval)
+            continue
+        if current == mtime:
+            time.sleep(interval)
+            continue
+        mtime = current
+
+        start = time.perf_counter()
+        try:
+            spec = load_spec(path)
+            if pipeline is None:
+                pipeline = Pipeline(spec)
+            else:
+                pipeline.update(spec)
+
+            changed = pipeline.delta(seen)
+        except Exception as e:
+            # A bad edit must not end the watch. The graph may be half
+            # updated, so the next good spec starts from scratch.
+            pipeline = None
+            seen = {}
+            stream.write(json.dumps({"revision": revision, "error": str(e)}) + "\n")
+            stream.flush()
+            continue
+
+        event = {
+            "revision": revision,
+            "elapsed_ms": round(1000 * (time.perf_counter() - start), 1),
+            "changed": changed
+        }
+        stream.write(json.dumps(event) + "\n")
+        stream.flush()
+        revision += 1
+
+
+def metrics(paths, fmt, stream=None):
+    """
+    Writes the metrics of each spec file in `paths` (None for the stock
+    stator), as a JSON list of designs or as CSV rows with a `spec` column.
+    """
+    stream = stream if stream is not None else sys.stdout
 
+    designs = []
+    for path in paths:
+        component = build_component(load_spec(path)) if path else StatorComponent(30, 61.4, 100)
+        designs.append({"spec": path, "signals": signal_metrics(component)})
+
+    if fmt == 'csv':
+        write_csv([dict(r, spec=d["spec"] or '') for d in designs for r in d["signals"]], stream, extra=['spec'])
+    else:
+        stream.write(json.dumps(designs) + "\n")
+
+
+def document(spec, progress=None):
+    """
+    The geometry document of `spec`: the same graph --watch runs, evaluated
+    once, reporting to `progress` as it goes.
+    """
+    progress = progress or Progress(False)
+    progress("geometry", 0)
+
+    pipeline = Pipeline(spec)
+    electrodes = [pipeline.graph.get('electrodes%d' % i) for i in range(len(STAGE_DEFINITIONS))]
+
+    progress("geometry", 10)
+
+    if spec['merge']:
+        total = sum(len({name for name, _ in e}) for e in electrodes)
+        progress("merge", 20, nets=total)
+        start, span = 20, 70
+    else:
+        total = sum(len(polygons) for e in electrodes for _, polygons in e)
+        start, span = 10, 80
 
     zones = []
 
+    def on_zone(z):
+        zones.append(z)
+        progress("fill", start + span * len(zones) / float(total), zones=len(zones))
 
-    for s in component.signals:
-        net_name = s.name
+    pipeline.on_zone = on_zone
+    geom = pipeline.document()
 
-        # avs = s.arc.to_polygon()
-        # for i in range(len(avs) - 1):
-        #     segments.append(Segment(start=avs[i], end=avs[i + 1], net=net.code, layer=arc_layer, width=trace_width))
+    progress("tracks", 95, tracks=len(geom["tracks"]), vias=len(geom["vias"]))
+    return geom
 
-        for e in s.electrodes:
-            evs = e.to_polygon()
-            zones.append({
-                "net": net_name,
-                "layer": "F.Cu",
-                "points": evs
-            })
 
-        # for v in s.vias:
-        #     vv = v.to_vertex()
-        #     vias.append(Via(at=vv, size=via_size, drill=via_drill, net=net.code))
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='geomgen')
+    parser.add_argument('--merge', action='store_true',
+                        help='emit one multi-polygon zone per net instead of one zone per electrode')
+    parser.add_argument('--flip', action='store_true',
+                        help='electrodes on B.Cu and bus arcs on F.Cu')
+    parser.add_argument('--progress', action='store_true',
+                        help='report progress events as JSON lines on stderr')
+    parser.add_argument('--spec', metavar='SPEC', action='append',
+                        help='design spec (component, dimensions, shapes, ...) to generate from; '
+                             'may be repeated with --metrics')
+    parser.add_argument('--fragment', metavar='PATH',
+                        help='write a .kicad_pcb fragment to PATH and print only a summary')
+    parser.add_argument('--watch', metavar='SPEC',
+                        help='regenerate whenever the spec file changes, writing only what changed')
+    parser.add_argument('--metrics', choices=['json', 'csv'],
+                        help='print per-signal area, bus length, vias, resistance and capacitance instead')
+    args = parser.parse_args(argv)
 
-    geom = {
-        "zones": zones,
-        "tracks": [],
-        "vias": []
-    }
+    if args.metrics:
+        metrics(args.spec or [None], args.metrics)
+        return
+
+    if args.spec and len(args.spec) > 1:
+        parser.error("only --metrics takes several specs")
+
+    if args.watch:
+        try:
+            watch(args.watch)
+        except KeyboardInterrupt:
+            pass
+        return
 
-    output = json.dumps(geom)
+    spec = load_spec(args.spec[0]) if args.spec else dict(DEFAULT_SPEC)
+    spec['merge'] = args.merge or spec['merge']
+    spec['flip'] = args.flip or spec['flip']
+
+    progress = Progress(args.progress)
+    geom = document(spec, progress)
+
+    if args.fragment:
+        with open(args.fragment, 'w') as f:
+            write_fragment(geom, f)
+        summary = {k: len(v) for k, v in geom.items()}
+        summary["fragment"] = os.path.abspath(args.fragment)
+        output = json.dumps(summary)
+    else:
+        output = json.dumps(geom)
     print(output)
 
+    progress("export", 100, zones=len(geom["zones"]), tracks=len(geom["tracks"]), vias=len(geom["vias"]))
+
 if __name__ == "__main__":
     main()
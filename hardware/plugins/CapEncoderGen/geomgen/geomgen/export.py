@@ -0,0 +1,112 @@
+from .merge import merge_polygons
+
+TRACE_WIDTH = 0.127
+VIA_SIZE = 0.6
+VIA_DRILL = 0.3
+GRAPHIC_WIDTH = 0.15
+HOLE_DIAMETER = 3.2
+
+# JSON shapes of the items the plugin creates. Shared by the one-shot CLI
+# and the incremental graph, which emit the same documents.
+
+
+def board_layers(flip=False):
+    """(electrode, bus arc, mask) layers."""
+    if not flip:
+        return 'F.Cu', 'B.Cu', 'F.Mask'
+    return 'B.Cu', 'F.Cu', 'B.Mask'
+
+
+def fill_json(pieces):
+    return [{"points": o, "holes": hs} for o, hs in pieces]
+
+
+def electrode_zone_json(net, evs, filler, layer):
+    return {
+        "net": net,
+        "layer": layer,
+        "points": evs,
+        "fill": fill_json(filler.fill(net, evs)),
+        "min_thickness": filler.min_thickness
+    }
+
+
+def merged_zone_json(merged, filler, layer):
+    fill = []
+    for o, hs in merged.polygons:
+        fill += filler.fill(merged.name, o, hs)
+
+    return {
+        "net": merged.name,
+        "layer": layer,
+        "polygons": [{"points": o, "holes": hs} for o, hs in merged.polygons],
+        "fill": fill_json(fill),
+        "min_thickness": filler.min_thickness
+    }
+
+
+def zones_json(named_polygons, filler, layer, merge=False, progress=None):
+    """
+    Zones for (net name, electrode polygons) pairs. `progress` is called
+    with each zone as soon as it is filled.
+    """
+    def each():
+        if merge:
+            for m in merge_polygons(named_polygons):
+                yield merged_zone_json(m, filler, layer)
+        else:
+            for name, polygons in named_polygons:
+                for evs in polygons:
+                    yield electrode_zone_json(name, evs, filler, layer)
+
+    zones = []
+    for z in each():
+        zones.append(z)
+        if progress is not None:
+            progress(z)
+    return zones
+
+
+def tracks_json(signals, layer):
+    # Bus arcs are written as chains of straight tracks, as in pcb.py.
+    tracks = []
+    for s in signals:
+        avs = s.arc.to_polygon()
+        for a, b in zip(avs, avs[1:]):
+            tracks.append({"net": s.name, "layer": layer, "start": a, "end": b, "width": TRACE_WIDTH})
+    return tracks
+
+
+def vias_json(signals):
+    return [
+        {"net": s.name, "point": v.to_vertex(), "size": VIA_SIZE, "drill": VIA_DRILL}
+        for s in signals for v in s.vias
+    ]
+
+
+def graphics_json(graphics, layer):
+    shapes = []
+    for gl in graphics.lines:
+        shapes.append({"shape": "line", "layer": layer, "start": gl.start, "end": gl.end, "width": GRAPHIC_WIDTH})
+
+    for gc in graphics.circles:
+        shapes.append({"shape": "circle", "layer": layer, "center": gc.center, "radius": gc.radius, "width": GRAPHIC_WIDTH})
+
+    for ga in graphics.arcs:
+        shapes.append({"shape": "arc", "layer": layer, "center": ga.center, "start": ga.start, "angle": ga.angle, "width": GRAPHIC_WIDTH})
+
+    for gp in graphics.polygons:
+        shapes.append({"shape": "polygon", "layer": layer, "points": gp.vertices, "width": GRAPHIC_WIDTH})
+    return shapes
+
+
+def outline_json(component, mask_layer):
+    graphics = []
+    graphics += graphics_json(component.edge_cuts, 'Edge.Cuts')
+    graphics += graphics_json(component.masks, mask_layer)
+    graphics += graphics_json(component.silks, 'F.SilkS')
+    return graphics
+
+
+def holes_json(component):
+    return [{"point": h.center, "diameter": HOLE_DIAMETER} for h in component.holes]
@@ -0,0 +1,260 @@
+import math
+import numpy as np
+
+from .boolean import union, difference, signed_area2, to_grid, from_grid, GRID_SCALE
+from .shapes import electrode_polygons
+
+CLEARANCE = 0.127
+MIN_THICKNESS = 0.0254
+VIA_SIZE = 0.6
+CIRCLE_SEGMENTS = 16
+
+# Fills follow KiCad's polygon fill: copper is the zone outline minus other
+# nets' copper (vias and electrodes) grown by the clearance, then opened
+# (deflated and re-inflated) by half the minimum thickness so that slivers
+# thinner than it disappear.
+
+
+def _circle(center, radius, segments=CIRCLE_SEGMENTS):
+    return [
+        (int(round(center[0] + radius * math.cos(2 * math.pi * k / segments))),
+         int(round(center[1] + radius * math.sin(2 * math.pi * k / segments))))
+        for k in range(segments)
+    ]
+
+
+def _distance(p, ring):
+    best = None
+    n = len(ring)
+    for i in range(n):
+        a = ring[i]
+        b = ring[(i + 1) % n]
+        dx = b[0] - a[0]
+        dy = b[1] - a[1]
+        l2 = dx * dx + dy * dy
+        t = 0 if l2 == 0 else max(0, min(1, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / float(l2)))
+        d = math.hypot(a[0] + t * dx - p[0], a[1] + t * dy - p[1])
+        if best is None or d < best:
+            best = d
+    return best
+
+
+def _inside(p, ring):
+    inside = False
+    n = len(ring)
+    for i in range(n):
+        a = ring[i]
+        b = ring[(i + 1) % n]
+        if (a[1] > p[1]) != (b[1] > p[1]):
+            x = a[0] + (p[1] - a[1]) * (b[0] - a[0]) / float(b[1] - a[1])
+            if x > p[0]:
+                inside = not inside
+    return inside
+
+
+def _edges(ring):
+    a = np.asarray(ring, dtype=float)
+    return a, np.roll(a, -1, axis=0)
+
+
+def _vertex_distance(vs, ring):
+    # Smallest distance from a vertex of `vs` to an edge of `ring`.
+    p = np.asarray(vs, dtype=float)[:, None, :]
+    a, b = _edges(ring)
+    d = b - a
+    l2 = np.maximum(np.sum(d * d, axis=1), 1e-30)
+    t = np.clip(np.sum((p - a) * d, axis=2) / l2, 0, 1)
+    return np.hypot(*np.moveaxis(a + t[..., None] * d - p, -1, 0)).min()
+
+
+def _crosses(a, b):
+    # Whether any edge of ring `a` properly crosses an edge of ring `b`.
+    p, q = (e[:, None, :] for e in _edges(a))
+    r, t = (e[None, :, :] for e in _edges(b))
+
+    def side(o, u, v):
+        return (u[..., 0] - o[..., 0]) * (v[..., 1] - o[..., 1]) - (u[..., 1] - o[..., 1]) * (v[..., 0] - o[..., 0])
+
+    d1, d2 = side(p, q, r), side(p, q, t)
+    d3, d4 = side(r, t, p), side(r, t, q)
+    return bool(np.any((d1 * d2 < 0) & (d3 * d4 < 0)))
+
+
+def _near(a, b, reach):
+    # Whether rings `a` and `b` overlap or come closer than `reach`. The
+    # distance between disjoint polygons is that of a vertex to an edge.
+    return (
+        _inside(a[0], b) or _inside(b[0], a) or _crosses(a, b) or
+        _vertex_distance(a, b) < reach or _vertex_distance(b, a) < reach)
+
+
+def _capsules(ring, radius, convex):
+    # Rectangles around every edge of the ring, plus discs at either its
+    # convex or its reflex vertices: the only ones an offset can round.
+    # Holes are clockwise, so the same turn test holds for them.
+    shapes = []
+    n = len(ring)
+    for i in range(n):
+        a = ring[i]
+        b = ring[(i + 1) % n]
+        dx = b[0] - a[0]
+        dy = b[1] - a[1]
+        length = math.hypot(dx, dy)
+        if length == 0:
+            continue
+        nx = -dy / length * radius
+        ny = dx / length * radius
+        shapes.append([
+            (int(round(a[0] + nx)), int(round(a[1] + ny))),
+            (int(round(b[0] + nx)), int(round(b[1] + ny))),
+            (int(round(b[0] - nx)), int(round(b[1] - ny))),
+            (int(round(a[0] - nx)), int(round(a[1] - ny)))
+        ])
+
+        p = ring[i - 1]
+        turn = (a[0] - p[0]) * (b[1] - a[1]) - (a[1] - p[1]) * (b[0] - a[0])
+        if (turn > 0) == convex:
+            shapes.append(_circle(a, radius))
+    return shapes
+
+
+def deflate(pieces, radius):
+    result = []
+    for outline, holes in pieces:
+        cutters = list(holes)
+        for ring in [outline] + holes:
+            cutters += _capsules(ring, radius, False)
+        result += difference([outline], cutters)
+    return result
+
+
+def inflate(pieces, radius):
+    result = []
+    for outline, holes in pieces:
+        shapes = [outline] + _capsules(outline, radius, True)
+        for h in holes:
+            shapes += _capsules(h, radius, True)
+        cores = []
+        for h in holes:
+            cores += [o for o, _ in deflate([(list(reversed(h)), [])], radius)]
+        result += difference(shapes, cores) if cores else union(shapes)
+    return result
+
+
+def fill_polygon(outline, holes=(), obstacles=(), min_thickness=MIN_THICKNESS):
+    """
+    Fill of a single zone polygon given in grid units. Returns a list of
+    (outline, holes) pairs in grid units.
+    """
+    pieces = difference([outline], list(holes) + list(obstacles))
+
+    radius = min_thickness * GRID_SCALE / 2
+    if radius > 0:
+        pieces = inflate(deflate(pieces, radius), radius)
+    return pieces
+
+
+class ZoneFiller:
+    def __init__(self, clearance=CLEARANCE, min_thickness=MIN_THICKNESS, via_size=VIA_SIZE):
+        self.clearance = clearance
+        self.min_thickness = min_thickness
+        self.via_size = via_size
+        self.vias = []
+        self.zones = []
+        self.grown = {}
+        self.cache = {}
+
+    def add_vias(self, net, vias):
+        self.vias += [(net, to_grid([v.to_vertex()])[0]) for v in vias]
+
+    def add_zones(self, net, polygons):
+        """Registers the electrode polygons (in millimetres) of a net."""
+        for vs in polygons:
+            vs = [(float(x), float(y)) for x, y in vs]
+            if signed_area2(vs) < 0:
+                vs.reverse()
+            ring = to_grid(vs)
+            xs = [v[0] for v in ring]
+            ys = [v[1] for v in ring]
+            self.zones.append((net, vs, ring, (min(xs), min(ys), max(xs), max(ys))))
+
+    def _grow(self, ring):
+        return [o for o, _ in inflate([(list(ring), [])], self.clearance * GRID_SCALE)]
+
+    def via_obstacles(self, net, outline):
+        reach = (self.via_size / 2 + self.clearance) * GRID_SCALE
+        xs = [v[0] for v in outline]
+        ys = [v[1] for v in outline]
+
+        return [
+            _circle(c, reach) for n, c in self.vias
+            if n != net and
+            min(xs) - reach <= c[0] <= max(xs) + reach and
+            min(ys) - reach <= c[1] <= max(ys) + reach and
+            (_inside(c, outline) or _distance(c, outline) < reach)
+        ]
+
+    def neighbours(self, net, outline):
+        """Indices of the other nets' electrodes closer than the clearance."""
+        reach = self.clearance * GRID_SCALE
+        xs = [v[0] for v in outline]
+        ys = [v[1] for v in outline]
+
+        return [
+            k for k, (n, _, ring, (x0, y0, x1, y1)) in enumerate(self.zones)
+            if n != net and
+            x0 - reach <= max(xs) and min(xs) <= x1 + reach and
+            y0 - reach <= max(ys) and min(ys) <= y1 + reach and
+            _near(outline, ring, reach)
+        ]
+
+    def obstacles(self, net, outline):
+        obstacles = self.via_obstacles(net, outline)
+        for k in self.neighbours(net, outline):
+            if k not in self.grown:
+                self.grown[k] = self._grow(self.zones[k][2])
+            obstacles += self.grown[k]
+        return obstacles
+
+    def fill(self, net, outline, holes=()):
+        """
+        Fill of a zone polygon given in millimetres, as a list of
+        (outline, holes) pairs in millimetres.
+        """
+        grid = to_grid(outline)
+
+        if holes or len(outline) < 2 or self.via_obstacles(net, grid):
+            pieces = fill_polygon(grid, [to_grid(h) for h in holes], self.obstacles(net, grid), self.min_thickness)
+            return [(from_grid(o), [from_grid(h) for h in hs]) for o, hs in pieces]
+
+        # Electrodes repeat around the ring, and so do their neighbours, so
+        # fills are cached in a frame anchored on the first edge and moved
+        # back into place.
+        ox, oy = outline[0]
+        theta = math.atan2(outline[1][1] - oy, outline[1][0] - ox)
+        s, c = math.sin(theta), math.cos(theta)
+
+        def local(vs):
+            return tuple(to_grid([(c * (x - ox) + s * (y - oy), -s * (x - ox) + c * (y - oy)) for x, y in vs]))
+
+        key = (local(outline), tuple(sorted(local(self.zones[k][1]) for k in self.neighbours(net, grid))))
+        if key not in self.cache:
+            obstacles = [o for ring in key[1] for o in self._grow(ring)]
+            self.cache[key] = fill_polygon(list(key[0]), (), obstacles, self.min_thickness)
+
+        def place(ring):
+            return [(c * x / GRID_SCALE - s * y / GRID_SCALE + ox, s * x / GRID_SCALE + c * y / GRID_SCALE + oy) for x, y in ring]
+
+        return [(place(o), [place(h) for h in hs]) for o, hs in self.cache[key]]
+
+
+def component_filler(component, **kwargs):
+    filler = ZoneFiller(**kwargs)
+    for s in component.signals:
+        filler.add_vias(s.name, s.vias)
+        filler.add_zones(s.name, electrode_polygons(s.electrodes))
+    return filler
+
+
+def fill_area(pieces):
+    return sum(abs(signed_area2(o)) - sum(abs(signed_area2(h)) for h in hs) for o, hs in pieces) / 2.0
@@ -0,0 +1,246 @@
+import sys
+import json
+import struct
+import numbers
+import hashlib
+import argparse
+
+import numpy as np
+
+from .graph import DEFAULT_SPEC, load_spec
+from .cli import document
+
+# Stable fingerprints of a CLI document. Every coordinate and size is
+# rounded to QUANTUM before hashing, so float formatting and last-bit noise
+# do not count as changes. Primitives are grouped by layer (vias and holes
+# form their own groups), and each group's fingerprints are folded into a
+# Merkle root; a manifest's root covers all groups.
+#
+# A primitive's id is its kind, net and quantized anchor point, so inserting
+# or removing one primitive leaves the ids of the others alone. Primitives
+# sharing an anchor are told apart by their order.
+#
+# Comparing two manifests compares roots first and only looks at the
+# primitives of groups whose roots differ.
+
+QUANTUM = 1e-5
+VERSION = 1
+
+KINDS = ['zones', 'tracks', 'vias', 'graphics', 'holes']
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _q(x):
+    return int(round(x / QUANTUM))
+
+
+def _feed(h, value):
+    if isinstance(value, dict):
+        h.update(b'{')
+        for key in sorted(value):
+            h.update(key.encode('utf-8') + b':')
+            _feed(h, value[key])
+        h.update(b'}')
+    elif isinstance(value, str):
+        h.update(b's' + value.encode('utf-8') + b'\0')
+    elif isinstance(value, bool) or value is None:
+        h.update(b'b' + repr(value).encode('ascii'))
+    elif isinstance(value, numbers.Real):
+        h.update(b'n' + struct.pack('<q', _q(value)))
+    else:
+        # Point lists in one go; anything ragged or mixed item by item.
+        try:
+            points = np.asarray(value, dtype=float)
+        except (TypeError, ValueError):
+            points = None
+        if points is not None and points.ndim == 2 and points.shape[1] == 2:
+            h.update(b'p' + struct.pack('<q', len(points)))
+            h.update(np.rint(points / QUANTUM).astype('<i8').tobytes())
+        else:
+            h.update(b'[')
+            for v in value:
+                _feed(h, v)
+            h.update(b']')
+
+
+def primitive_fingerprint(item):
+    """Hex fingerprint of one zone, track, via, graphic or hole."""
+    h = hashlib.blake2b(digest_size=16)
+    _feed(h, item)
+    return h.hexdigest()
+
+
+def _group(kind, item):
+    if kind in ('vias', 'holes'):
+        return kind
+    return item['layer']
+
+
+def _anchor(item):
+    if 'polygons' in item:
+        return list(item['polygons'][0]['points'][0])
+    for key in ['points', 'start', 'point', 'center']:
+        if key in item:
+            p = item[key]
+            return list(p[0] if key == 'points' else p)
+    return None
+
+
+def primitive_id(kind, item):
+    """Id of a primitive before disambiguation, e.g. "vias/S+@12.50000,-3.00000"."""
+    name = '%s/%s' % (kind, item.get('net', item.get('shape', '')))
+    at = _anchor(item)
+    if at is None:
+        return name
+    return name + '@' + ','.join('%.5f' % (_q(x) * QUANTUM) for x in at)
+
+
+def merkle_root(leaves):
+    """Root of a binary hash tree over `leaves` (bytes), as hex."""
+    level = list(leaves) or [_digest(b'')]
+    while len(level) > 1:
+        level = [_digest(b''.join(level[i:i + 2])) for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def _layer_root(primitives):
+    return merkle_root(
+        _digest(('%s=%s' % (pid, p['hash'])).encode('utf-8')) for pid, p in sorted(primitives.items()))
+
+
+def manifest(document):
+    """
+    Fingerprints of every primitive of `document`, keyed by group and by
+    primitive_id, with group roots and the overall root. The second and
+    later primitives with the same id in a group get a "#1", "#2", ... suffix.
+    """
+    layers = {}
+    counts = {}
+    for kind in KINDS:
+        for item in document.get(kind, []):
+            pid = primitive_id(kind, item)
+            key = (_group(kind, item), pid)
+            counts[key] = counts.get(key, -1) + 1
+            if counts[key]:
+                pid = '%s#%d' % (pid, counts[key])
+            group = layers.setdefault(key[0], {"primitives": {}})
+            group["primitives"][pid] = {
+                "hash": primitive_fingerprint(item),
+                "at": _anchor(item)
+            }
+
+    for group in layers.values():
+        group["root"] = _layer_root(group["primitives"])
+
+    return {
+        "version": VERSION,
+        "quantum": QUANTUM,
+        "root": merkle_root(_digest(('%s=%s' % (k, g["root"])).encode('utf-8')) for k, g in sorted(layers.items())),
+        "layers": layers
+    }
+
+
+class Difference:
+    def __init__(self, layer, status, primitive, at):
+        self.layer = layer
+        self.status = status
+        self.primitive = primitive
+        self.at = at
+
+    def __str__(self):
+        where = '' if self.at is None else ' at (%.4f, %.4f)' % tuple(self.at)
+        return '%-9s %-10s %s%s' % (self.status, self.layer, self.primitive, where)
+
+
+def compare(a, b):
+    """
+    Differences from manifest `a` to manifest `b`: primitives "changed",
+    "added" or "removed", in layer and id order. Empty when the roots match.
+    """
+    if a["quantum"] != b["quantum"]:
+        raise ValueError("manifests quantized differently (%g, %g)" % (a["quantum"], b["quantum"]))
+    if a["root"] == b["root"]:
+        return []
+
+    differences = []
+    for layer in sorted(set(a["layers"]) | set(b["layers"])):
+        pa = a["layers"].get(layer, {"primitives": {}, "root": None})
+        pb = b["layers"].get(layer, {"primitives": {}, "root": None})
+        if pa["root"] == pb["root"]:
+            continue
+
+        pa, pb = pa["primitives"], pb["primitives"]
+        for pid in sorted(set(pa) | set(pb)):
+            if pid not in pb:
+                differences.append(Difference(layer, 'removed', pid, pa[pid]["at"]))
+            elif pid not in pa:
+                differences.append(Difference(layer, 'added', pid, pb[pid]["at"]))
+            elif pa[pid]["hash"] != pb[pid]["hash"]:
+                differences.append(Difference(layer, 'changed', pid, pb[pid]["at"]))
+    return differences
+
+
+def load_manifest(path):
+    """A manifest file, or a CLI document file fingerprinted on the fly."""
+    with open(path) as f:
+        value = json.load(f)
+    return value if "layers" in value else manifest(value)
+
+
+def _generate(spec_path):
+    # Exactly what `geomgen.cli --spec` prints.
+    spec = load_spec(spec_path) if spec_path else dict(DEFAULT_SPEC)
+    return manifest(json.loads(json.dumps(document(spec))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='geomgen.fingerprint', description='fingerprint and compare generated geometry')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    p = commands.add_parser('manifest', help='write the manifest of a design or of a CLI document')
+    p.add_argument('--spec', metavar='SPEC', help='design spec (default: the stock stator)')
+    p.add_argument('--document', metavar='JSON', help='fingerprint this geomgen.cli output instead')
+    p.add_argument('-o', '--output', help='file to write (default: stdout)')
+
+    p = commands.add_parser('compare', help='compare two manifests or CLI documents')
+    p.add_argument('a')
+    p.add_argument('b')
+
+    p = commands.add_parser('check', help='compare a freshly generated design against a golden manifest')
+    p.add_argument('golden')
+    p.add_argument('--spec', metavar='SPEC', help='design spec (default: the stock stator)')
+    p.add_argument('--update', action='store_true', help='rewrite the golden instead of comparing')
+    args = parser.parse_args(argv)
+
+    if args.command == 'manifest':
+        m = load_manifest(args.document) if args.document else _generate(args.spec)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(m, f, indent=1, sort_keys=True)
+        else:
+            json.dump(m, sys.stdout, indent=1, sort_keys=True)
+            sys.stdout.write("\n")
+        return
+
+    if args.command == 'compare':
+        a, b = load_manifest(args.a), load_manifest(args.b)
+    else:
+        b = _generate(args.spec)
+        if args.update:
+            with open(args.golden, 'w') as f:
+                json.dump(b, f, indent=1, sort_keys=True)
+            return
+        a = load_manifest(args.golden)
+
+    differences = compare(a, b)
+    for d in differences:
+        print(d)
+    print("%d primitives differ" % len(differences) if differences else "identical (%s)" % b["root"])
+
+    sys.exit(1 if differences else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import math
+import uuid
+
+from .boolean import fracture
+
+# Writes a CLI document (zones, tracks, vias, graphics, holes) as a
+# self-contained KiCad 6 .kicad_pcb whose items all belong to one named
+# group. The plugin loads it with pcbnew.LoadBoard and moves the items into
+# the open board in one pass, instead of building every zone vertex by
+# vertex through the API.
+
+GROUP_NAME = 'CapEncoderGen'
+VERSION = 20211014
+
+LAYERS = [
+    (0, 'F.Cu', 'signal'),
+    (31, 'B.Cu', 'signal'),
+    (36, 'B.SilkS', 'user', 'B.Silkscreen'),
+    (37, 'F.SilkS', 'user', 'F.Silkscreen'),
+    (38, 'B.Mask', 'user'),
+    (39, 'F.Mask', 'user'),
+    (44, 'Edge.Cuts', 'user')
+]
+
+# Stable timestamps, so that regenerating the same design writes the same
+# file.
+_NAMESPACE = uuid.UUID('6f1c1d0e-3d5c-4a63-8d55-2a1f0b7c9e41')
+
+
+def _num(v):
+    text = ('%.6f' % v).rstrip('0').rstrip('.')
+    return '0' if text in ('', '-0') else text
+
+
+def _xy(p):
+    return '%s %s' % (_num(p[0]), _num(p[1]))
+
+
+def _str(s):
+    return '"%s"' % s.replace('\\', '\\\\').replace('"', '\\"')
+
+
+def _pts(points, indent):
+    rows = []
+    for i in range(0, len(points), 4):
+        rows.append(indent + '  ' + ' '.join('(xy %s)' % _xy(p) for p in points[i:i + 4]))
+    return '(pts\n%s\n%s)' % ('\n'.join(rows), indent)
+
+
+def _rotate(center, p, degrees):
+    theta = math.radians(degrees)
+    s, c = math.sin(theta), math.cos(theta)
+    dx = p[0] - center[0]
+    dy = p[1] - center[1]
+    return (c * dx - s * dy + center[0], s * dx + c * dy + center[1])
+
+
+class FragmentWriter:
+    def __init__(self, stream, group=GROUP_NAME):
+        self.stream = stream
+        self.group = group
+        self.members = []
+        self.nets = {}
+        self.holes = 0
+        self.transform = None
+        self.prefix = ''
+
+    def tstamp(self):
+        t = str(uuid.uuid5(_NAMESPACE, '%s/%d' % (self.group, len(self.members))))
+        self.members.append(t)
+        return t
+
+    def net(self, name):
+        name = self.prefix + name
+        if name not in self.nets:
+            self.nets[name] = len(self.nets) + 1
+        return self.nets[name]
+
+    def p(self, point):
+        return point if self.transform is None else self.transform(point)
+
+    def ps(self, points):
+        return points if self.transform is None else [self.transform(q) for q in points]
+
+    def write(self, document):
+        self.write_instances([(document, None, '')])
+
+    def write_instances(self, instances, graphics=()):
+        """
+        Writes several documents into one board. `instances` holds
+        (document, transform, net prefix) triples: transform maps a point
+        of the document to the board (None for identity), and the prefix is
+        prepended to its net names. `graphics` are written untransformed.
+        Items are transformed as they are written, so documents shared by
+        several instances are never copied.
+        """
+        # Net codes go in the header, ahead of the items using them.
+        for document, _, prefix in instances:
+            self.prefix = prefix
+            for kind in ['zones', 'tracks', 'vias']:
+                for item in document.get(kind, []):
+                    self.net(item['net'])
+
+        w = self.stream.write
+        w('(kicad_pcb (version %d) (generator geomgen)\n\n' % VERSION)
+        w('  (general\n    (thickness 1.6)\n  )\n\n')
+        w('  (paper "A4")\n  (layers\n')
+        for layer in LAYERS:
+            w('    (%d %s %s%s)\n' % (layer[0], _str(layer[1]), layer[2], ' ' + _str(layer[3]) if len(layer) > 3 else ''))
+        w('  )\n\n  (setup\n    (pad_to_mask_clearance 0)\n  )\n\n')
+
+        w('  (net 0 "")\n')
+        for name, code in sorted(self.nets.items(), key=lambda n: n[1]):
+            w('  (net %d %s)\n' % (code, _str(name)))
+        w('\n')
+
+        for document, transform, prefix in instances:
+            self.transform = transform
+            self.prefix = prefix
+            for z in document.get('zones', []):
+                w(self.zone(z))
+            for t in document.get('tracks', []):
+                w(self.segment(t))
+            for v in document.get('vias', []):
+                w(self.via(v))
+            for g in document.get('graphics', []):
+                w(self.graphic(g))
+            for h in document.get('holes', []):
+                w(self.hole(h))
+
+        self.transform = None
+        self.prefix = ''
+        for g in graphics:
+            w(self.graphic(g))
+
+        w('  (group %s (id %s)\n    (members\n' % (_str(self.group), uuid.uuid5(_NAMESPACE, self.group)))
+        for i in range(0, len(self.members), 4):
+            w('      %s\n' % ' '.join(self.members[i:i + 4]))
+        w('    )\n  )\n)\n')
+
+    def zone(self, z):
+        code = self.net(z['net'])
+        if 'polygons' in z:
+            outlines = [fracture(p['points'], p['holes']) if p['holes'] else p['points'] for p in z['polygons']]
+        else:
+            outlines = [z['points']]
+
+        lines = [
+            '  (zone (net %d) (net_name %s) (layer %s) (tstamp %s) (name %s) (hatch edge 0.508)' % (
+                code, _str(self.prefix + z['net']), _str(z['layer']), self.tstamp(), _str(self.group)),
+            '    (connect_pads (clearance 0))',
+            '    (min_thickness %s) (filled_areas_thickness no)' % _num(z.get('min_thickness', 0.0254)),
+            '    (fill yes (thermal_gap 0.508) (thermal_bridge_width 0.508))'
+        ]
+        for o in outlines:
+            lines.append('    (polygon\n      %s\n    )' % _pts(self.ps(o), '      '))
+        for f in z.get('fill', []):
+            pts = fracture(f['points'], f['holes']) if f['holes'] else f['points']
+            lines.append('    (filled_polygon\n      (layer %s)\n      %s\n    )' % (_str(z['layer']), _pts(self.ps(pts), '      ')))
+        lines.append('  )')
+        return '\n'.join(lines) + '\n'
+
+    def segment(self, t):
+        return '  (segment (start %s) (end %s) (width %s) (layer %s) (net %d) (tstamp %s))\n' % (
+            _xy(self.p(t['start'])), _xy(self.p(t['end'])), _num(t['width']), _str(t['layer']), self.net(t['net']), self.tstamp())
+
+    def via(self, v):
+        return '  (via (at %s) (size %s) (drill %s) (layers "F.Cu" "B.Cu") (net %d) (tstamp %s))\n' % (
+            _xy(self.p(v['point'])), _num(v['size']), _num(v['drill']), self.net(v['net']), self.tstamp())
+
+    def graphic(self, g):
+        layer = _str(g['layer'])
+        width = _num(g['width'])
+        shape = g['shape']
+        if shape == 'line':
+            return '  (gr_line (start %s) (end %s) (layer %s) (width %s) (tstamp %s))\n' % (
+                _xy(self.p(g['start'])), _xy(self.p(g['end'])), layer, width, self.tstamp())
+        if shape == 'circle':
+            center = self.p(g['center'])
+            end = (center[0] + g['radius'], center[1])
+            return '  (gr_circle (center %s) (end %s) (layer %s) (width %s) (fill none) (tstamp %s))\n' % (
+                _xy(center), _xy(end), layer, width, self.tstamp())
+        if shape == 'arc':
+            mid = _rotate(g['center'], g['start'], g['angle'] / 2.0)
+            end = _rotate(g['center'], g['start'], g['angle'])
+            return '  (gr_arc (start %s) (mid %s) (end %s) (layer %s) (width %s) (tstamp %s))\n' % (
+                _xy(self.p(g['start'])), _xy(self.p(mid)), _xy(self.p(end)), layer, width, self.tstamp())
+        if shape == 'polygon':
+            return '  (gr_poly\n    %s (layer %s) (width %s) (fill solid) (tstamp %s))\n' % (
+                _pts(self.ps(g['points']), '    '), layer, width, self.tstamp())
+        raise ValueError("unknown shape %s" % shape)
+
+    def hole(self, h):
+        self.holes += 1
+        d = _num(h['diameter'])
+        return (
+            '  (footprint "MountingHole:MountingHole_%smm" (layer "F.Cu") (tstamp %s)\n'
+            '    (at %s)\n'
+            '    (attr exclude_from_pos_files exclude_from_bom)\n'
+            '    (fp_text reference "H%d" (at 0 0) (layer "F.SilkS") hide\n'
+            '      (effects (font (size 1 1) (thickness 0.15)))\n'
+            '    )\n'
+            '    (fp_text value "" (at 0 0) (layer "F.Fab") hide\n'
+            '      (effects (font (size 1 1) (thickness 0.15)))\n'
+            '    )\n'
+            '    (pad "" np_thru_hole circle (at 0 0) (size %s %s) (drill %s) (layers *.Cu *.Mask))\n'
+            '  )\n') % (d, self.tstamp(), _xy(self.p(h['point'])), self.holes, d, d, d)
+
+
+def write_fragment(document, stream, group=GROUP_NAME):
+    """
+    Writes `document` to `stream` as a .kicad_pcb holding only generated
+    items, all members of the group `group`.
+    """
+    FragmentWriter(stream, group).write(document)
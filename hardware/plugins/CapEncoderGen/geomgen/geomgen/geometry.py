@@ -1,16 +1,55 @@
 import math
 from scipy.optimize import minimize
 
+from .shapes import resolve_shape, electrode_polygons
+
 ROTOR_INSET = 2
 STAGE_INSET = 1
 STAGE_SPACING = 0.5
 BUS_PITCH = 0.75
 
+PERIODS = 36
+
+def stage_definitions(periods=PERIODS):
+    # (input_count, output_count, excitation_periods, induction_periods, annulus)
+    # The coarse stage has a third of the fine stage's output periods and
+    # the vernier stage one period fewer than the fine one.
+    if periods < 6 or periods % 3:
+        raise ValueError("periods must be a multiple of 3, at least 6")
+    return [
+        (4, 4, periods, periods // 3, 1),
+        (4, 2, periods, periods, 2),
+        (4, 2, periods - 1, periods - 1, 0)
+    ]
+
+STAGE_DEFINITIONS = stage_definitions()
+
+class StageOptions:
+    def __init__(self,
+                 clip_induction,
+                 invert_bus,
+                 start_butt,
+                 end_butt):
+        self.clip_induction = clip_induction
+        self.invert_bus = invert_bus
+        self.start_butt = start_butt
+        self.end_butt = end_butt
+
 class Component:
-    def __init__(self, inner_radial_diameter, outer_radial_diameter, box_dimension):
+    # Per stage: options, and which of its layers carries which nets.
+    STAGE_OPTIONS = []
+    SIGNAL_LAYERS = []
+
+    def __init__(self, inner_radial_diameter, outer_radial_diameter, box_dimension,
+                 stage_spacing=STAGE_SPACING, bus_pitch=BUS_PITCH, shapes=None,
+                 rotor_inset=ROTOR_INSET, periods=PERIODS, outline_only=False):
         self.inner_radial_diameter = inner_radial_diameter
         self.outer_radial_diameter = outer_radial_diameter
         self.box_dimension = box_dimension
+        self.bus_pitch = bus_pitch
+        self.shapes = shapes
+        self.rotor_inset = rotor_inset
+        self.periods = periods
 
         self.signals = list()
         
@@ -19,18 +58,34 @@ class Component:
         self.silks = Graphics()
         self.holes = list()
 
-        stage_ir = self.outer_radial_diameter / 2 + STAGE_INSET
-        stage_or = self.box_dimension / 2 - STAGE_INSET - ROTOR_INSET
+        self.build_edge_cuts()
+        self.build_holes()
+        self.build_masks()
+        self.build_silks()
 
-        self.ann = self.compute_annuli(stage_ir, stage_or, STAGE_SPACING)
+        # The outline alone needs neither the annuli nor any stage.
+        if outline_only:
+            return
+
+        self.ann = stage_annuli(outer_radial_diameter, box_dimension, stage_spacing, rotor_inset)
+        self.build_stages(self.STAGE_OPTIONS)
+        self.build_signals()
 
     def build_stages(self, options):
         self.stages = [
-            Stage(4, 4, 36, 12, self.ann[1][0], self.ann[1][1], options[0]),
-            Stage(4, 2, 36, 36, self.ann[2][0], self.ann[2][1], options[1]),
-            Stage(4, 2, 35, 35, self.ann[0][0], self.ann[0][1], options[2])
+            build_stage(i, self.ann, options[i], self.bus_pitch, self.shapes, self.periods)
+            for i in range(len(STAGE_DEFINITIONS))
         ]
 
+    def build_signals(self):
+        for stage, (layer, names) in zip(self.stages, self.SIGNAL_LAYERS):
+            self.add_layer(getattr(stage, layer), names)
+
+    def stage_signals(self):
+        """The signals of each stage, in stage order."""
+        signals = iter(self.signals)
+        return [[next(signals) for _ in names] for _, names in self.SIGNAL_LAYERS]
+
     def build_masks(self):
         rx = self.box_dimension / 2 + 1
         ry = self.box_dimension / 2 + 1
@@ -42,58 +97,70 @@ class Component:
             [-rx,  ry]
         ])]    
 
-    def compute_annuli(self, ri, ro, rsp):
-        S = ro - ri - 2 * rsp
-
-        def objective(x):
-            return -x[0]
-        def constraint(x):
-            drs = compute_drs(x[0])
-            return S - drs[0] - drs[1] - drs[2]
-        def compute_drs(dr1):
-            r1 = ri
-            A = (r1 + dr1) ** 2 - r1 ** 2
-            r2 = r1 + dr1 + rsp
-            dr2 = math.sqrt(r2 ** 2 + A) - r2
-            r3 = r2 + dr2 + rsp
-            dr3 = math.sqrt(r3 ** 2 + A) - r3
-            return (dr1, dr2, dr3)
-        def compute_ranges(drs):
-            r1 = ri
-            r2 = r1 + drs[0] + rsp
-            r3 = r2 + drs[1] + rsp
-            return ((r1, r1 + drs[0]), (r2, r2 + drs[1]), (r3, r3 + drs[2]))
-
-        x0 = [0]
-        bounds = [(0, S)]
-        constraints = [{'type': 'eq', 'fun': constraint}]
-        sol = minimize(objective, x0, method='SLSQP', bounds=bounds, constraints=constraints)
-        drs = compute_drs(sol.x[0])
-        return compute_ranges(drs)
-
     def add_layer(self, layer, signal_names):
-        for l, sn in zip(layer.groups, signal_names):
-            self.signals.append(ComponentSignal(sn, l.arc, l.electrodes, l.vias))
+        self.signals += layer_signals(layer, signal_names)
+
+def stage_annuli(outer_radial_diameter, box_dimension, stage_spacing=STAGE_SPACING, rotor_inset=ROTOR_INSET):
+    stage_ir = outer_radial_diameter / 2 + STAGE_INSET
+    stage_or = box_dimension / 2 - STAGE_INSET - rotor_inset
+    return compute_annuli(stage_ir, stage_or, stage_spacing)
+
+def compute_annuli(ri, ro, rsp):
+    S = ro - ri - 2 * rsp
+
+    def objective(x):
+        return -x[0]
+    def constraint(x):
+        drs = compute_drs(x[0])
+        return S - drs[0] - drs[1] - drs[2]
+    def compute_drs(dr1):
+        r1 = ri
+        A = (r1 + dr1) ** 2 - r1 ** 2
+        r2 = r1 + dr1 + rsp
+        dr2 = math.sqrt(r2 ** 2 + A) - r2
+        r3 = r2 + dr2 + rsp
+        dr3 = math.sqrt(r3 ** 2 + A) - r3
+        return (dr1, dr2, dr3)
+    def compute_ranges(drs):
+        r1 = ri
+        r2 = r1 + drs[0] + rsp
+        r3 = r2 + drs[1] + rsp
+        return ((r1, r1 + drs[0]), (r2, r2 + drs[1]), (r3, r3 + drs[2]))
+
+    x0 = [0]
+    bounds = [(0, S)]
+    constraints = [{'type': 'eq', 'fun': constraint}]
+    sol = minimize(objective, x0, method='SLSQP', bounds=bounds, constraints=constraints)
+    drs = compute_drs(sol.x[0])
+    return compute_ranges(drs)
+
+def build_stage(index, annuli, options, bus_pitch=BUS_PITCH, shapes=None, periods=PERIODS):
+    input_count, output_count, excitation_periods, induction_periods, a = stage_definitions(periods)[index]
+    return Stage(input_count, output_count, excitation_periods, induction_periods,
+                 annuli[a][0], annuli[a][1], options, bus_pitch, stage_shapes(shapes, index))
+
+def stage_shapes(shapes, index):
+    # Spec files key stages by string; code may use ints or a list.
+    if not shapes:
+        return None
+    if isinstance(shapes, dict):
+        return shapes.get(index, shapes.get(str(index)))
+    return shapes[index] if index < len(shapes) else None
+
+def layer_signals(layer, signal_names):
+    return [ComponentSignal(sn, l.arc, l.electrodes, l.vias) for l, sn in zip(layer.groups, signal_names)]
 
 class StatorComponent(Component):
-    def __init__(self, inner_radial_diameter, outer_radial_diameter, box_dimension):
-        super(StatorComponent, self).__init__(inner_radial_diameter, outer_radial_diameter, box_dimension)
-
-        stage_options = [
-            StageOptions(True, True, False, False),
-            StageOptions(True, False, False, False),
-            StageOptions(True, False, True, False)
-        ]
-
-        self.build_stages(stage_options)
-
-        self.add_layer(self.stages[0].input_layer, ['S+', 'C+', 'S-', 'C-'])
-        self.add_layer(self.stages[1].output_layer, ['O+', 'O-'])
-        self.add_layer(self.stages[2].output_layer, ['I+', 'I-'])
-
-        self.build_edge_cuts()
-        self.build_masks()
-        self.build_silks()
+    STAGE_OPTIONS = [
+        StageOptions(True, True, False, False),
+        StageOptions(True, False, False, False),
+        StageOptions(True, False, True, False)
+    ]
+    SIGNAL_LAYERS = [
+        ('input_layer', ['S+', 'C+', 'S-', 'C-']),
+        ('output_layer', ['O+', 'O-']),
+        ('output_layer', ['I+', 'I-'])
+    ]
 
     def build_edge_cuts(self):
         r1 = self.box_dimension / 2
@@ -122,46 +189,46 @@ class StatorComponent(Component):
                 mid_line
             ]
 
+        self.edge_cuts.circles += [
+            GraphicCircle([0, 0], self.outer_radial_diameter / 2)
+        ]
+
+    def build_holes(self):
+        # One at the start of each corner arc of the edge cuts.
+        r1 = self.box_dimension / 2
+        x = 2 * math.sqrt(r1 * 4)
+        y1 = r1 - 4
+
+        for angle in range(0, 360, 90):
             self.holes += [
                 MountingHole(rot([x, y1], angle)),
                 MountingHole(rot([y1, x], angle))
             ]
 
-        self.edge_cuts.circles += [
-            GraphicCircle([0, 0], self.outer_radial_diameter / 2)
-        ]
-
     def build_silks(self):
         self.silks.circles += [
-            GraphicCircle([0, 0], self.box_dimension / 2 - ROTOR_INSET)
+            GraphicCircle([0, 0], self.box_dimension / 2 - self.rotor_inset)
         ]
 
 class RotorComponent(Component):
-    def __init__(self, inner_radial_diameter, outer_radial_diameter, box_dimension):
-        super(RotorComponent, self).__init__(inner_radial_diameter, outer_radial_diameter, box_dimension)
-
-        stage_options = [
-            StageOptions(False, False, True, True),
-            StageOptions(False, False, True, False),
-            StageOptions(False, True, False, False)
-        ]
-
-        self.build_stages(stage_options)    
-
-        self.add_layer(self.stages[0].output_layer, ['UO1', 'UO2', 'UO3', 'UO4'])
-        self.add_layer(self.stages[1].input_layer, ['UO1', 'UO2', 'UO3', 'UO4'])
-        self.add_layer(self.stages[2].input_layer, ['UO4', 'UO3', 'UO2', 'UO1'])
-
-        self.build_edge_cuts()
-        self.build_masks()
-        self.build_silks()
+    STAGE_OPTIONS = [
+        StageOptions(False, False, True, True),
+        StageOptions(False, False, True, False),
+        StageOptions(False, True, False, False)
+    ]
+    SIGNAL_LAYERS = [
+        ('output_layer', ['UO1', 'UO2', 'UO3', 'UO4']),
+        ('input_layer', ['UO1', 'UO2', 'UO3', 'UO4']),
+        ('input_layer', ['UO4', 'UO3', 'UO2', 'UO1'])
+    ]
 
     def build_edge_cuts(self):
         self.edge_cuts.circles += [
-            GraphicCircle([0, 0], self.box_dimension / 2 - ROTOR_INSET),
+            GraphicCircle([0, 0], self.box_dimension / 2 - self.rotor_inset),
             GraphicCircle([0, 0], self.inner_radial_diameter / 2)
         ]
 
+    def build_holes(self):
         self.holes += [
             MountingHole(rot([22, 0], angle)) for angle in range(0, 360, 60)
         ]
@@ -178,17 +245,6 @@ class ComponentSignal:
         self.electrodes = electrodes
         self.vias = vias
 
-class StageOptions:
-    def __init__(self,
-                 clip_induction,
-                 invert_bus,
-                 start_butt,
-                 end_butt):
-        self.clip_induction = clip_induction
-        self.invert_bus = invert_bus
-        self.start_butt = start_butt
-        self.end_butt = end_butt
-
 class Stage:
     def __init__(self,               
                  input_count,
@@ -197,7 +253,9 @@ class Stage:
                  induction_periods,
                  inner_radius,
                  outer_radius,
-                 options):
+                 options,
+                 bus_pitch=BUS_PITCH,
+                 shapes=None):
         excitation_count = input_count * excitation_periods
         induction_count = output_count * induction_periods
 
@@ -205,8 +263,13 @@ class Stage:
         induction_pitch_angle = 360 / float(induction_count)
         induction_width_angle = 2 * excitation_angle
 
+        # Shapes as (profile, params); a stage's spec may override either.
+        shapes = shapes or {}
+        input_shape = resolve_shape(shapes.get('input'), ('trapezoidal', {'width_fraction': 0.5}))
+        output_shape = resolve_shape(shapes.get('output'), ('sinusoidal', {'cutoff': 0.025 if options.clip_induction else 0}))
+
         def build_excitation_electrode(sector):
-            return ExcitationElectrode(sector)
+            return ShapedElectrode(sector, *input_shape)
 
         self.input_layer = self.__build_layer(
             build_excitation_electrode,
@@ -216,13 +279,13 @@ class Stage:
             excitation_angle,
             inner_radius,
             outer_radius,
-            BUS_PITCH,
+            bus_pitch,
             options.invert_bus,
             options.start_butt,
             options.end_butt)
 
         def build_induction_electrode(sector):
-            return InductionElectrode(sector, 0.025 if options.clip_induction else 0)
+            return ShapedElectrode(sector, *output_shape)
 
         self.output_layer = self.__build_layer(
             build_induction_electrode,
@@ -232,7 +295,7 @@ class Stage:
             induction_width_angle,
             inner_radius,
             outer_radius,
-            BUS_PITCH,
+            bus_pitch,
             options.invert_bus,
             options.start_butt,
             options.end_butt)
@@ -312,72 +375,25 @@ class Electrode:
     def to_polygon():
         raise NotImplementedError
 
-class ExcitationElectrode(Electrode):
-    def __init__(self, sector):
-        super(ExcitationElectrode, self).__init__(sector)
+class ShapedElectrode(Electrode):
+    """An electrode drawn from a registered profile (see shapes.py)."""
+    def __init__(self, sector, profile, params=None):
+        super(ShapedElectrode, self).__init__(sector)
+        self.profile = profile
+        self.params = params or {}
 
     def to_polygon(self):
-        radius = self.sector.center_radius()
-        delta_radius = self.sector.radial_length() / 2
-
-        start_angle = self.sector.start_angle
-        end_angle = self.sector.end_angle
-
-        width_fraction = 0.5
-        base_theta = 0.5 * width_fraction * (end_angle - start_angle) + start_angle
-        width_angle = width_fraction * (end_angle - start_angle)
-
-        vertices = []
-
-        n = 2
-
-        for i in range(0, n + 1):
-            f = i / float(n)
-            r = radius + delta_radius
-            theta = base_theta + f * width_angle
-            vertices.append(from_polar(r, theta))
+        return electrode_polygons([self])[0]
 
-        for i in range(0, n + 1):
-            f = 1.0 - i / float(n)
-            r = radius - delta_radius
-            theta = base_theta + f * width_angle
-            vertices.append(from_polar(r, theta))
-
-        return vertices
+class ExcitationElectrode(ShapedElectrode):
+    def __init__(self, sector, width_fraction=0.5):
+        super(ExcitationElectrode, self).__init__(sector, 'trapezoidal', {'width_fraction': width_fraction})
 
-class InductionElectrode(Electrode):
+class InductionElectrode(ShapedElectrode):
     def __init__(self, sector, cutoff):
-        super(InductionElectrode, self).__init__(sector)
+        super(InductionElectrode, self).__init__(sector, 'sinusoidal', {'cutoff': cutoff})
         self.cutoff = cutoff
 
-    def to_polygon(self):
-        radius = self.sector.center_radius()
-        delta_radius = self.sector.radial_length() / 2
-
-        start_angle = self.sector.start_angle
-        end_angle = self.sector.end_angle
-
-        base_theta = start_angle
-        width_angle = end_angle - start_angle
-
-        vertices = []
-
-        for i in range(0, 12):
-            f = i / 11.0
-            fa = (1 - 2 * self.cutoff) * f + self.cutoff
-            r = radius + delta_radius * math.sin(math.pi * fa)
-            theta = base_theta + fa * width_angle
-            vertices.append(from_polar(r, theta))
-
-        for i in range(0, 12):
-            f = 1.0 - i / 11.0
-            fa = (1 - 2 * self.cutoff) * f + self.cutoff
-            r = radius - delta_radius * math.sin(math.pi * fa)
-            theta = base_theta + fa * width_angle
-            vertices.append(from_polar(r, theta))
-
-        return vertices
-
 class Arc:
     def __init__(self, radius, start_angle, end_angle):
         self.radius = radius
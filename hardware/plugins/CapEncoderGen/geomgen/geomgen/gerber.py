@@ -0,0 +1,587 @@
+import io
+import re
+import math
+from collections import defaultdict
+
+# Streaming readers for the RS-274X Gerber and Excellon drill files that
+# KiCad plots. Everything drawn is turned into polygons (in millimetres, in
+# the file's own coordinates) and can be put in a SpatialHash for lookups.
+
+CHUNK_SIZE = 1 << 16
+ARC_SEGMENTS = 64
+INCH = 25.4
+
+_WORD = re.compile(r'([XYIJDG])([+-]?[0-9.]+)')
+_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*|\.\d+)|\$(\d+)|([-+xX/()]))')
+
+
+class Aperture:
+    def __init__(self, shapes, diameter=None):
+        # Shapes are polygons relative to the flash point. Circular apertures
+        # also keep their diameter for stroking draws.
+        self.shapes = shapes
+        self.diameter = diameter
+
+    def scaled(self, factor):
+        return Aperture(
+            [[(x * factor, y * factor) for x, y in s] for s in self.shapes],
+            None if self.diameter is None else self.diameter * factor)
+
+
+class Primitive:
+    def __init__(self, kind, shapes, dark=True, function=None, net=None):
+        self.kind = kind
+        self.shapes = shapes
+        self.dark = dark
+        self.function = function
+        self.net = net
+
+        xs = [v[0] for s in shapes for v in s]
+        ys = [v[1] for s in shapes for v in s]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+
+    def contains(self, x, y, tolerance=0):
+        b = self.bbox
+        if x < b[0] - tolerance or x > b[2] + tolerance or y < b[1] - tolerance or y > b[3] + tolerance:
+            return False
+        for s in self.shapes:
+            if point_in_polygon(x, y, s):
+                return True
+            if tolerance > 0 and distance_to_polygon(x, y, s) <= tolerance:
+                return True
+        return False
+
+
+class Hole:
+    def __init__(self, x, y, diameter, plated, end=None):
+        self.x = x
+        self.y = y
+        self.diameter = diameter
+        self.plated = plated
+        self.end = end
+
+        r = diameter / 2
+        ex, ey = end if end is not None else (x, y)
+        self.bbox = (min(x, ex) - r, min(y, ey) - r, max(x, ex) + r, max(y, ey) + r)
+
+
+class SpatialHash:
+    def __init__(self, cell_size=1.0):
+        self.cell_size = cell_size
+        self.cells = defaultdict(list)
+        self.items = []
+
+    def _range(self, lo, hi):
+        return range(int(math.floor(lo / self.cell_size)), int(math.floor(hi / self.cell_size)) + 1)
+
+    def insert(self, item, bbox):
+        k = len(self.items)
+        self.items.append(item)
+        for i in self._range(bbox[0], bbox[2]):
+            for j in self._range(bbox[1], bbox[3]):
+                self.cells[(i, j)].append(k)
+
+    def query_bbox(self, bbox):
+        found = set()
+        for i in self._range(bbox[0], bbox[2]):
+            for j in self._range(bbox[1], bbox[3]):
+                found.update(self.cells.get((i, j), ()))
+        return [self.items[k] for k in sorted(found)]
+
+    def query_point(self, x, y, radius=0):
+        return self.query_bbox((x - radius, y - radius, x + radius, y + radius))
+
+
+class GerberLayer:
+    def __init__(self):
+        self.primitives = []
+        self.file_function = None
+        self.attributes = {}
+
+    def index(self, cell_size=1.0, dark_only=True):
+        grid = SpatialHash(cell_size)
+        for p in self.primitives:
+            if p.dark or not dark_only:
+                grid.insert(p, p.bbox)
+        return grid
+
+
+class DrillFile:
+    def __init__(self):
+        self.holes = []
+        self.plated = None
+        self.tools = {}
+
+    def index(self, cell_size=1.0):
+        grid = SpatialHash(cell_size)
+        for h in self.holes:
+            grid.insert(h, h.bbox)
+        return grid
+
+
+def point_in_polygon(x, y, vertices):
+    inside = False
+    n = len(vertices)
+    for i in range(n):
+        ax, ay = vertices[i]
+        bx, by = vertices[(i + 1) % n]
+        if (ay > y) != (by > y):
+            if x < ax + (y - ay) * (bx - ax) / (by - ay):
+                inside = not inside
+    return inside
+
+
+def distance_to_polygon(x, y, vertices):
+    best = float('inf')
+    n = len(vertices)
+    for i in range(n):
+        ax, ay = vertices[i]
+        bx, by = vertices[(i + 1) % n]
+        dx = bx - ax
+        dy = by - ay
+        l2 = dx * dx + dy * dy
+        t = 0 if l2 == 0 else max(0, min(1, ((x - ax) * dx + (y - ay) * dy) / l2))
+        best = min(best, math.hypot(ax + t * dx - x, ay + t * dy - y))
+    return best
+
+
+def circle(cx, cy, diameter, segments=32):
+    r = diameter / 2
+    return [(cx + r * math.cos(2 * math.pi * k / segments), cy + r * math.sin(2 * math.pi * k / segments))
+            for k in range(segments)]
+
+
+def stroke(x0, y0, x1, y1, width, segments=16):
+    # Capsule around a segment drawn with a round aperture.
+    r = width / 2
+    a = math.atan2(y1 - y0, x1 - x0)
+    half = [a + math.pi / 2 + math.pi * k / segments for k in range(segments + 1)]
+    return ([(x1 + r * math.cos(t - math.pi), y1 + r * math.sin(t - math.pi)) for t in half] +
+            [(x0 + r * math.cos(t), y0 + r * math.sin(t)) for t in half])
+
+
+def _rotate(vertices, degrees):
+    if degrees == 0:
+        return vertices
+    t = math.radians(degrees)
+    s, c = math.sin(t), math.cos(t)
+    return [(c * x - s * y, s * x + c * y) for x, y in vertices]
+
+
+def _blocks(stream):
+    # Yields ('ext', text) for %...% parameter blocks and ('data', text) for
+    # ordinary *-terminated blocks, reading the stream a chunk at a time.
+    buf = ''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if chunk:
+            buf += chunk
+
+        pos = 0
+        while True:
+            while pos < len(buf) and buf[pos] in '\r\n \t':
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] == '%':
+                end = buf.find('%', pos + 1)
+                if end < 0:
+                    break
+                yield ('ext', buf[pos + 1:end].replace('\r', '').replace('\n', ''))
+                pos = end + 1
+            else:
+                end = buf.find('*', pos)
+                if end < 0:
+                    break
+                yield ('data', buf[pos:end].replace('\r', '').replace('\n', ''))
+                pos = end + 1
+
+        buf = buf[pos:]
+        if not chunk:
+            return
+
+
+def _evaluate(expression, variables):
+    # Aperture macro arithmetic: numbers, $n variables, unary signs, + - x /
+    # and parentheses, with x and / binding tighter than + and -.
+    tokens = []
+    pos = 0
+    text = expression.rstrip()
+    while pos < len(text):
+        m = _TOKEN.match(text, pos)
+        if not m:
+            raise ValueError("unsupported aperture macro expression: %s" % expression)
+        number, variable, op = m.groups()
+        if number is not None:
+            tokens.append(float(number))
+        elif variable is not None:
+            tokens.append(float(variables.get(int(variable), 0.0)))
+        else:
+            tokens.append(op.lower())
+        pos = m.end()
+    tokens.append(None)
+    k = [0]
+
+    def peek():
+        return tokens[k[0]]
+
+    def take():
+        k[0] += 1
+        return tokens[k[0] - 1]
+
+    def factor():
+        t = take()
+        if t in ('+', '-'):
+            value = factor()
+            return -value if t == '-' else value
+        if t == '(':
+            value = expr()
+            if take() != ')':
+                raise ValueError("unbalanced aperture macro expression: %s" % expression)
+            return value
+        if isinstance(t, float):
+            return t
+        raise ValueError("unsupported aperture macro expression: %s" % expression)
+
+    def term():
+        value = factor()
+        while peek() in ('x', '/'):
+            if take() == 'x':
+                value *= factor()
+            else:
+                value /= factor()
+        return value
+
+    def expr():
+        value = term()
+        while peek() in ('+', '-'):
+            if take() == '+':
+                value += term()
+            else:
+                value -= term()
+        return value
+
+    value = expr()
+    if peek() is not None:
+        raise ValueError("unsupported aperture macro expression: %s" % expression)
+    return value
+
+
+def _macro_shapes(body, params):
+    variables = dict((i + 1, p) for i, p in enumerate(params))
+    shapes = []
+
+    for statement in body:
+        statement = statement.strip()
+        if not statement or statement.startswith('0'):
+            continue
+        if statement.startswith('$'):
+            name, expression = statement.split('=', 1)
+            variables[int(name[1:])] = _evaluate(expression, variables)
+            continue
+
+        fields = statement.split(',')
+        code = int(fields[0])
+        m = [_evaluate(f, variables) for f in fields[1:]]
+
+        if code == 7:
+            # Thermals have no exposure; keep just their outer disc.
+            shapes.append(_rotate(circle(m[0], m[1], m[2]), m[5] if len(m) > 5 else 0))
+            continue
+        if m and m[0] == 0:
+            continue
+
+        if code == 1:
+            rot = m[4] if len(m) > 4 else 0
+            shapes.append(_rotate(circle(m[2], m[3], m[1]), rot))
+        elif code == 4:
+            n = int(m[1])
+            pts = [(m[2 + 2 * k], m[3 + 2 * k]) for k in range(n)]
+            shapes.append(_rotate(pts, m[4 + 2 * n] if len(m) > 4 + 2 * n else 0))
+        elif code == 5:
+            n = int(m[1])
+            rot = m[5] if len(m) > 5 else 0
+            pts = [(m[2] + m[4] / 2 * math.cos(2 * math.pi * k / n), m[3] + m[4] / 2 * math.sin(2 * math.pi * k / n))
+                   for k in range(n)]
+            shapes.append(_rotate(pts, rot))
+        elif code == 20:
+            w, x0, y0, x1, y1, rot = m[1:7]
+            a = math.atan2(y1 - y0, x1 - x0)
+            nx, ny = -math.sin(a) * w / 2, math.cos(a) * w / 2
+            pts = [(x0 + nx, y0 + ny), (x1 + nx, y1 + ny), (x1 - nx, y1 - ny), (x0 - nx, y0 - ny)]
+            shapes.append(_rotate(pts, rot))
+        elif code == 21:
+            w, h, cx, cy, rot = m[1:6]
+            pts = [(cx - w / 2, cy - h / 2), (cx + w / 2, cy - h / 2), (cx + w / 2, cy + h / 2), (cx - w / 2, cy + h / 2)]
+            shapes.append(_rotate(pts, rot))
+    return shapes
+
+
+def _standard_aperture(template, params):
+    if template == 'C':
+        return Aperture([circle(0, 0, params[0])], params[0])
+    if template == 'R':
+        w, h = params[0] / 2, params[1] / 2
+        return Aperture([[(-w, -h), (w, -h), (w, h), (-w, h)]])
+    if template == 'O':
+        w, h = params[0], params[1]
+        if w > h:
+            return Aperture([stroke(-(w - h) / 2, 0, (w - h) / 2, 0, h)])
+        return Aperture([stroke(0, -(h - w) / 2, 0, (h - w) / 2, w)])
+    if template == 'P':
+        n = int(params[1])
+        rot = params[2] if len(params) > 2 else 0
+        pts = [(params[0] / 2 * math.cos(2 * math.pi * k / n), params[0] / 2 * math.sin(2 * math.pi * k / n))
+               for k in range(n)]
+        return Aperture([_rotate(pts, rot)])
+    return None
+
+
+def _arc_points(x0, y0, x1, y1, cx, cy, clockwise):
+    r = math.hypot(x0 - cx, y0 - cy)
+    a0 = math.atan2(y0 - cy, x0 - cx)
+    a1 = math.atan2(y1 - cy, x1 - cx)
+    sweep = a1 - a0
+    if clockwise:
+        if sweep >= 0:
+            sweep -= 2 * math.pi
+    else:
+        if sweep <= 0:
+            sweep += 2 * math.pi
+    n = max(2, int(math.ceil(abs(sweep) / (2 * math.pi) * ARC_SEGMENTS)))
+    return [(cx + r * math.cos(a0 + sweep * k / n), cy + r * math.sin(a0 + sweep * k / n)) for k in range(1, n + 1)]
+
+
+def read_gerber(source):
+    """
+    Parses an RS-274X file (a path or a text stream) into a GerberLayer.
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            return read_gerber(f)
+
+    layer = GerberLayer()
+
+    scale = 1e-6
+    units = 1.0
+    apertures = {}
+    macros = {}
+    aperture = None
+    x = y = 0.0
+    mode = 'G01'
+    multi_quadrant = True
+    dark = True
+    region = None
+    function = None
+    net = None
+
+    def add(kind, shapes):
+        shapes = [s for s in shapes if len(s) >= 3]
+        if shapes:
+            layer.primitives.append(Primitive(kind, shapes, dark, function, net))
+
+    for kind, text in _blocks(source):
+        if kind == 'ext':
+            statements = text.split('*')
+            head = statements[0]
+            if head.startswith('FS'):
+                m = re.search(r'X(\d)(\d)', head)
+                scale = 10.0 ** -int(m.group(2))
+            elif head.startswith('MO'):
+                units = INCH if head[2:4] == 'IN' else 1.0
+            elif head.startswith('LP'):
+                dark = head[2] == 'D'
+            elif head.startswith('AM'):
+                macros[head[2:]] = statements[1:]
+            elif head.startswith('AD'):
+                m = re.match(r'ADD(\d+)([^,]+),?(.*)', head)
+                code = int(m.group(1))
+                template = m.group(2)
+                # Parameters stay in file units (vertex counts and angles
+                # among them); only the resulting shapes are scaled.
+                params = [float(p) for p in m.group(3).split('X') if p]
+                if template in macros:
+                    defined = Aperture(_macro_shapes(macros[template], params))
+                else:
+                    defined = _standard_aperture(template, params)
+                apertures[code] = defined.scaled(units) if defined is not None else None
+            elif head.startswith('TF.FileFunction'):
+                layer.file_function = head.split(',')[1:]
+            elif head.startswith('TF.'):
+                layer.attributes[head[3:].split(',')[0]] = head.split(',')[1:]
+            elif head.startswith('TA.AperFunction'):
+                function = head.split(',')[1]
+            elif head.startswith('TO.N'):
+                net = head.split(',')[1] if ',' in head else None
+            elif head.startswith('TD'):
+                if head == 'TD' or head == 'TD.AperFunction':
+                    function = None
+                if head == 'TD' or head == 'TD.N':
+                    net = None
+            continue
+
+        if text.startswith('G04') or not text:
+            continue
+        if text.startswith('M02') or text.startswith('M00'):
+            break
+
+        words = _WORD.findall(text)
+        nx, ny = x, y
+        i = j = 0.0
+        op = None
+        for letter, value in words:
+            if letter == 'G':
+                g = int(value)
+                if g in (1, 2, 3):
+                    mode = 'G%02d' % g
+                elif g == 36:
+                    region = []
+                elif g == 37:
+                    if region:
+                        add('region', [region])
+                    region = None
+                elif g == 74:
+                    multi_quadrant = False
+                elif g == 75:
+                    multi_quadrant = True
+            elif letter == 'D':
+                d = int(value)
+                if d >= 10:
+                    aperture = apertures.get(d)
+                else:
+                    op = d
+            else:
+                v = (float(value) if '.' in value else int(value) * scale) * units
+                if letter == 'X':
+                    nx = v
+                elif letter == 'Y':
+                    ny = v
+                elif letter == 'I':
+                    i = v
+                else:
+                    j = v
+
+        if op == 1:
+            if mode == 'G01':
+                path = [(nx, ny)]
+            else:
+                cx, cy = x + i, y + j
+                if not multi_quadrant:
+                    cx, cy = _single_quadrant_center(x, y, nx, ny, i, j, mode == 'G02')
+                path = _arc_points(x, y, nx, ny, cx, cy, mode == 'G02')
+
+            if region is not None:
+                if not region:
+                    region.append((x, y))
+                region += path
+            elif aperture is not None:
+                width = aperture.diameter
+                if width is None:
+                    b = [v for s in aperture.shapes for v in s]
+                    width = min(max(v[0] for v in b) - min(v[0] for v in b), max(v[1] for v in b) - min(v[1] for v in b))
+                px, py = x, y
+                shapes = []
+                for qx, qy in path:
+                    shapes.append(stroke(px, py, qx, qy, width))
+                    px, py = qx, qy
+                add('arc' if mode != 'G01' else 'draw', shapes)
+        elif op == 2:
+            if region:
+                add('region', [region])
+                region = []
+        elif op == 3 and aperture is not None:
+            add('flash', [[(vx + nx, vy + ny) for vx, vy in s] for s in aperture.shapes])
+
+        x, y = nx, ny
+
+    return layer
+
+
+def _single_quadrant_center(x0, y0, x1, y1, i, j, clockwise):
+    best = None
+    for sx in (1, -1):
+        for sy in (1, -1):
+            cx, cy = x0 + sx * abs(i), y0 + sy * abs(j)
+            err = abs(math.hypot(x0 - cx, y0 - cy) - math.hypot(x1 - cx, y1 - cy))
+            a0 = math.atan2(y0 - cy, x0 - cx)
+            a1 = math.atan2(y1 - cy, x1 - cx)
+            sweep = (a0 - a1) if clockwise else (a1 - a0)
+            sweep %= 2 * math.pi
+            if sweep <= math.pi / 2 + 1e-9 and (best is None or err < best[0]):
+                best = (err, cx, cy)
+    if best is None:
+        return x0 + i, y0 + j
+    return best[1], best[2]
+
+
+def read_excellon(source):
+    """
+    Parses an Excellon drill file (a path or a text stream) into a DrillFile.
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            return read_excellon(f)
+
+    drill = DrillFile()
+
+    units = 1.0
+    scale = 1e-3
+    tool = None
+    x = y = 0.0
+
+    for line in source:
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith(';'):
+            if 'TF.FileFunction' in line:
+                drill.plated = 'NonPlated' not in line
+            continue
+
+        if line.startswith('METRIC'):
+            units = 1.0
+            scale = 1e-3
+            continue
+        if line.startswith('INCH'):
+            units = INCH
+            scale = 1e-4
+            continue
+
+        m = re.match(r'T(\d+)C([0-9.]+)', line)
+        if m:
+            drill.tools[int(m.group(1))] = float(m.group(2)) * units
+            continue
+
+        m = re.match(r'T(\d+)$', line)
+        if m:
+            tool = int(m.group(1))
+            continue
+
+        if line[0] in 'XY':
+            start, _, end = line.partition('G85')
+            nx, ny = _excellon_xy(start, x, y, scale, units)
+            slot_end = _excellon_xy(end, nx, ny, scale, units) if end else None
+            if tool in drill.tools:
+                drill.holes.append(Hole(nx, ny, drill.tools[tool], drill.plated is not False, slot_end))
+            x, y = slot_end if slot_end else (nx, ny)
+
+    return drill
+
+
+def _excellon_xy(text, x, y, scale, units):
+    for letter, value in re.findall(r'([XY])([+-]?[0-9.]+)', text):
+        v = (float(value) if '.' in value else int(value) * scale) * units
+        if letter == 'X':
+            x = v
+        else:
+            y = v
+    return x, y
+
+
+def read_gerber_text(text):
+    return read_gerber(io.StringIO(text))
+
+
+def read_excellon_text(text):
+    return read_excellon(io.StringIO(text))
@@ -0,0 +1,250 @@
+import json
+import math
+
+from .geometry import (
+    StatorComponent, RotorComponent, STAGE_DEFINITIONS, STAGE_SPACING, BUS_PITCH, ROTOR_INSET, PERIODS,
+    stage_annuli, build_stage, layer_signals)
+from .fill import ZoneFiller, CLEARANCE
+from .boolean import to_grid
+from .shapes import electrode_polygons
+from .export import (
+    VIA_SIZE, board_layers, zones_json, tracks_json, vias_json, outline_json, holes_json)
+
+try:
+    import tomllib
+except ImportError:
+    tomllib = None
+
+# Generation as a graph of memoised nodes:
+#
+#   dimensions -> annuli -> stage i -> electrodes i -> zones i
+#                                   \-> tracks i, vias i -> obstacles j
+#   dimensions -> outline -> graphics, holes
+#
+# A node is recomputed only when one of its inputs changed, and a node whose
+# new value equals its old one does not count as changed, so an edit stops
+# propagating as soon as it stops making a difference.
+
+COMPONENTS = {
+    'stator': StatorComponent,
+    'rotor': RotorComponent
+}
+
+DEFAULT_SPEC = {
+    'component': 'stator',
+    'dimensions': [30, 61.4, 100],
+    'stage_spacing': STAGE_SPACING,
+    'bus_pitch': BUS_PITCH,
+    'shapes': {},
+    'rotor_inset': ROTOR_INSET,
+    'periods': PERIODS,
+    'merge': False,
+    'flip': False
+}
+
+
+class Node:
+    def __init__(self, name, fn, inputs):
+        self.name = name
+        self.fn = fn
+        self.inputs = inputs
+        self.value = None
+        self.version = 0
+        self.seen = None
+        self.computations = 0
+
+
+class Graph:
+    def __init__(self):
+        self.nodes = {}
+
+    def param(self, name, value):
+        node = Node(name, None, ())
+        node.value = value
+        node.version = 1
+        self.nodes[name] = node
+
+    def node(self, name, fn, *inputs):
+        for i in inputs:
+            if i not in self.nodes:
+                raise KeyError("unknown input %s of %s" % (i, name))
+        self.nodes[name] = Node(name, fn, inputs)
+
+    def set(self, name, value):
+        node = self.nodes[name]
+        if node.fn is not None:
+            raise ValueError("%s is not a parameter" % name)
+        if value != node.value:
+            node.value = value
+            node.version += 1
+
+    def get(self, name):
+        node = self.nodes[name]
+        if node.fn is None:
+            return node.value
+
+        values = [self.get(i) for i in node.inputs]
+        versions = tuple(self.nodes[i].version for i in node.inputs)
+        if versions != node.seen:
+            value = node.fn(*values)
+            node.computations += 1
+            node.seen = versions
+            if node.version == 0 or not _same(value, node.value):
+                node.value = value
+                node.version += 1
+        return node.value
+
+    def delta(self, names, seen):
+        """
+        Values of those of `names` that changed since the versions recorded
+        in `seen`, which is updated.
+        """
+        changed = {}
+        for name in names:
+            value = self.get(name)
+            version = self.nodes[name].version
+            if seen.get(name) != version:
+                seen[name] = version
+                changed[name] = value
+        return changed
+
+
+def _same(a, b):
+    try:
+        return bool(a == b)
+    except ValueError:
+        return False
+
+
+def load_spec(path):
+    """
+    Reads a spec file: TOML whose keys are those of DEFAULT_SPEC. `shapes`
+    maps a stage index to the electrode shapes of its `input` and `output`
+    layers, e.g.
+
+        [shapes.1]
+        output = { profile = "harmonic", coefficients = [1.0, 0.0, -0.1] }
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if tomllib is not None:
+        values = tomllib.loads(data.decode('utf-8'))
+    else:
+        # Without tomllib: flat key = value files only, with values that
+        # TOML and JSON share.
+        values = {}
+        for line in data.decode('utf-8').splitlines():
+            line = line.split('#', 1)[0].strip()
+            if line:
+                key, value = line.split('=', 1)
+                values[key.strip()] = json.loads(value.strip())
+
+    unknown = set(values) - set(DEFAULT_SPEC)
+    if unknown:
+        raise ValueError("unknown spec keys: %s" % ', '.join(sorted(unknown)))
+
+    spec = dict(DEFAULT_SPEC)
+    spec.update(values)
+    if spec['component'] not in COMPONENTS:
+        raise ValueError("unknown component %s" % spec['component'])
+    return spec
+
+
+def build_component(spec):
+    """The Component a spec describes, built in one go."""
+    return COMPONENTS[spec['component']](
+        *spec['dimensions'], stage_spacing=spec['stage_spacing'], bus_pitch=spec['bus_pitch'],
+        shapes=spec['shapes'], rotor_inset=spec['rotor_inset'], periods=spec['periods'])
+
+
+class Pipeline:
+    """
+    The generation graph for one spec. `outputs` name the nodes whose values
+    make up the CLI document. `on_zone`, if set, is called with every zone
+    as it is filled.
+    """
+    def __init__(self, spec=None, clearance=CLEARANCE, via_size=VIA_SIZE):
+        self.graph = Graph()
+        self.clearance = clearance
+        self.via_size = via_size
+        self.fill_cache = {}
+        self.on_zone = None
+
+        g = self.graph
+        for key, value in (spec or DEFAULT_SPEC).items():
+            g.param(key, value)
+
+        g.node('annuli', lambda d, sp, ri: stage_annuli(d[1], d[2], sp, ri), 'dimensions', 'stage_spacing', 'rotor_inset')
+        g.node('layers', board_layers, 'flip')
+        g.node('outline', lambda c, d, ri: COMPONENTS[c](*d, rotor_inset=ri, outline_only=True), 'component', 'dimensions', 'rotor_inset')
+        g.node('graphics', lambda o, l: outline_json(o, l[2]), 'outline', 'layers')
+        g.node('holes', holes_json, 'outline')
+
+        stages = range(len(STAGE_DEFINITIONS))
+        for i in stages:
+            g.node('stage%d' % i, self._stage(i), 'component', 'annuli', 'bus_pitch', 'shapes', 'periods')
+            g.node('electrodes%d' % i, _electrodes, 'stage%d' % i)
+            g.node('tracks%d' % i, lambda s, l: tracks_json(s, l[1]), 'stage%d' % i, 'layers')
+            g.node('vias%d' % i, vias_json, 'stage%d' % i)
+
+        for i in stages:
+            g.node('obstacles%d' % i, self._obstacles(i), 'annuli', *['vias%d' % j for j in stages])
+            g.node('zones%d' % i, self._zones, 'electrodes%d' % i, 'obstacles%d' % i, 'layers', 'merge')
+
+        self.outputs = (
+            ['zones%d' % i for i in stages] +
+            ['tracks%d' % i for i in stages] +
+            ['vias%d' % i for i in stages] +
+            ['graphics', 'holes'])
+
+    def _stage(self, i):
+        def build(component, annuli, bus_pitch, shapes, periods):
+            kind = COMPONENTS[component]
+            stage = build_stage(i, annuli, kind.STAGE_OPTIONS[i], bus_pitch, shapes, periods)
+            layer, names = kind.SIGNAL_LAYERS[i]
+            return layer_signals(getattr(stage, layer), names)
+        return build
+
+    def _obstacles(self, i):
+        # Every via that can reach this stage's annulus; the filler itself
+        # picks those of other nets close to each zone.
+        def build(annuli, *vias):
+            ri, ro = annuli[STAGE_DEFINITIONS[i][4]]
+            reach = self.via_size / 2 + self.clearance
+            return [
+                (v['net'], tuple(v['point'])) for vs in vias for v in vs
+                if ri - reach <= math.hypot(v['point'][0], v['point'][1]) <= ro + reach
+            ]
+        return build
+
+    def _zones(self, electrodes, obstacles, layers, merge):
+        filler = ZoneFiller(clearance=self.clearance, via_size=self.via_size)
+        filler.cache = self.fill_cache
+        filler.vias = [(net, to_grid([p])[0]) for net, p in obstacles]
+        for name, polygons in electrodes:
+            filler.add_zones(name, polygons)
+        return zones_json(electrodes, filler, layers[0], merge, self.on_zone)
+
+    def update(self, spec):
+        for key, value in spec.items():
+            self.graph.set(key, value)
+
+    def delta(self, seen):
+        return self.graph.delta(self.outputs, seen)
+
+    def document(self):
+        """The full CLI document, as `geomgen.cli` prints it."""
+        g = self.graph
+        stages = range(len(STAGE_DEFINITIONS))
+        return {
+            "zones": [z for i in stages for z in g.get('zones%d' % i)],
+            "tracks": [t for i in stages for t in g.get('tracks%d' % i)],
+            "vias": [v for i in stages for v in g.get('vias%d' % i)],
+            "graphics": g.get('graphics'),
+            "holes": g.get('holes')
+        }
+
+
+def _electrodes(signals):
+    return [(s.name, electrode_polygons(s.electrodes)) for s in signals]
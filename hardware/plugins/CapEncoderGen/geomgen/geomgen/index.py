@@ -0,0 +1,212 @@
+import math
+from bisect import bisect_left, bisect_right
+
+from .gerber import point_in_polygon
+from .shapes import electrode_polygons
+
+# Position lookups on a Component. Everything it places is either in an
+# annular band (electrodes) or on a ring (vias, bus arcs), so each band or
+# ring keeps its items sorted by center angle and a query bisects into the
+# few bands or rings its radius can touch.
+
+TOLERANCE = 1e-6
+
+
+def _angle(x, y):
+    return math.degrees(math.atan2(y, x)) % 360
+
+
+def _window(angles, lo, hi):
+    # Indices of sorted angles (in [0, 360)) within [lo, hi], wrapping.
+    if hi - lo >= 360:
+        return range(len(angles))
+
+    lo %= 360
+    hi = lo + (hi - lo) % 360
+    indices = list(range(bisect_left(angles, lo), bisect_right(angles, min(hi, 360))))
+    if hi >= 360:
+        indices += range(0, bisect_right(angles, hi - 360))
+    return indices
+
+
+class Entry:
+    def __init__(self, net, item, angle, polygon=None, span=0):
+        self.net = net
+        self.item = item
+        self.angle = angle
+        self.polygon = polygon
+        self.span = span
+
+
+class Band:
+    def __init__(self, inner_radius, outer_radius):
+        self.inner_radius = inner_radius
+        self.outer_radius = outer_radius
+        self.entries = []
+        self.angles = []
+        self.reach = 0
+
+    def add(self, entry, half_width):
+        self.entries.append(entry)
+        self.reach = max(self.reach, half_width)
+
+    def sort(self):
+        self.entries.sort(key=lambda e: e.angle)
+        self.angles = [e.angle for e in self.entries]
+
+    def within(self, lo, hi):
+        return [self.entries[i] for i in _window(self.angles, lo, hi)]
+
+
+class Ring:
+    def __init__(self, radius):
+        self.radius = radius
+        self.entries = []
+        self.angles = []
+
+    def sort(self):
+        self.entries.sort(key=lambda e: e.angle)
+        self.angles = [e.angle for e in self.entries]
+
+    def neighbours(self, angle):
+        # The entries either side of `angle`, wrapping around the ring.
+        n = len(self.angles)
+        if n == 0:
+            return []
+        i = bisect_left(self.angles, angle % 360)
+        return [self.entries[i % n], self.entries[(i - 1) % n]]
+
+
+def _rings(entries, radius_of):
+    rings = {}
+    for e in entries:
+        r = radius_of(e)
+        key = round(r / TOLERANCE)
+        if key not in rings:
+            rings[key] = Ring(r)
+        rings[key].entries.append(e)
+
+    result = sorted(rings.values(), key=lambda ring: ring.radius)
+    for ring in result:
+        ring.sort()
+    return result
+
+
+class ComponentIndex:
+    """
+    Electrodes, vias and bus arcs of a Component (or any list of
+    ComponentSignals) indexed by angle within radial bands and rings.
+    """
+    def __init__(self, component):
+        signals = component.signals if hasattr(component, 'signals') else component
+
+        bands = {}
+        vias = []
+        arcs = []
+        for s in signals:
+            for e, polygon in zip(s.electrodes, electrode_polygons(s.electrodes)):
+                sector = e.sector
+                key = (round(sector.inner_radius / TOLERANCE), round(sector.outer_radius / TOLERANCE))
+                if key not in bands:
+                    bands[key] = Band(sector.inner_radius, sector.outer_radius)
+                bands[key].add(Entry(s.name, e, sector.center_angle() % 360, polygon), sector.angular_length() / 2)
+
+            for v in s.vias:
+                vias.append(Entry(s.name, v, v.angle % 360))
+
+            start, end = sorted([s.arc.start_angle, s.arc.end_angle])
+            arcs.append(Entry(s.name, s.arc, (start + end) / 2 % 360, span=(end - start) / 2))
+
+        self.bands = sorted(bands.values(), key=lambda b: b.inner_radius)
+        for band in self.bands:
+            band.sort()
+        self.band_starts = [b.inner_radius for b in self.bands]
+
+        self.via_rings = _rings(vias, lambda e: e.item.radius)
+        self.via_radii = [ring.radius for ring in self.via_rings]
+
+        self.arc_rings = _rings(arcs, lambda e: e.item.radius)
+        self.arc_radii = [ring.radius for ring in self.arc_rings]
+
+    def _bands_at(self, r):
+        # Bands never overlap, so at most the last one starting below r.
+        i = bisect_right(self.band_starts, r) - 1
+        if i >= 0 and r <= self.bands[i].outer_radius:
+            return [self.bands[i]]
+        return []
+
+    def electrode_at(self, x, y):
+        """The electrode Entry covering (x, y), or None."""
+        r = math.hypot(x, y)
+        theta = _angle(x, y)
+        for band in self._bands_at(r):
+            for e in band.within(theta - band.reach, theta + band.reach):
+                if point_in_polygon(x, y, e.polygon):
+                    return e
+        return None
+
+    def nearest_via(self, x, y, max_distance=None):
+        """(distance, Entry) of the via closest to (x, y), or None."""
+        r = math.hypot(x, y)
+        theta = _angle(x, y)
+
+        best = None
+        # Walk outwards from the radius of the point; a ring further away
+        # radially than the best via so far cannot hold a closer one.
+        i = bisect_left(self.via_radii, r)
+        lower, upper = i - 1, i
+        while lower >= 0 or upper < len(self.via_rings):
+            if upper < len(self.via_rings) and (lower < 0 or self.via_radii[upper] - r <= r - self.via_radii[lower]):
+                ring = self.via_rings[upper]
+                upper += 1
+            else:
+                ring = self.via_rings[lower]
+                lower -= 1
+
+            if best is not None and abs(ring.radius - r) > best[0]:
+                break
+
+            for e in ring.neighbours(theta):
+                vx, vy = e.item.to_vertex()
+                d = math.hypot(vx - x, vy - y)
+                if best is None or d < best[0]:
+                    best = (d, e)
+
+        if best is None or (max_distance is not None and best[0] > max_distance):
+            return None
+        return best
+
+    def in_range(self, start_angle, end_angle, radius=None):
+        """
+        Electrode entries whose center angle lies in [start_angle,
+        end_angle] (degrees, counter-clockwise, wrapping), in every band or
+        only the one holding `radius`.
+        """
+        bands = self.bands if radius is None else self._bands_at(radius)
+        return [e for band in bands for e in band.within(start_angle, end_angle)]
+
+    def vias_in_range(self, start_angle, end_angle):
+        return [e for ring in self.via_rings for e in (ring.entries[i] for i in _window(ring.angles, start_angle, end_angle))]
+
+    def arcs_at(self, x, y, tolerance=TOLERANCE):
+        """Bus arc entries passing within `tolerance` of (x, y)."""
+        r = math.hypot(x, y)
+        theta = _angle(x, y)
+        hits = []
+        for ring in self.arc_rings[bisect_left(self.arc_radii, r - tolerance):bisect_right(self.arc_radii, r + tolerance)]:
+            slack = math.degrees(tolerance / max(ring.radius, TOLERANCE))
+            for e in ring.entries:
+                offset = (theta - e.angle + 180) % 360 - 180
+                if abs(offset) <= e.span + slack:
+                    hits.append(e)
+        return hits
+
+    def unconnected_vias(self, tolerance=TOLERANCE):
+        """Via entries that no bus arc of their own net passes through."""
+        result = []
+        for ring in self.via_rings:
+            for e in ring.entries:
+                x, y = e.item.to_vertex()
+                if not any(a.net == e.net for a in self.arcs_at(x, y, tolerance)):
+                    result.append(e)
+        return result
@@ -0,0 +1,367 @@
+import re
+import sys
+import math
+import argparse
+import itertools
+from collections import defaultdict
+
+from .geometry import StatorComponent, RotorComponent
+from .shapes import electrode_polygons
+
+# Streaming reader for .kicad_pcb files. Only nets, tracks, arcs, vias and
+# zones are built into lists; everything else (footprints, drawings, setup)
+# is skipped token by token without being materialised.
+
+CHUNK_SIZE = 1 << 16
+TOLERANCE = 0.001
+
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|\(|\)|[^\s()"]+')
+_WANTED = frozenset(['net', 'segment', 'arc', 'via', 'zone'])
+
+
+class BoardSegment:
+    def __init__(self, start, end, width, layer, net):
+        self.start = start
+        self.end = end
+        self.width = width
+        self.layer = layer
+        self.net = net
+
+
+class BoardArc:
+    def __init__(self, start, mid, end, width, layer, net):
+        self.start = start
+        self.mid = mid
+        self.end = end
+        self.width = width
+        self.layer = layer
+        self.net = net
+
+
+class BoardVia:
+    def __init__(self, at, size, drill, layers, net):
+        self.at = at
+        self.size = size
+        self.drill = drill
+        self.layers = layers
+        self.net = net
+
+
+class BoardZone:
+    def __init__(self, net, net_name, layers, polygons, filled_polygons):
+        self.net = net
+        self.net_name = net_name
+        self.layers = layers
+        self.polygons = polygons
+        self.filled_polygons = filled_polygons
+
+
+class Board:
+    def __init__(self):
+        self.nets = {}
+        self.segments = []
+        self.arcs = []
+        self.vias = []
+        self.zones = []
+
+    def net_name(self, net):
+        return self.nets.get(net, net if isinstance(net, str) else '')
+
+
+def tokens(stream):
+    # Splits on the last newline of each chunk, which KiCad never emits
+    # inside a token.
+    rest = ''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        if not chunk:
+            for m in _TOKEN.finditer(rest):
+                yield m.group(0)
+            return
+
+        text = rest + chunk
+        cut = text.rfind('\n')
+        if cut < 0:
+            rest = text
+            continue
+
+        for m in _TOKEN.finditer(text, 0, cut):
+            yield m.group(0)
+        rest = text[cut:]
+
+
+def _atom(token):
+    if token.startswith('"'):
+        return token[1:-1].replace('\\"', '"').replace('\\\\', '\\')
+    return token
+
+
+def _build(it):
+    # Builds the remainder of an expression whose '(' was just consumed.
+    node = []
+    for tok in it:
+        if tok == '(':
+            node.append(_build(it))
+        elif tok == ')':
+            return node
+        else:
+            node.append(_atom(tok))
+    return node
+
+
+def _skip(it):
+    depth = 1
+    for tok in it:
+        if tok == '(':
+            depth += 1
+        elif tok == ')':
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def _fields(node):
+    fields = {}
+    for child in node[1:]:
+        if isinstance(child, list) and child:
+            fields.setdefault(child[0], child)
+    return fields
+
+
+def _xy(node):
+    return (float(node[1]), float(node[2]))
+
+
+def _net(fields):
+    if 'net' not in fields:
+        return 0
+    value = fields['net'][1]
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def _points(node):
+    pts = [c for c in node[1:] if isinstance(c, list) and c and c[0] == 'pts']
+    if not pts:
+        return []
+    return [_xy(p) for p in pts[0][1:] if isinstance(p, list) and p[0] == 'xy']
+
+
+def _layers(fields):
+    if 'layers' in fields:
+        return fields['layers'][1:]
+    if 'layer' in fields:
+        return fields['layer'][1:2]
+    return []
+
+
+def _parse_item(board, node):
+    kind = node[0]
+    fields = _fields(node)
+
+    if kind == 'net':
+        board.nets[int(node[1])] = node[2] if len(node) > 2 else ''
+    elif kind == 'segment':
+        board.segments.append(BoardSegment(
+            _xy(fields['start']), _xy(fields['end']), float(fields['width'][1]),
+            fields['layer'][1], _net(fields)))
+    elif kind == 'arc':
+        board.arcs.append(BoardArc(
+            _xy(fields['start']), _xy(fields['mid']), _xy(fields['end']), float(fields['width'][1]),
+            fields['layer'][1], _net(fields)))
+    elif kind == 'via':
+        board.vias.append(BoardVia(
+            _xy(fields['at']), float(fields['size'][1]),
+            float(fields['drill'][1]) if 'drill' in fields else None,
+            _layers(fields), _net(fields)))
+    elif kind == 'zone':
+        polygons = []
+        filled = defaultdict(list)
+        for child in node[1:]:
+            if not isinstance(child, list) or not child:
+                continue
+            if child[0] == 'polygon':
+                polygons.append(_points(child))
+            elif child[0] == 'filled_polygon':
+                f = _fields(child)
+                layer = f['layer'][1] if 'layer' in f else (_layers(fields) or [None])[0]
+                filled[layer].append(_points(child))
+
+        net_name = fields['net_name'][1] if 'net_name' in fields else None
+        board.zones.append(BoardZone(_net(fields), net_name, _layers(fields), polygons, dict(filled)))
+
+
+def read_board(source):
+    """
+    Reads the nets, tracks, arcs, vias and zones of a .kicad_pcb file given
+    as a path or a text stream.
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as f:
+            return read_board(f)
+
+    board = Board()
+    it = tokens(source)
+
+    if next(it, None) != '(':
+        raise ValueError("not an s-expression file")
+    next(it, None)
+
+    for tok in it:
+        if tok != '(':
+            continue
+        head = next(it, None)
+        if head in _WANTED:
+            node = [head] + _build(it)
+            _parse_item(board, node)
+        else:
+            _skip(it)
+
+    return board
+
+
+def _key(p, tolerance):
+    return (int(round(p[0] / tolerance)), int(round(p[1] / tolerance)))
+
+
+def _segment_key(a, b, tolerance):
+    ka = _key(a, tolerance)
+    kb = _key(b, tolerance)
+    return (ka, kb) if ka <= kb else (kb, ka)
+
+
+def _neighbours(k):
+    return [(k[0] + dx, k[1] + dy) for dx in (0, -1, 1) for dy in (0, -1, 1)]
+
+
+def _pop_near(table, prefix, keys):
+    # Positions are quantised, so a point sitting on a cell boundary may have
+    # landed in the next cell over; look there too.
+    for ks in itertools.product(*[_neighbours(k) for k in keys]):
+        if len(ks) == 2 and ks[1] < ks[0]:
+            ks = (ks[1], ks[0])
+        items = table.get(prefix + (ks if len(ks) > 1 else ks[0],))
+        if items:
+            return items.pop()
+    return None
+
+
+def _centroid(vertices):
+    return (sum(v[0] for v in vertices) / len(vertices), sum(v[1] for v in vertices) / len(vertices))
+
+
+class BoardDiff:
+    def __init__(self):
+        self.missing = defaultdict(list)
+        self.extra = defaultdict(list)
+        self.changed = defaultdict(list)
+
+    def up_to_date(self):
+        return not (any(self.missing.values()) or any(self.extra.values()) or any(self.changed.values()))
+
+    def lines(self):
+        out = []
+        for kind in ['zones', 'segments', 'vias']:
+            out.append("%-9s %5d missing, %5d extra, %5d changed" % (
+                kind, len(self.missing[kind]), len(self.extra[kind]), len(self.changed[kind])))
+            for label, items in [('-', self.missing[kind]), ('+', self.extra[kind]), ('~', self.changed[kind])]:
+                for item in items[:10]:
+                    out.append("    %s %s" % (label, item))
+        return out
+
+
+def diff_board(board, component, offset=(0, 0), electrode_layer='F.Cu', arc_layer='B.Cu', tolerance=TOLERANCE):
+    """
+    Compares the copper of a board with what the generator would produce for
+    `component`, keyed on net name and quantised position.
+    """
+    diff = BoardDiff()
+
+    def place(p):
+        return (p[0] + offset[0], p[1] + offset[1])
+
+    # Zones: matched on net, layer and centroid; then vertex by vertex.
+    zones = defaultdict(list)
+    for z in board.zones:
+        name = z.net_name if z.net_name is not None else board.net_name(z.net)
+        for layer in z.layers:
+            for polygon in z.polygons:
+                if polygon:
+                    zones[(name, layer, _key(_centroid(polygon), 10 * tolerance))].append(polygon)
+
+    for s in component.signals:
+        for evs in electrode_polygons(s.electrodes):
+            expected = [place(v) for v in evs]
+            actual = _pop_near(zones, (s.name, electrode_layer), [_key(_centroid(expected), 10 * tolerance)])
+            if actual is None:
+                diff.missing['zones'].append("%s zone at (%.3f, %.3f)" % ((s.name,) + _centroid(expected)))
+                continue
+            if len(actual) != len(expected) or any(
+                    math.hypot(a[0] - b[0], a[1] - b[1]) > tolerance for a, b in zip(actual, expected)):
+                diff.changed['zones'].append("%s zone at (%.3f, %.3f)" % ((s.name,) + _centroid(expected)))
+
+    for (name, layer, _), polygons in zones.items():
+        for p in polygons:
+            diff.extra['zones'].append("%s zone on %s at (%.3f, %.3f)" % ((name, layer) + _centroid(p)))
+
+    # Bus arcs are written as chains of straight segments.
+    segments = defaultdict(list)
+    for seg in board.segments:
+        segments[(board.net_name(seg.net), seg.layer, _segment_key(seg.start, seg.end, tolerance))].append(seg)
+
+    for s in component.signals:
+        avs = [place(v) for v in s.arc.to_polygon()]
+        for a, b in zip(avs, avs[1:]):
+            if _pop_near(segments, (s.name, arc_layer), [_key(a, tolerance), _key(b, tolerance)]) is None:
+                diff.missing['segments'].append("%s segment (%.3f, %.3f)-(%.3f, %.3f)" % ((s.name,) + a + b))
+
+    for (name, layer, _), segs in segments.items():
+        for seg in segs:
+            diff.extra['segments'].append("%s segment on %s (%.3f, %.3f)-(%.3f, %.3f)" % ((name, layer) + seg.start + seg.end))
+
+    vias = defaultdict(list)
+    for v in board.vias:
+        vias[(board.net_name(v.net), _key(v.at, tolerance))].append(v)
+
+    for s in component.signals:
+        for v in s.vias:
+            p = place(v.to_vertex())
+            if _pop_near(vias, (s.name,), [_key(p, tolerance)]) is None:
+                diff.missing['vias'].append("%s via at (%.3f, %.3f)" % ((s.name,) + p))
+
+    for (name, _), vs in vias.items():
+        for v in vs:
+            diff.extra['vias'].append("%s via at (%.3f, %.3f)" % ((name,) + v.at))
+
+    return diff
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='geomgen.kicad', description='diff a board against generated geometry')
+    parser.add_argument('board')
+    parser.add_argument('--component', choices=['stator', 'rotor'], default='stator')
+    parser.add_argument('--dimensions', type=float, nargs=3, default=[30, 61.4, 100],
+                        metavar=('INNER', 'OUTER', 'BOX'))
+    parser.add_argument('--offset', type=float, nargs=2, default=[0, 0], metavar=('X', 'Y'))
+    parser.add_argument('--flip', action='store_true', help='electrodes on B.Cu and bus arcs on F.Cu')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.component == 'stator':
+        component = StatorComponent(*args.dimensions)
+    else:
+        component = RotorComponent(*args.dimensions)
+
+    board = read_board(args.board)
+    electrode_layer, arc_layer = ('B.Cu', 'F.Cu') if args.flip else ('F.Cu', 'B.Cu')
+    diff = diff_board(board, component, args.offset, electrode_layer, arc_layer, args.tolerance)
+
+    for line in diff.lines():
+        print(line)
+
+    sys.exit(0 if diff.up_to_date() else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+from .boolean import union, to_grid, from_grid, polygon_area, GRID_SCALE
+from .shapes import electrode_polygons
+
+
+class MergedNet:
+    def __init__(self, name, polygons):
+        self.name = name
+        self.polygons = polygons
+
+    def area(self):
+        return sum(
+            polygon_area(outline) - sum(polygon_area(h) for h in holes)
+            for outline, holes in self.polygons)
+
+
+def merge_signals(signals, scale=GRID_SCALE):
+    """
+    Unions the electrodes of every net into as few polygons as possible.
+    Nets keep the order in which they first appear in `signals`.
+    """
+    return merge_polygons([(s.name, electrode_polygons(s.electrodes)) for s in signals], scale)
+
+
+def merge_polygons(named_polygons, scale=GRID_SCALE):
+    """
+    As merge_signals, for (net name, list of polygons) pairs.
+    """
+    names = []
+    electrodes = {}
+    originals = {}
+    for name, polygons in named_polygons:
+        if name not in electrodes:
+            names.append(name)
+            electrodes[name] = []
+        for evs in polygons:
+            grid = to_grid(evs, scale)
+            electrodes[name].append(grid)
+            originals[frozenset(grid)] = evs
+
+    merged = []
+    for name in names:
+        polygons = []
+        for outline, holes in union(electrodes[name]):
+            # Electrodes that touched nothing come back unchanged; keep their
+            # original vertices rather than the grid-rounded copy.
+            original = originals.get(frozenset(outline))
+            if original is not None and not holes:
+                polygons.append((original, []))
+            else:
+                polygons.append((from_grid(outline, scale), [from_grid(h, scale) for h in holes]))
+        merged.append(MergedNet(name, polygons))
+    return merged
+
+
+def signals_area(signals):
+    return sum(polygon_area(evs) for s in signals for evs in electrode_polygons(s.electrodes))
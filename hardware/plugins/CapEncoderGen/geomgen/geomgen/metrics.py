@@ -0,0 +1,68 @@
+import csv
+
+import numpy as np
+
+from .shapes import electrode_polygons
+from .export import TRACE_WIDTH
+
+# Per-signal electrical estimates, computed straight from the geometry
+# without filling zones: electrode area by the shoelace formula over whole
+# stacks of polygons, bus length as radius times swept angle.
+#
+# Resistance is that of the bus arc alone, end to end. Capacitance is the
+# parallel-plate estimate of the electrodes and bus over a ground plane
+# `plane_distance` away through FR-4, without fringing.
+
+COPPER_RESISTIVITY = 1.72e-5   # ohm mm
+COPPER_THICKNESS = 0.035       # mm, 1 oz
+PLANE_DISTANCE = 1.6           # mm
+PERMITTIVITY = 4.4
+EPSILON_0 = 8.854e-3           # pF / mm
+
+FIELDS = ['stage', 'net', 'electrodes', 'area', 'arc_length', 'vias', 'resistance', 'capacitance']
+
+
+def polygon_areas(polygons):
+    """Areas of a stack of polygons of shape (..., vertices, 2)."""
+    p = np.asarray(polygons, dtype=float)
+    x, y = p[..., 0], p[..., 1]
+    return np.abs(np.sum(x * np.roll(y, -1, axis=-1) - np.roll(x, -1, axis=-1) * y, axis=-1)) / 2
+
+
+def arc_lengths(radii, start_angles, end_angles):
+    return np.asarray(radii, dtype=float) * np.radians(np.abs(np.subtract(end_angles, start_angles)))
+
+
+def signal_metrics(component, trace_width=TRACE_WIDTH, thickness=COPPER_THICKNESS,
+                   plane_distance=PLANE_DISTANCE, permittivity=PERMITTIVITY):
+    """One row (a dict with FIELDS) per ComponentSignal of `component`."""
+    stages = [(i, s) for i, signals in enumerate(component.stage_signals()) for s in signals]
+    signals = [s for _, s in stages]
+
+    # Electrodes of a signal share a profile, so each signal is one stack.
+    areas = np.array([polygon_areas(electrode_polygons(s.electrodes)).sum() for s in signals])
+    lengths = arc_lengths(
+        [s.arc.radius for s in signals], [s.arc.start_angle for s in signals], [s.arc.end_angle for s in signals])
+
+    resistance = COPPER_RESISTIVITY * lengths / (trace_width * thickness)
+    capacitance = EPSILON_0 * permittivity * (areas + lengths * trace_width) / plane_distance
+
+    return [
+        {
+            'stage': i,
+            'net': s.name,
+            'electrodes': len(s.electrodes),
+            'area': float(areas[k]),
+            'arc_length': float(lengths[k]),
+            'vias': len(s.vias),
+            'resistance': float(resistance[k]),
+            'capacitance': float(capacitance[k])
+        } for k, (i, s) in enumerate(stages)
+    ]
+
+
+def write_csv(rows, stream, extra=()):
+    """Writes metric rows as CSV; `extra` names leading columns of each row."""
+    writer = csv.DictWriter(stream, fieldnames=list(extra) + FIELDS, lineterminator='\n')
+    writer.writeheader()
+    writer.writerows(rows)
@@ -0,0 +1,333 @@
+import sys
+import math
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .graph import DEFAULT_SPEC, COMPONENTS, load_spec, build_component
+from .boolean import polygon_area
+from .gerber import point_in_polygon, distance_to_polygon
+from .shapes import electrode_polygons
+from .fill import CLEARANCE
+from .export import VIA_SIZE
+
+# Searches the hand-picked layout constants for a better design, by CMA-ES
+# over the unit cube of parameter ranges. The objective is purely geometric:
+# it rewards electrode area and balanced stages and penalises anything
+# closer than the copper clearance. Integer parameters are snapped before a
+# candidate is evaluated, and evaluations are memoised on the snapped
+# values, so the many candidates that snap to the same design cost nothing.
+
+BALANCE_WEIGHT = 0.5
+CLEARANCE_WEIGHT = 10.0
+GENERATIONS = 40
+DIGITS = 4
+
+
+class Parameter:
+    """
+    A searched value between `lower` and `upper`. Parameters with a `step`
+    only take the values lower + k * step.
+    """
+    def __init__(self, name, lower, upper, step=None):
+        self.name = name
+        self.lower = lower
+        self.upper = upper
+        self.step = step
+
+    def value(self, u):
+        x = self.lower + min(max(u, 0), 1) * (self.upper - self.lower)
+        if self.step is None:
+            return round(x, DIGITS)
+        return self.lower + self.step * round((x - self.lower) / self.step)
+
+    def unit(self, x):
+        return (x - self.lower) / float(self.upper - self.lower)
+
+
+PARAMETERS = [
+    Parameter('stage_spacing', 0.2, 1.5),
+    Parameter('bus_pitch', 0.5, 1.5),
+    Parameter('rotor_inset', 1.0, 4.0),
+    Parameter('width_fraction', 0.2, 0.9),
+    Parameter('cutoff', 0.0, 0.1),
+    Parameter('periods', 18, 48, step=3)
+]
+
+DEFAULTS = {
+    'width_fraction': 0.5,
+    'cutoff': 0.025
+}
+
+
+def to_spec(values, base=None):
+    """
+    The spec of a design: `base` with the searched values applied. The
+    electrode shapes of every stage are replaced; the induction cutoff only
+    applies to stages that clip their induction electrodes.
+    """
+    spec = dict(base or DEFAULT_SPEC)
+    for key in ['stage_spacing', 'bus_pitch', 'rotor_inset', 'periods']:
+        if key in values:
+            spec[key] = values[key]
+
+    width_fraction = values.get('width_fraction', DEFAULTS['width_fraction'])
+    cutoff = values.get('cutoff', DEFAULTS['cutoff'])
+    options = COMPONENTS[spec['component']].STAGE_OPTIONS
+    spec['shapes'] = {
+        str(i): {
+            'input': {'width_fraction': width_fraction},
+            'output': {'cutoff': cutoff if o.clip_induction else 0}
+        } for i, o in enumerate(options)
+    }
+    return spec
+
+
+def _polygon_gap(a, b):
+    # Closest approach of two polygons' outlines, 0 if they overlap.
+    if any(point_in_polygon(x, y, b) for x, y in a) or any(point_in_polygon(x, y, a) for x, y in b):
+        return 0.0
+    return min(
+        min(distance_to_polygon(x, y, b) for x, y in a),
+        min(distance_to_polygon(x, y, a) for x, y in b))
+
+
+class Evaluation:
+    def __init__(self, utilization, balance, clearance, via_margin, cost):
+        self.utilization = utilization
+        self.balance = balance
+        self.clearance = clearance
+        self.via_margin = via_margin
+        self.cost = cost
+
+    def to_json(self):
+        return dict(vars(self))
+
+
+def evaluate(spec, clearance=CLEARANCE, via_size=VIA_SIZE):
+    """
+    Scores a design; lower costs are better. Terms:
+
+      utilization  electrode area over the ring between bore and board edge
+      balance      (max - min) / mean of the electrode area of each stage
+      clearance    narrowest gap between electrodes of adjacent nets, stages
+                   or via rings
+      via_margin   how far every via stays inside its own electrode
+    """
+    try:
+        component = build_component(spec)
+    except ValueError:
+        return Evaluation(0, 0, 0, 0, math.inf)
+
+    inner, box = spec['dimensions'][1] / 2, spec['dimensions'][2] / 2
+    ring = math.pi * (box ** 2 - inner ** 2)
+
+    totals = []
+    gaps = [spec['stage_spacing'], spec['bus_pitch'] - via_size]
+    via_margin = math.inf
+    for signals in component.stage_signals():
+        polygons = [electrode_polygons(s.electrodes) for s in signals]
+        totals.append(sum(polygon_area(p) for ps in polygons for p in ps))
+
+        # Electrodes repeat around the ring, so the first two by angle
+        # stand for every adjacent pair.
+        first = sorted(
+            ((s.electrodes[0].sector.center_angle(), ps[0]) for s, ps in zip(signals, polygons)),
+            key=lambda e: e[0])
+        if len(first) > 1:
+            gaps.append(_polygon_gap(first[0][1], first[1][1]))
+
+        for s, ps in zip(signals, polygons):
+            x, y = s.vias[0].to_vertex()
+            inside = distance_to_polygon(x, y, ps[0]) if point_in_polygon(x, y, ps[0]) else 0
+            via_margin = min(via_margin, inside - via_size / 2)
+
+    utilization = sum(totals) / ring
+    balance = (max(totals) - min(totals)) / (sum(totals) / len(totals))
+    gap = min(gaps)
+
+    shortfall = max(0, clearance - gap) + max(0, -via_margin)
+    cost = -utilization + BALANCE_WEIGHT * balance + CLEARANCE_WEIGHT * shortfall
+    return Evaluation(utilization, balance, gap, via_margin, cost)
+
+
+def _evaluate(spec):
+    return evaluate(spec)
+
+
+class CMAES:
+    """
+    Covariance matrix adaptation evolution strategy (Hansen's standard
+    settings) minimising over R^n. Coordinates listed in `margins` keep a
+    standard deviation of at least their margin, so that snapped integer
+    parameters can still move.
+    """
+    def __init__(self, x0, sigma, popsize=None, seed=None, margins=None):
+        n = len(x0)
+        self.n = n
+        self.mean = np.array(x0, dtype=float)
+        self.sigma = sigma
+        self.rng = np.random.default_rng(seed)
+        self.margins = margins or {}
+
+        self.popsize = popsize or 4 + int(3 * math.log(n))
+        self.mu = self.popsize // 2
+        w = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = w / w.sum()
+        self.mueff = 1 / np.sum(self.weights ** 2)
+
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0, math.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chin = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.C = np.eye(n)
+        self.B = np.eye(n)
+        self.D = np.ones(n)
+        self.generation = 0
+
+    def ask(self):
+        z = self.rng.standard_normal((self.popsize, self.n))
+        return self.mean + self.sigma * (z * self.D) @ self.B.T
+
+    def tell(self, xs, costs):
+        n = self.n
+        xs = np.asarray(xs)[np.argsort(costs, kind='stable')][:self.mu]
+        old = self.mean
+        self.mean = self.weights @ xs
+        self.generation += 1
+
+        y = (self.mean - old) / self.sigma
+        inv_sqrt = self.B @ np.diag(1 / self.D) @ self.B.T
+        self.ps = (1 - self.cs) * self.ps + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * inv_sqrt @ y
+        norm = np.linalg.norm(self.ps) / math.sqrt(1 - (1 - self.cs) ** (2 * self.generation))
+        hsig = norm / self.chin < 1.4 + 2 / (n + 1)
+        self.pc = (1 - self.cc) * self.pc + hsig * math.sqrt(self.cc * (2 - self.cc) * self.mueff) * y
+
+        steps = (xs - old) / self.sigma
+        self.C = (
+            (1 - self.c1 - self.cmu) * self.C +
+            self.c1 * (np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C) +
+            self.cmu * steps.T @ np.diag(self.weights) @ steps)
+        self.sigma *= math.exp(self.cs / self.damps * (np.linalg.norm(self.ps) / self.chin - 1))
+
+        for i, margin in self.margins.items():
+            floor = (margin / self.sigma) ** 2
+            if self.C[i, i] < floor:
+                self.C[i, i] = floor
+
+        self.C = (self.C + self.C.T) / 2
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+
+class Optimizer:
+    """
+    Minimises `evaluate` over `parameters`, starting from `start` (a dict of
+    values; the stock constants by default). Evaluations run on a process
+    pool and are memoised on snapped parameter values.
+    """
+    def __init__(self, parameters=None, base=None, start=None, processes=None):
+        self.parameters = parameters or PARAMETERS
+        self.base = dict(base or DEFAULT_SPEC)
+        self.processes = processes
+        self.cache = {}
+        self.hits = 0
+
+        start = dict(start or {})
+        for p in self.parameters:
+            if p.name not in start:
+                start[p.name] = self.base[p.name] if p.name in self.base else DEFAULTS[p.name]
+        self.start = [p.unit(start[p.name]) for p in self.parameters]
+
+    def values(self, u):
+        return {p.name: p.value(x) for p, x in zip(self.parameters, u)}
+
+    def evaluate_many(self, points, mapper=map):
+        values = [self.values(u) for u in points]
+        keys = [tuple(v[p.name] for p in self.parameters) for v in values]
+
+        missing = {}
+        for key, v in zip(keys, values):
+            if key in self.cache or key in missing:
+                self.hits += 1
+            else:
+                missing[key] = v
+        for key, result in zip(missing, mapper(_evaluate, [to_spec(v, self.base) for v in missing.values()])):
+            self.cache[key] = result
+
+        return values, [self.cache[k] for k in keys]
+
+    def run(self, generations=GENERATIONS, sigma=0.2, popsize=None, seed=0, callback=None):
+        """Returns (values, Evaluation) of the best design seen."""
+        margins = {
+            i: 0.5 * p.step / (p.upper - p.lower) for i, p in enumerate(self.parameters) if p.step is not None
+        }
+        es = CMAES(self.start, sigma, popsize, seed, margins)
+
+        executor = None
+        if self.processes != 1:
+            executor = ProcessPoolExecutor(max_workers=self.processes)
+        mapper = executor.map if executor is not None else map
+
+        try:
+            best = self.evaluate_many([self.start], mapper)
+            best = (best[0][0], best[1][0])
+            for g in range(generations):
+                points = es.ask()
+                values, results = self.evaluate_many(points, mapper)
+
+                # Out-of-range coordinates evaluate at the boundary; the
+                # distance to it keeps the search drifting back inside.
+                costs = [
+                    r.cost + np.sum(np.clip(u, None, 0) ** 2 + np.clip(u - 1, 0, None) ** 2)
+                    for u, r in zip(points, results)
+                ]
+                es.tell(points, costs)
+
+                for v, r in zip(values, results):
+                    if r.cost < best[1].cost:
+                        best = (v, r)
+                if callback is not None:
+                    callback(g, best)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='geomgen.optimize', description='search layout constants for a better design')
+    parser.add_argument('--spec', metavar='SPEC', help='design spec to start from (default: the stock stator)')
+    parser.add_argument('--generations', type=int, default=GENERATIONS)
+    parser.add_argument('--popsize', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args(argv)
+
+    base = load_spec(args.spec) if args.spec else DEFAULT_SPEC
+    optimizer = Optimizer(base=base, processes=args.processes)
+
+    def report(generation, best):
+        sys.stderr.write(json.dumps({"generation": generation, "cost": best[1].cost}) + "\n")
+
+    values, evaluation = optimizer.run(args.generations, popsize=args.popsize, seed=args.seed, callback=report)
+
+    json.dump({
+        "parameters": values,
+        "evaluation": evaluation.to_json(),
+        "evaluations": len(optimizer.cache),
+        "cache_hits": optimizer.hits,
+        "spec": to_spec(values, base)
+    }, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+import json
+import math
+import argparse
+
+from .graph import Pipeline, DEFAULT_SPEC, COMPONENTS, tomllib
+from .fragment import FragmentWriter
+from .export import GRAPHIC_WIDTH
+
+# Places several stators and rotors on one board. Each distinct design (a
+# spec, as read by graph.load_spec) is generated once; every instance of it
+# refers to that one document and is moved into place by the fragment
+# writer as it is written.
+
+PANEL_GROUP = 'CapEncoderPanel'
+
+
+class Placement:
+    """
+    Rotation about the design origin, then translation. Positive angles
+    turn the same way as GraphicArc angles.
+    """
+    def __init__(self, offset=(0, 0), rotation=0):
+        self.offset = tuple(offset)
+        self.rotation = rotation
+        theta = math.radians(rotation)
+        self.s = math.sin(theta)
+        self.c = math.cos(theta)
+
+    def __call__(self, p):
+        return (self.c * p[0] - self.s * p[1] + self.offset[0], self.s * p[0] + self.c * p[1] + self.offset[1])
+
+
+class PanelInstance:
+    def __init__(self, name, key, placement):
+        self.name = name
+        self.key = key
+        self.placement = placement
+
+
+class Panel:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.designs = {}
+        self.instances = []
+
+    def add(self, spec=None, at=(0, 0), rotation=0, name=None):
+        spec = dict(DEFAULT_SPEC, **(spec or {}))
+        unknown = set(spec) - set(DEFAULT_SPEC)
+        if unknown:
+            raise ValueError("unknown spec keys: %s" % ', '.join(sorted(unknown)))
+        if spec['component'] not in COMPONENTS:
+            raise ValueError("unknown component %s" % spec['component'])
+
+        key = json.dumps(spec, sort_keys=True)
+        if key not in self.designs:
+            self.designs[key] = Pipeline(spec).document()
+
+        if name is None:
+            name = '%s%d' % (spec['component'][0].upper(), len(self.instances) + 1)
+        if any(i.name == name for i in self.instances):
+            raise ValueError("duplicate instance name %s" % name)
+
+        instance = PanelInstance(name, key, Placement(at, rotation))
+        self.instances.append(instance)
+        return instance
+
+    def document(self, instance):
+        return self.designs[instance.key]
+
+    def outline(self):
+        corners = [(0, 0), (self.width, 0), (self.width, self.height), (0, self.height)]
+        return [
+            {"shape": "line", "layer": "Edge.Cuts", "start": a, "end": b, "width": GRAPHIC_WIDTH}
+            for a, b in zip(corners, corners[1:] + corners[:1])
+        ]
+
+    def write(self, stream):
+        """
+        Writes the panel as a .kicad_pcb. Each instance's nets are prefixed
+        with its name, e.g. "S1/S+".
+        """
+        writer = FragmentWriter(stream, PANEL_GROUP)
+        writer.write_instances(
+            [(self.document(i), i.placement, i.name + '/') for i in self.instances],
+            self.outline())
+
+
+def load_panel(path):
+    """
+    Reads a panel file: TOML with `width`, `height` and an [[instance]]
+    table per placement holding `name`, `at`, `rotation` and any spec keys.
+    """
+    if tomllib is None:
+        raise ValueError("panel files need Python 3.11 (tomllib)")
+
+    with open(path, 'rb') as f:
+        values = tomllib.load(f)
+
+    panel = Panel(values['width'], values['height'])
+    for entry in values.get('instance', []):
+        entry = dict(entry)
+        name = entry.pop('name', None)
+        at = entry.pop('at', (0, 0))
+        rotation = entry.pop('rotation', 0)
+        panel.add(entry, at, rotation, name)
+    return panel
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='geomgen.panel', description='place several designs on one board')
+    parser.add_argument('panel', help='panel TOML file')
+    parser.add_argument('-o', '--output', required=True, help='.kicad_pcb to write')
+    args = parser.parse_args(argv)
+
+    panel = load_panel(args.panel)
+    with open(args.output, 'w') as f:
+        panel.write(f)
+
+    print("%d instances of %d designs written to %s" % (len(panel.instances), len(panel.designs), args.output))
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,15 @@
 from pykicad.pcb import *
 from pykicad.module import *
 
+from .boolean import fracture
+from .merge import merge_signals
+from .fill import component_filler
+from .shapes import electrode_polygons
+
 import math
 import os
 
-def pcb_from_component(component, flip=False, add_connector=False):
+def pcb_from_component(component, flip=False, add_connector=False, merge=False):
   os.environ['KISYSMOD'] = '/Library/Application Support/kicad/modules'
 
   pcb = Pcb()
@@ -58,6 +63,21 @@ def pcb_from_component(component, flip=False, add_connector=False):
 
   modules = []
 
+  min_thickness = 0.0254
+  filler = component_filler(component, clearance=trace_clearance, min_thickness=min_thickness, via_size=via_size)
+
+  def filled_points(pieces):
+    # pykicad holds a single filled polygon per zone, so separate pieces are
+    # chained with zero-width bridges the same way holes are.
+    pvs = []
+    for outline, holes in pieces:
+      fvs = fracture(outline, holes)
+      if pvs:
+        pvs = pvs + [pvs[0]] + fvs + [fvs[0]]
+      else:
+        pvs = fvs
+    return pvs
+
   for s in component.signals:
     net_name = s.name
     if net_map.get(net_name) is None:
@@ -74,14 +94,23 @@ def pcb_from_component(component, flip=False, add_connector=False):
     for i in range(len(avs) - 1):
         segments.append(Segment(start=avs[i], end=avs[i + 1], net=net.code, layer=arc_layer, width=trace_width))
 
-    for e in s.electrodes:
-        evs = e.to_polygon()
-        zones.append(Zone(net=net.code, net_name=net.name, layer=electrode_layer, polygon=evs, filled_polygon=evs, clearance=0.0, min_thickness=0.0254))
+    if not merge:
+      for evs in electrode_polygons(s.electrodes):
+          fvs = filled_points(filler.fill(net.name, evs))
+          zones.append(Zone(net=net.code, net_name=net.name, layer=electrode_layer, polygon=evs, filled_polygon=fvs, clearance=0.0, min_thickness=min_thickness))
 
     for v in s.vias:
         vv = v.to_vertex()
         vias.append(Via(at=vv, size=via_size, drill=via_drill, net=net.code))
 
+  if merge:
+    for m in merge_signals(component.signals):
+      net = net_map[m.name]
+      for outline, holes in m.polygons:
+        pvs = fracture(outline, holes)
+        fvs = filled_points(filler.fill(net.name, outline, holes))
+        zones.append(Zone(net=net.code, net_name=net.name, layer=electrode_layer, polygon=pvs, filled_polygon=fvs, clearance=0.0, min_thickness=min_thickness))
+
   def add_graphics(graphics, layer):
     for ga in graphics.arcs:
       arcs.append(GrArc(ga.center, ga.start, ga.angle, layer=layer))
@@ -0,0 +1,279 @@
+import math
+import sys
+import zlib
+import struct
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .geometry import StatorComponent, RotorComponent
+from .shapes import electrode_polygons
+
+LAYER_COLORS = {
+    'electrodes': (192, 0, 0),
+    'arcs': (0, 0, 255),
+    'vias': (192, 192, 0),
+    'edge_cuts': (255, 255, 0),
+    'silks': (255, 255, 255)
+}
+
+BACKGROUND_COLOR = (0, 0, 0)
+
+TRACE_WIDTH = 0.127
+VIA_SIZE = 0.6
+HOLE_DIAMETER = 3.2
+GRAPHIC_WIDTH = 0.15
+CIRCLE_SEGMENTS = 128
+
+
+class Viewport:
+    def __init__(self, radius, size):
+        self.radius = radius
+        self.size = size
+        self.scale = size / (2.0 * radius)
+
+    def to_pixels(self, vertices):
+        vs = np.asarray(vertices, dtype=float).reshape(-1, 2)
+        return (vs + self.radius) * self.scale
+
+
+def rasterize(polygons, width, height):
+    # Even-odd scanline fill of every polygon at once. Each polygon
+    # contributes spans between consecutive pairs of its own crossings, so
+    # overlapping polygons union rather than cancel.
+    mask = np.zeros((height, width), dtype=bool)
+
+    polygons = [p for p in polygons if len(p) >= 3]
+    if not polygons:
+        return mask
+
+    counts = np.array([len(p) for p in polygons])
+    v0 = np.concatenate(polygons)
+    v1 = np.concatenate([np.roll(p, -1, axis=0) for p in polygons])
+    poly_ids = np.repeat(np.arange(len(polygons)), counts)
+
+    y_min = np.minimum(v0[:, 1], v1[:, 1])
+    y_max = np.maximum(v0[:, 1], v1[:, 1])
+
+    # Rows whose centers fall in [y_min, y_max) cross the edge.
+    row_start = np.ceil(y_min - 0.5).astype(np.int64)
+    row_end = np.ceil(y_max - 0.5).astype(np.int64)
+    row_counts = np.maximum(row_end - row_start, 0)
+
+    total = row_counts.sum()
+    if total == 0:
+        return mask
+
+    edge_ids = np.repeat(np.arange(len(v0)), row_counts)
+    offsets = np.arange(total) - np.repeat(np.cumsum(row_counts) - row_counts, row_counts)
+    rows = row_start[edge_ids] + offsets
+
+    x0, y0 = v0[edge_ids, 0], v0[edge_ids, 1]
+    x1, y1 = v1[edge_ids, 0], v1[edge_ids, 1]
+    yc = rows + 0.5
+    xs = x0 + (yc - y0) * (x1 - x0) / (y1 - y0)
+
+    order = np.lexsort((xs, rows, poly_ids[edge_ids]))
+    xs = xs[order]
+    rows = rows[order]
+
+    span_rows = rows[0::2]
+    span_start = np.clip(np.ceil(xs[0::2] - 0.5), 0, width).astype(np.int64)
+    span_end = np.clip(np.ceil(xs[1::2] - 0.5), 0, width).astype(np.int64)
+
+    visible = (span_rows >= 0) & (span_rows < height) & (span_end > span_start)
+    span_rows = span_rows[visible]
+    span_start = span_start[visible]
+    span_end = span_end[visible]
+
+    coverage = np.zeros((height, width + 1), dtype=np.int32)
+    np.add.at(coverage, (span_rows, span_start), 1)
+    np.add.at(coverage, (span_rows, span_end), -1)
+
+    return np.cumsum(coverage[:, :width], axis=1) > 0
+
+
+def stroke_polyline(vertices, half_width, closed=False):
+    vs = np.asarray(vertices, dtype=float)
+    if closed:
+        vs = np.vstack([vs, vs[:1]])
+
+    p0 = vs[:-1]
+    p1 = vs[1:]
+    d = p1 - p0
+    length = np.hypot(d[:, 0], d[:, 1])
+    keep = length > 0
+    p0, p1, d, length = p0[keep], p1[keep], d[keep], length[keep]
+
+    n = np.stack([-d[:, 1], d[:, 0]], axis=1) / length[:, None] * half_width
+    quads = np.stack([p0 + n, p1 + n, p1 - n, p0 - n], axis=1)
+    return list(quads)
+
+
+def circle_vertices(center, radius, segments=CIRCLE_SEGMENTS):
+    theta = np.linspace(0, 2 * math.pi, segments, endpoint=False)
+    return np.stack([
+        center[0] + radius * np.cos(theta),
+        center[1] + radius * np.sin(theta)
+    ], axis=1)
+
+
+def arc_vertices(center, start, angle, segments=CIRCLE_SEGMENTS):
+    n = max(2, int(math.ceil(abs(angle) / 360.0 * segments)) + 1)
+    dx = start[0] - center[0]
+    dy = start[1] - center[1]
+    theta = np.linspace(0, math.pi / 180.0 * angle, n)
+    s, c = np.sin(theta), np.cos(theta)
+    return np.stack([
+        c * dx - s * dy + center[0],
+        s * dx + c * dy + center[1]
+    ], axis=1)
+
+
+def graphics_polygons(graphics, viewport, width):
+    hw = max(width * viewport.scale, 1.0) / 2
+
+    polygons = []
+    for gl in graphics.lines:
+        polygons += stroke_polyline(viewport.to_pixels([gl.start, gl.end]), hw)
+
+    for ga in graphics.arcs:
+        vs = arc_vertices(ga.center, ga.start, ga.angle)
+        polygons += stroke_polyline(viewport.to_pixels(vs), hw)
+
+    for gc in graphics.circles:
+        vs = circle_vertices(gc.center, gc.radius)
+        polygons += stroke_polyline(viewport.to_pixels(vs), hw, closed=True)
+
+    for gp in graphics.polygons:
+        polygons += stroke_polyline(viewport.to_pixels(gp.vertices), hw, closed=True)
+
+    return polygons
+
+
+def component_layers(component, viewport):
+    electrodes = []
+    arcs = []
+    vias = []
+
+    trace_hw = max(TRACE_WIDTH * viewport.scale, 1.0) / 2
+
+    for s in component.signals:
+        for evs in electrode_polygons(s.electrodes):
+            electrodes.append(viewport.to_pixels(evs))
+
+        arcs += stroke_polyline(viewport.to_pixels(s.arc.to_polygon()), trace_hw)
+
+        for v in s.vias:
+            vs = circle_vertices(v.to_vertex(), VIA_SIZE / 2, 16)
+            vias.append(viewport.to_pixels(vs))
+
+    edge_cuts = graphics_polygons(component.edge_cuts, viewport, GRAPHIC_WIDTH)
+    for h in component.holes:
+        vs = circle_vertices(h.center, HOLE_DIAMETER / 2)
+        edge_cuts += stroke_polyline(viewport.to_pixels(vs), trace_hw, closed=True)
+
+    silks = graphics_polygons(component.silks, viewport, GRAPHIC_WIDTH)
+
+    return [
+        ('electrodes', electrodes),
+        ('arcs', arcs),
+        ('vias', vias),
+        ('edge_cuts', edge_cuts),
+        ('silks', silks)
+    ]
+
+
+def render_component(component, size=512, radius=None):
+    if radius is None:
+        radius = component.box_dimension / 2 + 1
+
+    viewport = Viewport(radius, size)
+
+    image = np.empty((size, size, 3), dtype=np.uint8)
+    image[:] = BACKGROUND_COLOR
+
+    for name, polygons in component_layers(component, viewport):
+        mask = rasterize(polygons, size, size)
+        image[mask] = LAYER_COLORS[name]
+
+    return image
+
+
+def tile(images, columns=None, padding=2):
+    if not images:
+        raise ValueError("there must be at least one image")
+
+    if columns is None:
+        columns = int(math.ceil(math.sqrt(len(images))))
+    rows = int(math.ceil(len(images) / float(columns)))
+
+    cell_h = max(i.shape[0] for i in images) + padding
+    cell_w = max(i.shape[1] for i in images) + padding
+
+    sheet = np.zeros((rows * cell_h + padding, columns * cell_w + padding, 3), dtype=np.uint8)
+    sheet[:] = (64, 64, 64)
+
+    for k, img in enumerate(images):
+        r, c = divmod(k, columns)
+        y = r * cell_h + padding
+        x = c * cell_w + padding
+        sheet[y:y + img.shape[0], x:x + img.shape[1]] = img
+
+    return sheet
+
+
+def encode_png(image):
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+    height, width = image.shape[:2]
+
+    raw = np.zeros((height, width * 3 + 1), dtype=np.uint8)
+    raw[:, 1:] = image.reshape(height, width * 3)
+
+    def chunk(tag, data):
+        body = tag + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', header),
+        chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)),
+        chunk(b'IEND', b'')
+    ])
+
+
+def write_png(path, image):
+    with open(path, 'wb') as f:
+        f.write(encode_png(image))
+
+
+def _render_one(args):
+    component, size, radius = args
+    return render_component(component, size, radius)
+
+
+def render_many(components, size=256, radius=None, processes=None):
+    jobs = [(c, size, radius) for c in components]
+
+    if processes == 1 or len(jobs) < 2:
+        return [_render_one(j) for j in jobs]
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        return list(executor.map(_render_one, jobs, chunksize=max(1, len(jobs) // 64)))
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'preview.png'
+
+    components = [
+        StatorComponent(30, 61.4, 100),
+        RotorComponent(30, 61.4, 100)
+    ]
+
+    images = render_many(components, size=1024)
+    write_png(path, tile(images, columns=len(images)))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import inspect
+import numpy as np
+
+# Electrode shapes are profiles: functions of the number of samples that
+# return, as arrays, where along the sector each sample sits (`fa`, 0 at the
+# start angle and 1 at the end) and how far the electrode reaches from the
+# center radius there (`h`, as a fraction of half the radial length). The
+# outline runs along the outer edge and back along the inner one.
+#
+# Polygons are evaluated for whole batches of electrodes at once; electrodes
+# of a stage share one profile and differ only in their sector.
+
+PROFILES = {}
+
+
+class Profile:
+    def __init__(self, name, fn, samples):
+        self.name = name
+        self.fn = fn
+        self.samples = samples
+        self.parameters = set(inspect.signature(fn).parameters) - {'n'}
+
+    def __call__(self, **params):
+        unknown = set(params) - self.parameters
+        if unknown:
+            raise ValueError("%s has no parameter %s" % (self.name, ', '.join(sorted(unknown))))
+
+        fa, h = self.fn(self.samples, **params)
+        return np.asarray(fa, dtype=float), np.asarray(h, dtype=float)
+
+
+def register_profile(name, samples):
+    """
+    Decorator adding a profile function `fn(n, **params) -> (fa, h)` to the
+    registry under `name`.
+    """
+    def register(fn):
+        PROFILES[name] = Profile(name, fn, samples)
+        return fn
+    return register
+
+
+@register_profile('trapezoidal', 3)
+def trapezoidal(n, width_fraction=0.5, base_fraction=None):
+    # Full height over the middle `width_fraction` of the sector, tapering
+    # to a point over `base_fraction` if that is wider.
+    top = width_fraction
+    base = top if base_fraction is None else base_fraction
+    if not 0 < top <= base <= 1:
+        raise ValueError("need 0 < width_fraction <= base_fraction <= 1")
+
+    fa = 0.5 - top / 2 + top * np.linspace(0, 1, n)
+    h = np.ones(n)
+    if base > top:
+        fa = np.concatenate([[0.5 - base / 2], fa, [0.5 + base / 2]])
+        h = np.concatenate([[0], h, [0]])
+    return fa, h
+
+
+@register_profile('sinusoidal', 12)
+def sinusoidal(n, cutoff=0.0):
+    fa = (1 - 2 * cutoff) * np.linspace(0, 1, n) + cutoff
+    return fa, np.sin(np.pi * fa)
+
+
+@register_profile('harmonic', 24)
+def harmonic(n, coefficients=(1.0,), cutoff=0.0):
+    # Sum of odd sine harmonics of the sector, scaled to peak at 1 and
+    # clipped at 0. coefficients=(1,) is the plain sinusoid.
+    fa = (1 - 2 * cutoff) * np.linspace(0, 1, n) + cutoff
+    k = 2 * np.arange(len(coefficients)) + 1
+    h = np.asarray(coefficients, dtype=float) @ np.sin(np.pi * np.outer(k, fa))
+
+    dense = np.linspace(0, 1, 512)
+    peak = np.max(np.asarray(coefficients, dtype=float) @ np.sin(np.pi * np.outer(k, dense)))
+    if peak <= 0:
+        raise ValueError("harmonic coefficients give no positive extent")
+    return fa, np.clip(h / peak, 0, None)
+
+
+def resolve_shape(shape, default):
+    """
+    (profile name, params) for a shape given in a spec: None for `default`,
+    a profile name, or a table with a `profile` key and its parameters.
+    Parameters left out of a table for the default's own profile keep the
+    default's values.
+    """
+    if shape is None:
+        return default
+    if isinstance(shape, str):
+        shape = {'profile': shape}
+
+    params = dict(shape)
+    name = params.pop('profile', default[0])
+    if name not in PROFILES:
+        raise ValueError("unknown electrode profile %s" % name)
+
+    if name == default[0]:
+        params = dict(default[1], **params)
+
+    # Fail now rather than at tessellation.
+    PROFILES[name](**params)
+    return (name, params)
+
+
+def profile_polygons(profile, params, sectors):
+    """
+    Polygons of one profile over many sectors, as an array of shape
+    (len(sectors), vertices, 2).
+    """
+    fa, h = PROFILES[profile](**params)
+
+    inner = np.array([s.inner_radius for s in sectors], dtype=float)
+    outer = np.array([s.outer_radius for s in sectors], dtype=float)
+    start = np.array([s.start_angle for s in sectors], dtype=float)
+    end = np.array([s.end_angle for s in sectors], dtype=float)
+
+    radius = ((inner + outer) / 2)[:, None]
+    delta = ((outer - inner) / 2)[:, None]
+
+    theta = start[:, None] + fa[None, :] * (end - start)[:, None]
+    theta = np.concatenate([theta, theta[:, ::-1]], axis=1)
+    r = np.concatenate([radius + delta * h, (radius - delta * h)[:, ::-1]], axis=1)
+
+    theta_rad = np.pi / 180.0 * theta
+    return np.stack([r * np.cos(theta_rad), r * np.sin(theta_rad)], axis=-1)
+
+
+def electrode_polygons(electrodes):
+    """
+    Vertex lists of many electrodes, evaluating each distinct profile once
+    over all the sectors that use it.
+    """
+    groups = {}
+    for i, e in enumerate(electrodes):
+        key = (e.profile, tuple(sorted((k, _hashable(v)) for k, v in e.params.items())))
+        groups.setdefault(key, []).append(i)
+
+    polygons = [None] * len(electrodes)
+    for (profile, _), indices in groups.items():
+        batch = profile_polygons(profile, electrodes[indices[0]].params, [electrodes[i].sector for i in indices])
+        for i, vertices in zip(indices, batch):
+            polygons[i] = [tuple(v) for v in vertices.tolist()]
+    return polygons
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(v) for v in value)
+    return value
@@ -0,0 +1,234 @@
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .graph import DEFAULT_SPEC, load_spec, build_component
+from .shapes import electrode_polygons
+
+# Monte Carlo study of how fabrication tolerances move the electrode area and
+# centroid of each channel. Etch bias moves every electrode edge along its
+# normal; registration, rotor eccentricity and hole position errors move the
+# electrode layer as a whole relative to the rotor axis.
+#
+# The area and first moments of a polygon whose vertices move by a bias b
+# along fixed miter vectors are polynomials in b (quadratic and cubic), so
+# each electrode is reduced to a few coefficients once and samples are
+# evaluated as arrays.
+
+MITER_LIMIT = 2.0
+CHUNK_SIZE = 4096
+
+# Biases at which electrode moments are evaluated to recover their
+# polynomial coefficients.
+_BIASES = np.array([-1.0, 0.0, 1.0, 2.0])
+_VANDERMONDE = np.vander(_BIASES, 4, increasing=True)
+
+
+class Tolerances:
+    """
+    Standard deviations in mm. `etch_bias` is a systematic bias shared by
+    every edge of a board; `etch_sigma` varies it from board to board and
+    `etch_local` from electrode to electrode.
+    """
+    def __init__(self, etch_bias=0.0, etch_sigma=0.01, etch_local=0.005,
+                 registration=0.05, eccentricity=0.05, hole_position=0.05):
+        self.etch_bias = etch_bias
+        self.etch_sigma = etch_sigma
+        self.etch_local = etch_local
+        self.registration = registration
+        self.eccentricity = eccentricity
+        self.hole_position = hole_position
+
+    def to_json(self):
+        return dict(vars(self))
+
+
+def _miters(vs):
+    # Outward offset of each vertex for a unit move of both adjacent edges,
+    # of a counter-clockwise polygon.
+    d = np.roll(vs, -1, axis=0) - vs
+    n = np.stack([d[:, 1], -d[:, 0]], axis=1) / np.hypot(d[:, 0], d[:, 1])[:, None]
+    prev = np.roll(n, 1, axis=0)
+    m = (n + prev) / np.maximum(1 + np.sum(n * prev, axis=1), 1e-9)[:, None]
+
+    length = np.hypot(m[:, 0], m[:, 1])
+    return m * (np.minimum(length, MITER_LIMIT) / np.maximum(length, 1e-12))[:, None]
+
+
+def _moments(vs):
+    # (area, x moment, y moment) of polygons given as (..., vertices, 2).
+    x, y = vs[..., 0], vs[..., 1]
+    xn, yn = np.roll(x, -1, axis=-1), np.roll(y, -1, axis=-1)
+    cross = x * yn - xn * y
+    return (
+        cross.sum(axis=-1) / 2,
+        ((x + xn) * cross).sum(axis=-1) / 6,
+        ((y + yn) * cross).sum(axis=-1) / 6)
+
+
+def electrode_coefficients(vertices):
+    """
+    Polynomial coefficients (constant term first) of the area and the x and
+    y moments of an electrode as functions of etch bias, as a (3, 4) array.
+    """
+    vs = np.asarray(vertices, dtype=float)
+    keep = np.any(np.abs(vs - np.roll(vs, 1, axis=0)) > 1e-12, axis=1)
+    vs = vs[keep]
+    if _moments(vs)[0] < 0:
+        vs = vs[::-1]
+
+    offset = vs[None, :, :] + _BIASES[:, None, None] * _miters(vs)[None, :, :]
+    values = np.stack(_moments(offset))
+    return np.linalg.solve(_VANDERMONDE, values.T).T
+
+
+class ChannelModel:
+    """
+    The electrodes of a component reduced to bias polynomials, with the
+    channel (stage, net) each belongs to.
+    """
+    def __init__(self, component):
+        self.channels = []
+        self.groups = []
+
+        coefficients = []
+        owners = []
+        for stage, signals in enumerate(component.stage_signals()):
+            group = []
+            for s in signals:
+                if (stage, s.name) not in self.channels:
+                    self.channels.append((stage, s.name))
+                    group.append(s.name)
+                channel = self.channels.index((stage, s.name))
+                for vertices in electrode_polygons(s.electrodes):
+                    coefficients.append(electrode_coefficients(vertices))
+                    owners.append(channel)
+            self.groups.append(group)
+
+        self.coefficients = np.stack(coefficients)
+        self.membership = np.zeros((len(owners), len(self.channels)))
+        self.membership[np.arange(len(owners)), owners] = 1
+        self.hole_count = max(len(component.holes), 1)
+
+    def nominal(self):
+        """(areas, centroids) of the channels with no perturbation."""
+        area, mx, my = (self.coefficients[:, k, 0] @ self.membership for k in range(3))
+        return area, np.stack([mx / area, my / area], axis=-1)
+
+
+def sample(model, tolerances, count, seed=None):
+    """
+    Channel areas (count, channels) and centroids relative to the rotor axis
+    (count, channels, 2) of `count` perturbed boards.
+    """
+    rng = np.random.default_rng(seed)
+    t = tolerances
+    electrodes = model.membership.shape[0]
+
+    bias = (t.etch_bias + t.etch_sigma * rng.standard_normal((count, 1)) +
+            t.etch_local * rng.standard_normal((count, electrodes)))
+    powers = bias[..., None] ** np.arange(4)
+
+    area, mx, my = (np.einsum('nek,ek->ne', powers, model.coefficients[:, k]) @ model.membership for k in range(3))
+
+    # The board sits on its holes, so drilling them off by e moves the
+    # copper by -e on average.
+    offset = (
+        t.registration * rng.standard_normal((count, 2)) +
+        t.eccentricity * rng.standard_normal((count, 2)) -
+        t.hole_position * rng.standard_normal((count, model.hole_count, 2)).mean(axis=1))
+
+    centroids = np.stack([mx / area, my / area], axis=-1) + offset[:, None, :]
+    return area, centroids
+
+
+def _sample_chunk(args):
+    return sample(*args)
+
+
+def monte_carlo(model, tolerances=None, samples=20000, seed=0, processes=None, chunk_size=CHUNK_SIZE):
+    """
+    Runs `samples` boards in chunks across a process pool. Each chunk has
+    its own seed derived from `seed`, so results do not depend on the
+    number of processes.
+    """
+    tolerances = tolerances or Tolerances()
+    sizes = [min(chunk_size, samples - i) for i in range(0, samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(model, tolerances, n, s) for n, s in zip(sizes, seeds)]
+
+    if processes == 1 or len(jobs) < 2:
+        results = [_sample_chunk(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            results = list(executor.map(_sample_chunk, jobs))
+
+    return np.concatenate([r[0] for r in results]), np.concatenate([r[1] for r in results])
+
+
+def summarize(model, tolerances, areas, centroids):
+    """
+    Per channel: nominal area, area spread and centroid spread. Per group
+    (the nets of one stage): the relative area mismatch between channels,
+    as a standard deviation and as the worst max-min spread of any sample.
+    """
+    nominal_area, nominal_centroid = model.nominal()
+    groups = []
+    for stage, names in enumerate(model.groups):
+        indices = [model.channels.index((stage, name)) for name in names]
+        a = areas[:, indices]
+        mean = a.mean(axis=1, keepdims=True)
+
+        channels = {}
+        for name, i in zip(names, indices):
+            c = centroids[:, i]
+            channels[name] = {
+                "area": float(nominal_area[i]),
+                "area_mean": float(areas[:, i].mean()),
+                "area_std": float(areas[:, i].std()),
+                "centroid": nominal_centroid[i].tolist(),
+                "centroid_mean": c.mean(axis=0).tolist(),
+                "centroid_std": c.std(axis=0).tolist(),
+                "centroid_rms": float(np.sqrt(np.mean(np.sum(c ** 2, axis=1))))
+            }
+
+        groups.append({
+            "stage": stage,
+            "channels": channels,
+            "mismatch_std": float(((a - mean) / mean).std()),
+            "mismatch_max": float(((a.max(axis=1) - a.min(axis=1)) / mean[:, 0]).max())
+        })
+
+    return {
+        "samples": len(areas),
+        "tolerances": tolerances.to_json(),
+        "groups": groups
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='geomgen.tolerance', description='Monte Carlo channel area and centroid spread')
+    parser.add_argument('--spec', metavar='SPEC', help='design spec to analyse (default: the stock stator)')
+    parser.add_argument('--samples', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int, default=None)
+    defaults = Tolerances()
+    for name, value in vars(defaults).items():
+        parser.add_argument('--' + name.replace('_', '-'), type=float, default=value, metavar='MM')
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec) if args.spec else DEFAULT_SPEC
+    component = build_component(spec)
+
+    tolerances = Tolerances(**{name: getattr(args, name) for name in vars(defaults)})
+    model = ChannelModel(component)
+    areas, centroids = monte_carlo(model, tolerances, args.samples, args.seed, args.processes)
+
+    json.dump(summarize(model, tolerances, areas, centroids), sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+import sys
+import math
+import argparse
+
+from .geometry import StatorComponent, RotorComponent
+from .gerber import read_gerber, read_excellon
+from .shapes import electrode_polygons
+
+# Checks plotted Gerber and drill files against the geometry of a freshly
+# generated Component. Component coordinates are KiCad board coordinates
+# relative to `offset`; Gerber coordinates have Y pointing up.
+
+TOLERANCE = 0.05
+ARC_SAMPLE_PITCH = 1.0
+EDGE_SAMPLE_PITCH = 2.0
+HOLE_DIAMETER = 3.2
+
+
+class Transform:
+    def __init__(self, offset=(0, 0)):
+        self.offset = offset
+
+    def __call__(self, p):
+        return (p[0] + self.offset[0], -(p[1] + self.offset[1]))
+
+
+class Check:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.failures = []
+
+    def record(self, ok, what):
+        self.count += 1
+        if not ok:
+            self.failures.append(what)
+
+
+class Report:
+    def __init__(self):
+        self.checks = []
+
+    def check(self, name):
+        c = Check(name)
+        self.checks.append(c)
+        return c
+
+    def ok(self):
+        return all(not c.failures for c in self.checks)
+
+    def lines(self):
+        out = []
+        for c in self.checks:
+            out.append("%-12s %6d checked, %d failed" % (c.name, c.count, len(c.failures)))
+            for f in c.failures[:20]:
+                out.append("    %s" % f)
+            if len(c.failures) > 20:
+                out.append("    ... %d more" % (len(c.failures) - 20))
+        return out
+
+
+def _covered(index, p, tolerance=0):
+    return any(prim.contains(p[0], p[1], tolerance) for prim in index.query_point(p[0], p[1], tolerance))
+
+
+def _electrode_samples(vertices):
+    # The centroid plus every vertex pulled a little towards it, so that a
+    # copper shape that is shifted or too small is caught.
+    cx = sum(v[0] for v in vertices) / len(vertices)
+    cy = sum(v[1] for v in vertices) / len(vertices)
+    return [(cx, cy)] + [(cx + 0.8 * (v[0] - cx), cy + 0.8 * (v[1] - cy)) for v in vertices]
+
+
+def _polyline_samples(vertices, pitch):
+    samples = [vertices[0]]
+    travelled = 0.0
+    for a, b in zip(vertices, vertices[1:]):
+        travelled += math.hypot(b[0] - a[0], b[1] - a[1])
+        if travelled >= pitch:
+            samples.append(b)
+            travelled = 0.0
+    samples.append(vertices[-1])
+    return samples
+
+
+def _graphic_samples(graphics, pitch):
+    samples = []
+    for gl in graphics.lines:
+        n = max(1, int(math.hypot(gl.end[0] - gl.start[0], gl.end[1] - gl.start[1]) / pitch))
+        samples += [(gl.start[0] + (gl.end[0] - gl.start[0]) * k / n,
+                     gl.start[1] + (gl.end[1] - gl.start[1]) * k / n) for k in range(n + 1)]
+
+    for ga in graphics.arcs:
+        dx = ga.start[0] - ga.center[0]
+        dy = ga.start[1] - ga.center[1]
+        n = max(1, int(abs(math.radians(ga.angle)) * math.hypot(dx, dy) / pitch))
+        for k in range(n + 1):
+            t = math.radians(ga.angle) * k / n
+            s, c = math.sin(t), math.cos(t)
+            samples.append((c * dx - s * dy + ga.center[0], s * dx + c * dy + ga.center[1]))
+
+    for gc in graphics.circles:
+        n = max(8, int(2 * math.pi * gc.radius / pitch))
+        samples += [(gc.center[0] + gc.radius * math.cos(2 * math.pi * k / n),
+                     gc.center[1] + gc.radius * math.sin(2 * math.pi * k / n)) for k in range(n)]
+    return samples
+
+
+def _find_hole(index, p, tolerance, diameter=None):
+    for h in index.query_point(p[0], p[1], tolerance):
+        if math.hypot(h.x - p[0], h.y - p[1]) <= tolerance:
+            if diameter is None or abs(h.diameter - diameter) <= tolerance:
+                return True
+    return False
+
+
+def verify_component(component, electrode_layer=None, bus_layer=None, drills=(), edge_layer=None,
+                     offset=(0, 0), tolerance=TOLERANCE):
+    """
+    Compares a Component with parsed fab outputs. Any of the layers may be
+    left out, in which case the checks that need it are skipped.
+    """
+    t = Transform(offset)
+    report = Report()
+
+    if electrode_layer is not None:
+        index = electrode_layer.index()
+        check = report.check('electrodes')
+        for s in component.signals:
+            for k, evs in enumerate(electrode_polygons(s.electrodes)):
+                samples = [t(p) for p in _electrode_samples(evs)]
+                ok = all(_covered(index, p) for p in samples)
+                check.record(ok, "%s electrode %d at (%.3f, %.3f)" % ((s.name, k) + samples[0]))
+
+    if bus_layer is not None:
+        index = bus_layer.index()
+        check = report.check('bus arcs')
+        for s in component.signals:
+            for p in _polyline_samples(s.arc.to_polygon(), ARC_SAMPLE_PITCH):
+                p = t(p)
+                check.record(_covered(index, p, tolerance), "%s bus at (%.3f, %.3f)" % ((s.name,) + p))
+
+    holes = [h for d in drills for h in d.holes]
+    if drills:
+        index = drills[0].index()
+        for d in drills[1:]:
+            for h in d.holes:
+                index.insert(h, h.bbox)
+
+        check = report.check('vias')
+        for s in component.signals:
+            for v in s.vias:
+                p = t(v.to_vertex())
+                check.record(_find_hole(index, p, tolerance), "%s via at (%.3f, %.3f)" % ((s.name,) + p))
+
+        check = report.check('holes')
+        for h in component.holes:
+            p = t(h.center)
+            check.record(_find_hole(index, p, tolerance, HOLE_DIAMETER), "mounting hole at (%.3f, %.3f)" % p)
+
+        expected = len([v for s in component.signals for v in s.vias]) + len(component.holes)
+        check = report.check('drill count')
+        check.record(len(holes) == expected, "%d drills in files, %d expected" % (len(holes), expected))
+
+    if edge_layer is not None:
+        index = edge_layer.index()
+        check = report.check('edge cuts')
+        for p in _graphic_samples(component.edge_cuts, EDGE_SAMPLE_PITCH):
+            p = t(p)
+            check.record(_covered(index, p, tolerance), "edge at (%.3f, %.3f)" % p)
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='geomgen.verify', description='check fab outputs against generated geometry')
+    parser.add_argument('--component', choices=['stator', 'rotor'], default='stator')
+    parser.add_argument('--dimensions', type=float, nargs=3, default=[30, 61.4, 100],
+                        metavar=('INNER', 'OUTER', 'BOX'))
+    parser.add_argument('--electrodes', help='Gerber holding the electrodes')
+    parser.add_argument('--bus', help='Gerber holding the bus arcs')
+    parser.add_argument('--edge', help='Edge.Cuts Gerber')
+    parser.add_argument('--drill', action='append', default=[], help='Excellon file (repeatable)')
+    parser.add_argument('--offset', type=float, nargs=2, default=[0, 0], metavar=('X', 'Y'),
+                        help='board position of the component origin')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.component == 'stator':
+        component = StatorComponent(*args.dimensions)
+    else:
+        component = RotorComponent(*args.dimensions)
+
+    report = verify_component(
+        component,
+        electrode_layer=read_gerber(args.electrodes) if args.electrodes else None,
+        bus_layer=read_gerber(args.bus) if args.bus else None,
+        drills=[read_excellon(d) for d in args.drill],
+        edge_layer=read_gerber(args.edge) if args.edge else None,
+        offset=args.offset,
+        tolerance=args.tolerance)
+
+    for line in report.lines():
+        print(line)
+
+    sys.exit(0 if report.ok() else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+from geomgen.boolean import union, fracture, polygon_area
+from geomgen.geometry import StatorComponent, RotorComponent
+from geomgen.merge import merge_signals, signals_area
+
+
+def square(x, y, s):
+    return [(x, y), (x + s, y), (x + s, y + s), (x, y + s)]
+
+
+def test_union_overlapping():
+    result = union([square(0, 0, 10), square(5, 5, 10)])
+    assert len(result) == 1
+    outline, holes = result[0]
+    assert polygon_area(outline) == 175
+    assert holes == []
+
+
+def test_union_shared_edge():
+    result = union([square(0, 0, 10), square(10, 0, 10)])
+    assert result == [([(0, 0), (20, 0), (20, 10), (0, 10)], [])]
+
+
+def test_union_touching_corner_stays_separate():
+    assert len(union([square(0, 0, 10), square(10, 10, 10)])) == 2
+
+
+def test_union_ring_has_hole():
+    bars = [
+        [(0, 0), (30, 0), (30, 10), (0, 10)],
+        [(0, 20), (30, 20), (30, 30), (0, 30)],
+        [(0, 0), (10, 0), (10, 30), (0, 30)],
+        [(20, 0), (30, 0), (30, 30), (20, 30)]
+    ]
+    [(outline, holes)] = union(bars)
+    assert polygon_area(outline) == 900
+    assert len(holes) == 1 and polygon_area(holes[0]) == 100
+    assert polygon_area(fracture(outline, holes)) == 800
+
+
+def test_merge_preserves_copper_area():
+    for component in [StatorComponent(30, 61.4, 100), RotorComponent(30, 61.4, 100)]:
+        merged = merge_signals(component.signals)
+        assert len(merged) == len(set(s.name for s in component.signals))
+        area = sum(m.area() for m in merged)
+        assert abs(area - signals_area(component.signals)) < 1e-3
@@ -0,0 +1,42 @@
+import json
+
+from geomgen.cli import main
+from geomgen.geometry import StatorComponent
+
+
+def test_progress_events(capsys):
+    main(['--merge', '--progress'])
+    captured = capsys.readouterr()
+
+    geom = json.loads(captured.out)
+    events = [json.loads(line) for line in captured.err.splitlines()]
+
+    assert events[0]['phase'] == 'geometry'
+    assert events[-1] == {'phase': 'export', 'percent': 100, 'zones': len(geom['zones']),
+                          'tracks': len(geom['tracks']), 'vias': len(geom['vias'])}
+
+    percents = [e['percent'] for e in events]
+    assert percents == sorted(percents)
+    assert [e['zones'] for e in events if e['phase'] == 'fill'] == list(range(1, len(geom['zones']) + 1))
+
+
+def test_complete_export(capsys):
+    main(['--flip'])
+    geom = json.loads(capsys.readouterr().out)
+
+    component = StatorComponent(30, 61.4, 100)
+    signals = component.signals
+
+    assert len(geom['zones']) == sum(len(s.electrodes) for s in signals)
+    assert len(geom['tracks']) == 360 * len(signals)
+    assert len(geom['vias']) == sum(len(s.vias) for s in signals)
+    assert len(geom['holes']) == len(component.holes)
+
+    assert {z['layer'] for z in geom['zones']} == {'B.Cu'}
+    assert {t['layer'] for t in geom['tracks']} == {'F.Cu'}
+
+    layers = {g['layer'] for g in geom['graphics']}
+    assert layers == {'Edge.Cuts', 'B.Mask', 'F.SilkS'}
+
+    edges = [g for g in geom['graphics'] if g['layer'] == 'Edge.Cuts']
+    assert len(edges) == len(component.edge_cuts.lines) + len(component.edge_cuts.arcs) + len(component.edge_cuts.circles)
@@ -0,0 +1,55 @@
+import pytest
+
+from geomgen.boolean import difference, polygon_area
+from geomgen.fill import fill_polygon, component_filler, fill_area, deflate, inflate, ZoneFiller, CLEARANCE
+from geomgen.geometry import StatorComponent
+
+
+def test_difference_cuts_hole():
+    square = [(0, 0), (10, 0), (10, 10), (0, 10)]
+    [(outline, holes)] = difference([square], [[(2, 2), (5, 2), (5, 5), (2, 5)]])
+    assert polygon_area(outline) == 100
+    assert [polygon_area(h) for h in holes] == [9]
+
+
+def test_opening_removes_thin_sliver():
+    # A 1000 x 1000 block with a 10 unit wide spike sticking out of it.
+    shape = [(0, 0), (1000, 0), (1000, 495), (3000, 495), (3000, 505), (1000, 505), (1000, 1000), (0, 1000)]
+    pieces = fill_polygon(shape, min_thickness=20 / 1e6)
+    assert len(pieces) == 1
+    assert max(v[0] for v in pieces[0][0]) <= 1010
+
+
+def test_offsets_round_trip_square():
+    square = [(0, 0), (1000, 0), (1000, 1000), (0, 1000)]
+    opened = inflate(deflate([(square, [])], 100), 100)
+    area = fill_area(opened)
+    assert 1000000 - 100 * 100 < area <= 1000000
+
+
+def test_component_fills_stay_inside_electrodes():
+    component = StatorComponent(30, 61.4, 100)
+    filler = component_filler(component)
+
+    for s in component.signals:
+        e = s.electrodes[0]
+        pieces = filler.fill(s.name, e.to_polygon())
+        area = sum(polygon_area(o) - sum(polygon_area(h) for h in hs) for o, hs in pieces)
+        assert 0.99 * polygon_area(e.to_polygon()) < area <= polygon_area(e.to_polygon())
+
+    assert len(filler.cache) <= 3
+
+
+def test_touching_electrodes_keep_clearance():
+    # With no induction cutoff, neighbouring electrodes share an edge.
+    a = [(0, 0), (1, 0), (1, 1), (0, 1)]
+    b = [(1, 0), (2, 0), (2, 1), (1, 1)]
+    filler = ZoneFiller()
+    filler.add_zones('S+', [a])
+    filler.add_zones('C+', [b])
+    filler.add_zones('S+', [[(0, 1), (1, 1), (1, 2), (0, 2)]])
+
+    [(outline, holes)] = filler.fill('S+', a)
+    assert max(x for x, _ in outline) <= 1 - CLEARANCE + 1e-6
+    assert max(y for _, y in outline) == 1
+    assert fill_area(filler.fill('C+', b)) == pytest.approx(fill_area(filler.fill('S+', a)))
@@ -0,0 +1,89 @@
+import copy
+import json
+
+import pytest
+
+from geomgen.graph import DEFAULT_SPEC
+from geomgen import cli
+from geomgen.fingerprint import manifest, compare, primitive_fingerprint, primitive_id, main
+
+
+@pytest.fixture(scope='module')
+def document():
+    return json.loads(json.dumps(cli.document(dict(DEFAULT_SPEC))))
+
+
+def test_quantized_fingerprints():
+    via = {"net": "S+", "point": [1.0, 2.0], "size": 0.6, "drill": 0.3}
+    noisy = {"drill": 0.3 + 1e-12, "size": 0.6, "point": (1.0 + 1e-9, 2.0), "net": "S+"}
+    assert primitive_fingerprint(via) == primitive_fingerprint(noisy)
+    assert primitive_fingerprint(via) != primitive_fingerprint(dict(via, net="S-"))
+    assert primitive_fingerprint(via) != primitive_fingerprint(dict(via, point=[1.0001, 2.0]))
+
+
+def test_unchanged_runs(document):
+    a = manifest(document)
+    b = manifest(json.loads(json.dumps(document)))
+    assert a["root"] == b["root"]
+    assert compare(a, b) == []
+    assert set(a["layers"]) == {'F.Cu', 'B.Cu', 'vias', 'holes', 'Edge.Cuts', 'F.Mask', 'F.SilkS'}
+
+
+def test_differences_named(document):
+    changed = copy.deepcopy(document)
+    changed["vias"][5]["size"] += 0.1
+    removed = changed["tracks"].pop()
+    changed["holes"].append({"point": [0, 0], "diameter": 3.2})
+
+    a, b = manifest(document), manifest(changed)
+    assert a["layers"]["F.Cu"]["root"] == b["layers"]["F.Cu"]["root"]
+
+    found = [(d.status, d.layer, d.primitive) for d in compare(a, b)]
+    assert found == [
+        ('removed', 'B.Cu', primitive_id('tracks', removed)),
+        ('added', 'holes', 'holes/@0.00000,0.00000'),
+        ('changed', 'vias', primitive_id('vias', document["vias"][5]))
+    ]
+
+
+def test_insertion_keeps_ids(document):
+    changed = copy.deepcopy(document)
+    changed["zones"].insert(0, dict(document["zones"][3], points=[[1, 1], [2, 1], [2, 2]]))
+    changed["vias"].insert(0, dict(document["vias"][0], size=1.0))
+
+    found = [(d.status, d.primitive) for d in compare(manifest(document), manifest(changed))]
+    via = primitive_id('vias', document["vias"][0])
+    assert found == [
+        ('added', 'zones/S+@1.00000,1.00000'),
+        ('changed', via),
+        ('added', via + '#1')
+    ]
+
+
+def test_check_against_golden(document, tmp_path, capsys):
+    golden = tmp_path / 'golden.json'
+    main(['check', str(golden), '--update'])
+
+    # The golden is of the document the CLI prints.
+    cli.main([])
+    emitted = tmp_path / 'emitted.json'
+    emitted.write_text(capsys.readouterr().out)
+    with pytest.raises(SystemExit) as e:
+        main(['compare', str(golden), str(emitted)])
+    assert e.value.code == 0
+
+    with pytest.raises(SystemExit) as e:
+        main(['check', str(golden)])
+    assert e.value.code == 0
+
+    changed = copy.deepcopy(document)
+    changed["zones"][0]["net"] = "C+"
+    run = tmp_path / 'run.json'
+    run.write_text(json.dumps(changed))
+
+    with pytest.raises(SystemExit) as e:
+        main(['compare', str(golden), str(run)])
+    assert e.value.code == 1
+    out = capsys.readouterr().out
+    zone = document["zones"][0]
+    assert primitive_id('zones', zone) in out and primitive_id('zones', dict(zone, net='C+')) in out
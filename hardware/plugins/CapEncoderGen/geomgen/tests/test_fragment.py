@@ -0,0 +1,201 @@
+import io
+import os
+import re
+import importlib.util
+
+from geomgen.geometry import StatorComponent
+from geomgen.graph import Pipeline, DEFAULT_SPEC
+from geomgen.fragment import write_fragment, GROUP_NAME
+from geomgen.kicad import read_board, diff_board
+
+PLUGIN_FRAGMENT = os.path.join(os.path.dirname(__file__), '..', '..', 'CapEncoderGen', 'fragment.py')
+
+
+def _plugin_fragment():
+    # The plugin package imports pcbnew; its fragment module does not.
+    spec = importlib.util.spec_from_file_location('capencodergen_fragment', PLUGIN_FRAGMENT)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _document(merge):
+    return Pipeline(dict(DEFAULT_SPEC, merge=merge)).document()
+
+
+def test_fragment_round_trip():
+    for merge in [False, True]:
+        document = _document(merge)
+        out = io.StringIO()
+        write_fragment(document, out)
+        text = out.getvalue()
+
+        board = read_board(io.StringIO(text))
+        assert len(board.zones) == len(document['zones'])
+        assert all(z.filled_polygons for z in board.zones)
+        assert diff_board(board, StatorComponent(30, 61.4, 100)).up_to_date()
+
+        members = re.search(r'\(members\s+([^)]*)\)', text).group(1).split()
+        items = sum(len(document[k]) for k in ['zones', 'tracks', 'vias', 'graphics', 'holes'])
+        assert len(members) == len(set(members)) == items
+
+        again = io.StringIO()
+        write_fragment(document, again)
+        assert again.getvalue() == text
+
+
+class StandInItem:
+    def __init__(self, kind, net_name='', zone_name=''):
+        self.kind = kind
+        self.net_name = net_name
+        self.zone_name = zone_name
+        self.net = None
+        self.group = None
+
+    def GetNetname(self):
+        return self.net_name
+
+    def GetZoneName(self):
+        return self.zone_name
+
+    def GetParentGroup(self):
+        return self.group
+
+    def SetNet(self, net):
+        self.net = net
+
+
+class StandInGroup:
+    def __init__(self, name, items):
+        self.name = name
+        self.items = items
+        for item in items:
+            item.group = self
+
+    def GetName(self):
+        return self.name
+
+    def GetItems(self):
+        return self.items
+
+    def AddItem(self, item):
+        item.group = self
+        self.items.append(item)
+
+    def RemoveItem(self, item):
+        item.group = None
+        self.items.remove(item)
+
+
+class StandInBoard:
+    def __init__(self):
+        self.items = []
+        self.groups = []
+        self.nets = {}
+
+    def Zones(self):
+        return [i for i in self.items if i.kind == 'zone']
+
+    def GetTracks(self):
+        return [i for i in self.items if i.kind in ('segment', 'via')]
+
+    def GetDrawings(self):
+        return [i for i in self.items if i.kind == 'drawing']
+
+    def GetFootprints(self):
+        return [i for i in self.items if i.kind == 'footprint']
+
+    def Groups(self):
+        return list(self.groups)
+
+    def FindNet(self, name):
+        return self.nets.get(name)
+
+    def Add(self, item):
+        (self.groups if isinstance(item, StandInGroup) else self.items).append(item)
+
+    def Remove(self, item):
+        # Like pcbnew, removing an item detaches it from its group.
+        if isinstance(item, StandInGroup):
+            self.groups.remove(item)
+            return
+        if item.group is not None:
+            item.group.RemoveItem(item)
+        self.items.remove(item)
+
+
+def load_stand_in(path):
+    # Zones, tracks and vias of the fragment, read back with read_board.
+    # Fragment zones all carry the group's name.
+    parsed = read_board(path)
+    board = StandInBoard()
+    for z in parsed.zones:
+        board.Add(StandInItem('zone', z.net_name, GROUP_NAME))
+    for s in parsed.segments:
+        board.Add(StandInItem('segment', parsed.net_name(s.net)))
+    for v in parsed.vias:
+        board.Add(StandInItem('via', parsed.net_name(v.net)))
+    board.Add(StandInGroup(GROUP_NAME, list(board.items)))
+    return board
+
+
+def test_merge_replaces_previous_group(tmp_path):
+    fragment = _plugin_fragment()
+    assert fragment.GROUP_NAME == GROUP_NAME
+
+    path = str(tmp_path / 'fragment.kicad_pcb')
+    document = _document(True)
+    with open(path, 'w') as f:
+        write_fragment(document, f)
+
+    board = StandInBoard()
+    # The user's own pour and track stay; a grouped run and the loose zones
+    # of a run that created them one by one go.
+    kept = [StandInItem('segment', 'GND'), StandInItem('zone', 'GND')]
+    stale = [StandInItem('zone', 'S+', GROUP_NAME), StandInItem('via', 'S+')]
+    loose = StandInItem('zone', 'C+', GROUP_NAME)
+    for item in kept + stale + [loose]:
+        board.Add(item)
+    board.Add(StandInGroup(GROUP_NAME, stale))
+    board.nets['S+'] = 'existing S+'
+
+    created = []
+
+    def new_net(b, name):
+        created.append(name)
+        b.nets[name] = 'new ' + name
+        return b.nets[name]
+
+    for _ in range(2):
+        moved = fragment.merge_fragment(board, path, load_stand_in, new_net)
+        assert moved == len(document['zones']) + len(document['tracks']) + len(document['vias'])
+
+    assert all(item in board.items for item in kept)
+    assert not any(item in board.items for item in stale + [loose])
+    assert len(board.items) == moved + len(kept)
+    assert len(board.groups) == 1
+    assert len(board.groups[0].GetItems()) == moved
+
+    assert sorted(created) == sorted(['C+', 'S-', 'C-', 'O+', 'O-', 'I+', 'I-'])
+    assert all(i.net == 'existing S+' for i in board.items if i.net_name == 'S+')
+
+
+def test_failed_merge_keeps_previous_run(tmp_path):
+    fragment = _plugin_fragment()
+
+    board = StandInBoard()
+    previous = [StandInItem('zone', 'S+', GROUP_NAME), StandInItem('via', 'S+')]
+    for item in previous:
+        board.Add(item)
+    board.Add(StandInGroup(GROUP_NAME, previous))
+
+    def broken_loader(path):
+        raise IOError("cannot read %s" % path)
+
+    try:
+        fragment.merge_fragment(board, str(tmp_path / 'missing.kicad_pcb'), broken_loader, None)
+    except IOError:
+        pass
+
+    assert board.items == previous
+    assert len(board.groups) == 1
@@ -0,0 +1,107 @@
+import io
+import math
+
+import pytest
+
+from geomgen.geometry import StatorComponent
+from geomgen.gerber import read_gerber, read_excellon, read_gerber_text
+from geomgen.verify import verify_component
+
+HEADER = "%FSLAX46Y46*%\n%MOMM*%\n%LPD*%\n%ADD10C,0.150000*%\nG01*\n"
+
+
+def coord(p):
+    return "X%dY%d" % (round(p[0] * 1e6), round(-p[1] * 1e6))
+
+
+def electrode_gerber(component, skip=None):
+    lines = [HEADER]
+    for s in component.signals:
+        for e in s.electrodes:
+            if e is skip:
+                continue
+            vs = e.to_polygon()
+            lines.append("G36*\n%sD02*\n" % coord(vs[0]))
+            lines += ["%sD01*\n" % coord(v) for v in vs[1:] + vs[:1]]
+            lines.append("G37*\n")
+    lines.append("M02*\n")
+    return ''.join(lines)
+
+
+def bus_gerber(component):
+    lines = [HEADER, "D10*\n"]
+    for s in component.signals:
+        vs = s.arc.to_polygon()
+        lines.append("%sD02*\n" % coord(vs[0]))
+        lines += ["%sD01*\n" % coord(v) for v in vs[1:]]
+    lines.append("M02*\n")
+    return ''.join(lines)
+
+
+def drill_file(component):
+    lines = ["M48\n", "METRIC\n", "T1C0.300\n", "T2C3.200\n", "%\n", "G90\n", "T1\n"]
+    for s in component.signals:
+        for v in s.vias:
+            x, y = v.to_vertex()
+            lines.append("X%.4fY%.4f\n" % (x, -y))
+    lines.append("T2\n")
+    for h in component.holes:
+        lines.append("X%.4fY%.4f\n" % (h.center[0], -h.center[1]))
+    lines.append("M30\n")
+    return ''.join(lines)
+
+
+def test_read_gerber_primitives():
+    layer = read_gerber_text(HEADER + "D10*\nX0Y0D02*\nX1000000Y0D01*\nX5000000Y5000000D03*\n"
+                             "G36*\nX0Y0D02*\nX1000000Y0D01*\nX1000000Y1000000D01*\nX0Y0D01*\nG37*\nM02*\n")
+    assert [p.kind for p in layer.primitives] == ['draw', 'flash', 'region']
+    assert layer.primitives[0].contains(0.5, 0.07)
+    assert not layer.primitives[0].contains(0.5, 0.1)
+    assert layer.primitives[1].contains(5.0, 5.0)
+    assert layer.primitives[2].contains(0.9, 0.5)
+
+
+def test_inch_apertures_scale_only_coordinates():
+    layer = read_gerber_text(
+        "%FSLAX24Y24*%\n%MOIN*%\n%AMBOX*21,1,0.1,$1,0,0,0*%\n%ADD11P,0.1X6X30*%\n%ADD12BOX,0.2*%\n"
+        "D11*\nX0Y0D03*\nD12*\nX0Y0D03*\nM02*\n")
+    polygon, box = [p.shapes[0] for p in layer.primitives]
+
+    assert len(polygon) == 6
+    assert polygon[0] == pytest.approx((1.27 * math.cos(math.radians(30)), 1.27 * math.sin(math.radians(30))))
+    assert max(x for x, _ in box) == pytest.approx(1.27)
+    assert max(y for _, y in box) == pytest.approx(2.54)
+
+
+def test_macro_expressions():
+    layer = read_gerber_text(
+        HEADER + "%AMCALC*$2=-(1+$1)x2*1,1,-$2-4/2,0,0*%\n%ADD13CALC,0.5*%\nD13*\nX0Y0D03*\nM02*\n")
+    assert max(x for x, _ in layer.primitives[0].shapes[0]) == pytest.approx(0.5)
+
+    for expression in ['9xx9xx9', '__import__', '(1+2', '1+']:
+        with pytest.raises(ValueError):
+            read_gerber_text(HEADER + "%%AMBAD*1,1,%s,0,0*%%\n%%ADD14BAD*%%\nM02*\n" % expression)
+
+
+def test_read_excellon():
+    drill = read_excellon(io.StringIO("M48\n; #@! TF.FileFunction,Plated,1,4,PTH\nMETRIC\nT1C0.300\n%\nT1\nX1.5Y-2.25\nY-3.0\nM30\n"))
+    assert [(h.x, h.y, h.diameter, h.plated) for h in drill.holes] == [(1.5, -2.25, 0.3, True), (1.5, -3.0, 0.3, True)]
+
+
+def test_verify_component():
+    component = StatorComponent(30, 61.4, 100)
+
+    report = verify_component(
+        component,
+        electrode_layer=read_gerber(io.StringIO(electrode_gerber(component))),
+        bus_layer=read_gerber(io.StringIO(bus_gerber(component))),
+        drills=[read_excellon(io.StringIO(drill_file(component)))])
+    assert report.ok()
+
+    missing = component.signals[2].electrodes[5]
+    report = verify_component(
+        component,
+        electrode_layer=read_gerber(io.StringIO(electrode_gerber(component, skip=missing))))
+    assert not report.ok()
+    assert len(report.checks[0].failures) == 1
+    assert report.checks[0].failures[0].startswith('S- electrode 5')
@@ -0,0 +1,120 @@
+import io
+import os
+import json
+
+import pytest
+
+from geomgen.graph import Graph, Pipeline, DEFAULT_SPEC, load_spec, build_component
+from geomgen.export import outline_json, holes_json
+from geomgen.cli import main, watch
+
+
+def test_graph_memoises_and_cuts_off():
+    g = Graph()
+    g.param('x', 2)
+    g.node('parity', lambda x: x % 2, 'x')
+    g.node('label', lambda p: 'odd' if p else 'even', 'parity')
+
+    assert g.get('label') == 'even'
+    g.set('x', 4)
+    assert g.get('label') == 'even'
+    assert g.nodes['parity'].computations == 2
+    assert g.nodes['label'].computations == 1
+
+    seen = {}
+    assert g.delta(['label'], seen) == {'label': 'even'}
+    g.set('x', 5)
+    assert g.delta(['label'], seen) == {'label': 'odd'}
+    assert g.delta(['label'], seen) == {}
+
+
+def test_pipeline_recomputes_downstream_only():
+    spec = dict(DEFAULT_SPEC, merge=True)
+    pipeline = Pipeline(spec)
+    seen = {}
+    assert sorted(pipeline.delta(seen)) == sorted(pipeline.outputs)
+
+    pipeline.update(dict(spec, bus_pitch=0.8))
+    changed = pipeline.delta(seen)
+    assert sorted(changed) == ['tracks0', 'tracks1', 'tracks2', 'vias0', 'vias1', 'vias2']
+
+    nodes = pipeline.graph.nodes
+    assert nodes['annuli'].computations == 1
+    assert nodes['outline'].computations == 1
+    assert all(nodes['electrodes%d' % i].version == 1 for i in range(3))
+
+
+@pytest.mark.parametrize('component', ['stator', 'rotor'])
+def test_outline_builds_no_stages(component):
+    spec = dict(DEFAULT_SPEC, component=component)
+    outline = Pipeline(spec).graph.get('outline')
+    assert outline.signals == [] and not hasattr(outline, 'stages')
+
+    full = build_component(spec)
+    assert outline_json(outline, 'F.Mask') == outline_json(full, 'F.Mask')
+    assert holes_json(outline) == holes_json(full)
+
+
+def test_pipeline_matches_cli(capsys):
+    main(['--merge'])
+    expected = json.loads(capsys.readouterr().out)
+
+    document = Pipeline(dict(DEFAULT_SPEC, merge=True)).document()
+    assert json.loads(json.dumps(document)) == expected
+
+
+def test_merged_rotor_matches_cli(tmp_path, capsys):
+    path = tmp_path / 'rotor.toml'
+    path.write_text('component = "rotor"\nmerge = true\n')
+    main(['--spec', str(path)])
+    expected = json.loads(capsys.readouterr().out)
+
+    document = Pipeline(load_spec(str(path))).document()
+    assert json.loads(json.dumps(document)) == expected
+
+
+def test_watch_waits_for_missing_spec(tmp_path, monkeypatch):
+    path = tmp_path / 'spec.toml'
+    sleeps = []
+
+    def sleep(interval):
+        sleeps.append(interval)
+        path.write_text('component = "rotor"\n')
+    monkeypatch.setattr('geomgen.cli.time.sleep', sleep)
+
+    out = io.StringIO()
+    watch(str(path), stream=out, interval=0, revisions=1)
+    assert len(sleeps) == 1
+    assert json.loads(out.getvalue())['revision'] == 0
+
+
+def test_watch_survives_bad_values(tmp_path, monkeypatch):
+    path = tmp_path / 'spec.toml'
+    path.write_text('component = "rotor"\nbus_pitch = "wide"\n')
+
+    def sleep(interval):
+        path.write_text('component = "rotor"\nbus_pitch = 0.7\n')
+        os.utime(str(path), ns=(0, os.stat(str(path)).st_mtime_ns + 1000000))
+    monkeypatch.setattr('geomgen.cli.time.sleep', sleep)
+
+    out = io.StringIO()
+    watch(str(path), stream=out, interval=0, revisions=1)
+    error, event = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert error['revision'] == 0 and 'error' in error
+    assert event['revision'] == 0
+    assert len(event['changed']['holes']) == 6
+
+
+def test_watch(tmp_path):
+    path = tmp_path / 'spec.toml'
+    path.write_text('component = "rotor"\nbus_pitch = 0.7\n')
+
+    out = io.StringIO()
+    watch(str(path), stream=out, interval=0, revisions=1)
+    event = json.loads(out.getvalue())
+    assert event['revision'] == 0
+    assert len(event['changed']['holes']) == 6
+
+    path.write_text('component = "rotor"\nsize = 1\n')
+    with pytest.raises(ValueError):
+        load_spec(str(path))
@@ -0,0 +1,49 @@
+import math
+import random
+
+from geomgen.geometry import StatorComponent, RotorComponent
+from geomgen.gerber import point_in_polygon
+from geomgen.index import ComponentIndex
+
+
+def test_queries_match_brute_force():
+    for component in [StatorComponent(30, 61.4, 100), RotorComponent(30, 61.4, 100)]:
+        index = ComponentIndex(component)
+        electrodes = [(s.name, e, e.to_polygon()) for s in component.signals for e in s.electrodes]
+        vias = [(s.name, v) for s in component.signals for v in s.vias]
+
+        rng = random.Random(1)
+        hits = 0
+        for _ in range(300):
+            r = rng.uniform(30, 48)
+            theta = rng.uniform(0, 2 * math.pi)
+            x, y = r * math.cos(theta), r * math.sin(theta)
+
+            expected = [e for _, e, p in electrodes if point_in_polygon(x, y, p)]
+            found = index.electrode_at(x, y)
+            assert (found.item if found else None) in (expected or [None])
+            hits += bool(expected)
+
+            d, entry = index.nearest_via(x, y)
+            best = min(math.hypot(v.to_vertex()[0] - x, v.to_vertex()[1] - y) for _, v in vias)
+            assert abs(d - best) < 1e-9
+
+        assert hits > 50
+
+
+def test_ranges_and_connectivity():
+    component = StatorComponent(30, 61.4, 100)
+    index = ComponentIndex(component)
+
+    inside = index.in_range(350, 10)
+    assert inside
+    for e in inside:
+        assert e.angle >= 350 or e.angle <= 10
+    total = sum(len(s.electrodes) for s in component.signals)
+    assert len(index.in_range(0, 360)) == total
+
+    assert index.unconnected_vias() == []
+
+    stray = component.signals[0].vias[0]
+    stray.radius += 0.5
+    assert [e.item for e in ComponentIndex(component).unconnected_vias()] == [stray]
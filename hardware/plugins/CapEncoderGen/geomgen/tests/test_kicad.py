@@ -0,0 +1,71 @@
+import io
+
+from geomgen.geometry import StatorComponent
+from geomgen.kicad import read_board, diff_board
+
+BOARD = """(kicad_pcb (version 20211014) (generator pcbnew)
+  (net 0 "")
+  (net 1 "S+")
+  (footprint "MountingHole" (layer "F.Cu") (at 1 2)
+    (fp_text reference "H(1)" (at 0 0) (layer "F.SilkS"))
+  )
+  (segment (start 0 0) (end 1 0) (width 0.127) (layer "B.Cu") (net 1) (tstamp a))
+  (arc (start 0 0) (mid 1 1) (end 2 0) (width 0.127) (layer "B.Cu") (net 1) (tstamp b))
+  (via (at 3 4) (size 0.6) (drill 0.3) (layers "F.Cu" "B.Cu") (net 1) (tstamp c))
+  (zone (net 1) (net_name "S+") (layer "F.Cu") (tstamp d) (hatch edge 0.508)
+    (polygon (pts (xy 0 0) (xy 1 0) (xy 1 1)))
+    (filled_polygon (layer "F.Cu") (pts (xy 0 0) (xy 1 0) (xy 1 1)))
+  )
+)
+"""
+
+
+def board_text(component, skip_via=None):
+    nets = []
+    for s in component.signals:
+        if s.name not in nets:
+            nets.append(s.name)
+    code = dict((n, i + 1) for i, n in enumerate(nets))
+
+    lines = ["(kicad_pcb (version 20211014)\n"]
+    lines += ['  (net %d "%s")\n' % (code[n], n) for n in nets]
+    for s in component.signals:
+        avs = s.arc.to_polygon()
+        for a, b in zip(avs, avs[1:]):
+            lines.append('  (segment (start %.6f %.6f) (end %.6f %.6f) (width 0.127) (layer "B.Cu") (net %d))\n'
+                         % (a + b + (code[s.name],)))
+        for v in s.vias:
+            if v is skip_via:
+                continue
+            lines.append('  (via (at %.6f %.6f) (size 0.6) (drill 0.3) (layers "F.Cu" "B.Cu") (net %d))\n'
+                         % (v.to_vertex() + (code[s.name],)))
+        for e in s.electrodes:
+            pts = ' '.join('(xy %.6f %.6f)' % v for v in e.to_polygon())
+            lines.append('  (zone (net %d) (net_name "%s") (layer "F.Cu") (polygon (pts %s)))\n'
+                         % (code[s.name], s.name, pts))
+    lines.append(")\n")
+    return ''.join(lines)
+
+
+def test_read_board():
+    board = read_board(io.StringIO(BOARD))
+    assert board.nets == {0: '', 1: 'S+'}
+    assert [(s.start, s.end, s.layer, s.net) for s in board.segments] == [((0, 0), (1, 0), 'B.Cu', 1)]
+    assert board.arcs[0].mid == (1, 1)
+    assert board.vias[0].at == (3, 4) and board.vias[0].layers == ['F.Cu', 'B.Cu']
+    zone = board.zones[0]
+    assert zone.net_name == 'S+' and zone.layers == ['F.Cu']
+    assert zone.polygons == [[(0, 0), (1, 0), (1, 1)]]
+    assert list(zone.filled_polygons) == ['F.Cu']
+
+
+def test_diff_board():
+    component = StatorComponent(30, 61.4, 100)
+
+    diff = diff_board(read_board(io.StringIO(board_text(component))), component)
+    assert diff.up_to_date()
+
+    via = component.signals[3].vias[7]
+    diff = diff_board(read_board(io.StringIO(board_text(component, skip_via=via))), component)
+    assert not diff.up_to_date()
+    assert len(diff.missing['vias']) == 1 and diff.missing['vias'][0].startswith('C- via')
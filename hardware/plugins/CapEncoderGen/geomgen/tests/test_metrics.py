@@ -0,0 +1,59 @@
+import io
+import csv
+import json
+import math
+
+import pytest
+
+from geomgen.cli import main
+from geomgen.boolean import polygon_area
+from geomgen.geometry import StatorComponent, RotorComponent
+from geomgen.metrics import polygon_areas, arc_lengths, signal_metrics, COPPER_RESISTIVITY
+
+
+def test_formulas():
+    squares = [[(0, 0), (2, 0), (2, 2), (0, 2)], [(0, 0), (0, 3), (3, 3), (3, 0)]]
+    assert polygon_areas(squares).tolist() == [4, 9]
+    assert arc_lengths([10, 5], [45, 90], [135, 0]) == pytest.approx([5 * math.pi, 2.5 * math.pi])
+
+
+def test_stator_signals():
+    component = StatorComponent(30, 61.4, 100)
+    rows = signal_metrics(component)
+    assert [(r['stage'], r['net']) for r in rows] == [
+        (0, 'S+'), (0, 'C+'), (0, 'S-'), (0, 'C-'), (1, 'O+'), (1, 'O-'), (2, 'I+'), (2, 'I-')]
+
+    for r, s in zip(rows, component.signals):
+        assert r['area'] == pytest.approx(sum(polygon_area(e.to_polygon()) for e in s.electrodes))
+        assert r['arc_length'] == pytest.approx(s.arc.radius * math.radians(abs(s.arc.end_angle - s.arc.start_angle)))
+        assert r['vias'] == len(s.vias) == r['electrodes']
+        assert r['resistance'] == pytest.approx(COPPER_RESISTIVITY * r['arc_length'] / (0.127 * 0.035))
+
+    # Half the distance to the plane, twice the capacitance.
+    s = rows[0]
+    assert signal_metrics(component, plane_distance=0.8)[0]['capacitance'] == pytest.approx(2 * s['capacitance'])
+    assert 1 < s['capacitance'] < 100
+
+    assert len(signal_metrics(RotorComponent(30, 61.4, 100))) == 12
+
+
+def test_cli_metrics(tmp_path, capsys):
+    spec = tmp_path / 'spec.toml'
+    spec.write_text('bus_pitch = 1.0\n')
+
+    main(['--metrics', 'json'])
+    designs = json.loads(capsys.readouterr().out)
+    assert designs[0]['spec'] is None
+    assert len(designs[0]['signals']) == 8
+
+    main(['--metrics', 'csv', '--spec', str(spec), '--spec', str(spec)])
+    rows = list(csv.DictReader(io.StringIO(capsys.readouterr().out)))
+    assert len(rows) == 16
+    assert rows[0]['spec'] == str(spec) and rows[0]['net'] == 'S+'
+
+    # A wider bus pitch spreads the bus arcs further apart.
+    base = designs[0]['signals']
+    assert float(rows[0]['arc_length']) != pytest.approx(base[0]['arc_length'])
+
+    with pytest.raises(SystemExit):
+        main(['--spec', str(spec), '--spec', str(spec)])
@@ -0,0 +1,70 @@
+import numpy as np
+
+from geomgen.geometry import StatorComponent
+from geomgen.graph import build_component
+from geomgen.shapes import electrode_polygons
+from geomgen.optimize import Parameter, CMAES, Optimizer, to_spec, evaluate
+
+
+def test_parameter_values():
+    p = Parameter('periods', 18, 48, step=3)
+    assert p.value(p.unit(36)) == 36
+    assert p.value(p.unit(37.4)) == 36
+    assert p.value(-1) == 18 and p.value(2) == 48
+
+    q = Parameter('bus_pitch', 0.5, 1.5)
+    assert q.value(0.123456) == 0.6235
+
+
+def test_stock_spec():
+    optimizer = Optimizer()
+    values = optimizer.values(optimizer.start)
+    assert values == {
+        'stage_spacing': 0.5, 'bus_pitch': 0.75, 'rotor_inset': 2, 'width_fraction': 0.5, 'cutoff': 0.025, 'periods': 36
+    }
+
+    stock = StatorComponent(30, 61.4, 100)
+    built = build_component(to_spec(values))
+    for a, b in zip(stock.signals, built.signals):
+        assert a.name == b.name
+        assert np.allclose(electrode_polygons(a.electrodes), electrode_polygons(b.electrodes))
+
+
+def test_evaluate():
+    values = Optimizer().values(Optimizer().start)
+    stock = evaluate(to_spec(values))
+    assert stock.clearance >= 0.127 and stock.via_margin > 0
+    assert 0 < stock.utilization < 1
+
+    # Without the cutoff, neighbouring induction electrodes touch.
+    touching = evaluate(to_spec(dict(values, cutoff=0)))
+    assert touching.clearance == 0
+    assert touching.cost > stock.cost
+
+    assert evaluate(to_spec(dict(values, periods=20))).cost == float('inf')
+
+
+def test_cmaes_sphere():
+    es = CMAES([1.0, -2.0, 0.5], 0.5, seed=1)
+    for _ in range(120):
+        xs = es.ask()
+        es.tell(xs, [float(np.sum(x ** 2)) for x in xs])
+    assert np.linalg.norm(es.mean) < 1e-3
+
+
+def test_optimizer_memoizes_and_improves():
+    optimizer = Optimizer(parameters=[Parameter('periods', 18, 48, step=3)], processes=1)
+    values, result = optimizer.run(generations=4, seed=3)
+    assert len(optimizer.cache) <= 11
+    assert optimizer.hits > 0
+    assert values['periods'] % 3 == 0
+
+    start = optimizer.cache[(36,)]
+    assert result.cost <= start.cost
+
+
+def test_parallel_run():
+    optimizer = Optimizer(processes=2)
+    values, result = optimizer.run(generations=3, seed=0)
+    assert result.cost <= optimizer.cache[tuple(optimizer.values(optimizer.start).values())].cost
+    assert set(values) == {'stage_spacing', 'bus_pitch', 'rotor_inset', 'width_fraction', 'cutoff', 'periods'}
@@ -0,0 +1,89 @@
+import io
+import math
+
+import pytest
+
+from geomgen.panel import Panel, Placement, load_panel, main
+from geomgen.kicad import read_board
+
+PANEL = """
+width = 320
+height = 110
+
+[[instance]]
+name = "S1"
+at = [55, 55]
+
+[[instance]]
+name = "S2"
+at = [160, 55]
+rotation = 90
+
+[[instance]]
+name = "R1"
+component = "rotor"
+at = [265, 55]
+merge = true
+"""
+
+
+def test_instances_share_designs():
+    panel = Panel(320, 110)
+    a = panel.add(at=(55, 55))
+    b = panel.add(at=(160, 55), rotation=90)
+    c = panel.add({'component': 'rotor'}, at=(265, 55))
+
+    assert len(panel.designs) == 2
+    assert panel.document(a) is panel.document(b)
+    assert panel.document(c) is not panel.document(a)
+    assert [i.name for i in panel.instances] == ['S1', 'S2', 'R3']
+
+    with pytest.raises(ValueError):
+        panel.add(name='S1')
+    with pytest.raises(ValueError):
+        panel.add({'size': 3})
+
+
+def test_panel_board(tmp_path):
+    path = tmp_path / 'panel.toml'
+    path.write_text(PANEL)
+    panel = load_panel(str(path))
+
+    out = io.StringIO()
+    panel.write(out)
+    text = out.getvalue()
+    board = read_board(io.StringIO(text))
+
+    names = set(board.nets.values()) - {''}
+    assert 'S1/S+' in names and 'S2/S+' in names and 'R1/UO1' in names
+    assert len(names) == 8 + 8 + 4
+
+    stator = panel.document(panel.instances[0])
+    rotor = panel.document(panel.instances[2])
+    assert len(board.zones) == 2 * len(stator['zones']) + len(rotor['zones'])
+    assert len(board.vias) == 2 * len(stator['vias']) + len(rotor['vias'])
+
+    # Vias of the rotated copy are those of the design turned about its
+    # origin and moved into place.
+    placement = Placement((160, 55), 90)
+    key = lambda p: (round(p[0], 3), round(p[1], 3))
+    expected = sorted((placement(v['point']) for v in stator['vias']), key=key)
+    actual = sorted((v.at for v in board.vias if board.net_name(v.net).startswith('S2/')), key=key)
+    assert len(actual) == len(expected)
+    for a, b in zip(actual, expected):
+        assert a == pytest.approx(b, abs=1e-5)
+
+    # Panel frame plus every instance's own outline.
+    edge_lines = [l for l in text.splitlines() if l.strip().startswith('(gr_line') and '"Edge.Cuts"' in l]
+    stator_lines = [g for g in stator['graphics'] if g['shape'] == 'line' and g['layer'] == 'Edge.Cuts']
+    assert len(edge_lines) == 4 + 2 * len(stator_lines)
+
+    output = tmp_path / 'panel.kicad_pcb'
+    main([str(path), '-o', str(output)])
+    assert output.read_text() == text
+
+
+def test_placement():
+    p = Placement((10, 0), 90)
+    x, y = p((1, 0))
+    assert math.isclose(x, 10, abs_tol=1e-12) and math.isclose(y, 1)
@@ -0,0 +1,28 @@
+import numpy as np
+
+from geomgen.geometry import StatorComponent
+from geomgen.preview import rasterize, render_component, tile, encode_png
+
+
+def test_rasterize_square():
+    square = np.array([[2, 2], [8, 2], [8, 6], [2, 6]], dtype=float)
+    mask = rasterize([square], 10, 10)
+    assert mask.sum() == 24
+    assert mask[2:6, 2:8].all()
+
+
+def test_rasterize_overlap_is_union():
+    a = np.array([[0, 0], [4, 0], [4, 4], [0, 4]], dtype=float)
+    b = a + 2
+    mask = rasterize([a, b], 10, 10)
+    assert mask.sum() == 16 + 16 - 4
+
+
+def test_render_and_tile():
+    image = render_component(StatorComponent(30, 61.4, 100), size=128)
+    assert image.shape == (128, 128, 3)
+    assert image.any()
+
+    sheet = tile([image] * 3, columns=2, padding=2)
+    assert sheet.shape == (2 * 130 + 2, 2 * 130 + 2, 3)
+    assert encode_png(sheet).startswith(b'\x89PNG')
@@ -0,0 +1,70 @@
+import math
+
+import pytest
+
+from geomgen.geometry import AnnularSector, ExcitationElectrode, InductionElectrode, StatorComponent
+from geomgen.shapes import PROFILES, register_profile, resolve_shape, electrode_polygons, profile_polygons
+from geomgen.boolean import polygon_area
+
+
+def loop_induction(sector, cutoff):
+    # The per-point loop InductionElectrode used before profiles.
+    radius = (sector.inner_radius + sector.outer_radius) / 2
+    delta = (sector.outer_radius - sector.inner_radius) / 2
+    width = sector.end_angle - sector.start_angle
+    vertices = []
+    for f in [i / 11.0 for i in range(12)] + [1.0 - i / 11.0 for i in range(12)]:
+        fa = (1 - 2 * cutoff) * f + cutoff
+        upper = len(vertices) < 12
+        r = radius + (1 if upper else -1) * delta * math.sin(math.pi * fa)
+        theta = math.radians(sector.start_angle + fa * width)
+        vertices.append((r * math.cos(theta), r * math.sin(theta)))
+    return vertices
+
+
+def test_builtin_profiles_match_loops():
+    sector = AnnularSector(32, 38, 10, 30)
+    for a, b in zip(InductionElectrode(sector, 0.025).to_polygon(), loop_induction(sector, 0.025)):
+        assert a == pytest.approx(b, abs=1e-12)
+
+    evs = ExcitationElectrode(sector).to_polygon()
+    assert len(evs) == 6
+    assert polygon_area(evs) == pytest.approx(math.pi * (38 ** 2 - 32 ** 2) * 10 / 360, rel=1e-2)
+
+
+def test_batch_matches_single():
+    component = StatorComponent(30, 61.4, 100)
+    electrodes = [e for s in component.signals for e in s.electrodes]
+    batch = electrode_polygons(electrodes)
+    assert batch == [e.to_polygon() for e in electrodes]
+
+
+def test_harmonic_and_registry():
+    sector = AnnularSector(32, 38, 0, 20)
+    plain = profile_polygons('harmonic', {}, [sector])[0]
+    sinusoid = profile_polygons('sinusoidal', {}, [sector])[0]
+    assert polygon_area(plain) == pytest.approx(polygon_area(sinusoid), rel=0.02)
+
+    flattened = profile_polygons('harmonic', {'coefficients': [1.0, 0.15]}, [sector])[0]
+    assert polygon_area(flattened) > polygon_area(plain)
+
+    @register_profile('test_diamond', 3)
+    def diamond(n):
+        return [0, 0.5, 1], [0, 1, 0]
+
+    try:
+        assert resolve_shape('test_diamond', ('sinusoidal', {'cutoff': 0.025})) == ('test_diamond', {})
+        assert resolve_shape({'cutoff': 0.1}, ('sinusoidal', {'cutoff': 0.025})) == ('sinusoidal', {'cutoff': 0.1})
+        with pytest.raises(ValueError):
+            resolve_shape({'profile': 'test_diamond', 'cutoff': 0.1}, ('sinusoidal', {}))
+    finally:
+        del PROFILES['test_diamond']
+
+
+def test_stage_shapes_from_spec():
+    shapes = {'1': {'output': {'profile': 'harmonic', 'coefficients': [1.0, 0.0, -0.1]}}}
+    component = StatorComponent(30, 61.4, 100, shapes=shapes)
+    by_name = {s.name: s for s in component.signals}
+    assert by_name['O+'].electrodes[0].profile == 'harmonic'
+    assert by_name['I+'].electrodes[0].profile == 'sinusoidal'
+    assert by_name['S+'].electrodes[0].profile == 'trapezoidal'
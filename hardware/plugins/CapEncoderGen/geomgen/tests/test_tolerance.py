@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from geomgen.boolean import polygon_area
+from geomgen.geometry import StatorComponent, RotorComponent
+from geomgen.tolerance import (
+    Tolerances, ChannelModel, electrode_coefficients, sample, monte_carlo, summarize)
+
+
+def test_square_coefficients():
+    # Growing a 2x2 square centred on (1, 3) by b gives (2 + 2b)^2.
+    square = [(0, 2), (2, 2), (2, 4), (0, 4)]
+    area, mx, my = electrode_coefficients(square)
+    assert area == pytest.approx([4, 8, 4, 0], abs=1e-9)
+    assert mx == pytest.approx(area * 1, abs=1e-9)
+    assert my == pytest.approx(area * 3, abs=1e-9)
+
+    # Clockwise input, same result.
+    assert electrode_coefficients(square[::-1]) == pytest.approx(np.stack([area, mx, my]), abs=1e-9)
+
+
+def test_nominal_channels():
+    component = StatorComponent(30, 61.4, 100)
+    model = ChannelModel(component)
+    assert model.groups == [['S+', 'C+', 'S-', 'C-'], ['O+', 'O-'], ['I+', 'I-']]
+
+    area, centroid = model.nominal()
+    for (stage, name), a in zip(model.channels, area):
+        s = next(s for s in component.signals if s.name == name)
+        assert a == pytest.approx(sum(polygon_area(e.to_polygon()) for e in s.electrodes), rel=1e-9)
+    assert np.abs(centroid).max() < 1e-6
+
+    rotor = ChannelModel(RotorComponent(30, 61.4, 100))
+    assert len(rotor.channels) == 12
+
+
+def test_perfect_boards():
+    model = ChannelModel(StatorComponent(30, 61.4, 100))
+    none = Tolerances(0, 0, 0, 0, 0, 0)
+    areas, centroids = sample(model, none, 5, seed=1)
+    area, centroid = model.nominal()
+    assert areas == pytest.approx(np.tile(area, (5, 1)))
+    assert np.abs(centroids - centroid).max() < 1e-12
+
+
+def test_spread():
+    model = ChannelModel(StatorComponent(30, 61.4, 100))
+
+    # A bias shared by every electrode keeps channels of a stage matched.
+    shared = Tolerances(etch_bias=0.02, etch_sigma=0.01, etch_local=0, registration=0, eccentricity=0, hole_position=0)
+    areas, centroids = monte_carlo(model, shared, 2000, processes=1)
+    report = summarize(model, shared, areas, centroids)
+    for group in report['groups']:
+        assert group['mismatch_std'] < 1e-9
+        for c in group['channels'].values():
+            assert c['area_mean'] > c['area']
+
+    # Offsets of the layer move every centroid with them.
+    offset = Tolerances(0, 0, 0, registration=0.03, eccentricity=0.04, hole_position=0)
+    areas, centroids = monte_carlo(model, offset, 20000, processes=1)
+    report = summarize(model, offset, areas, centroids)
+    s = report['groups'][0]['channels']['S+']
+    assert s['centroid_std'] == pytest.approx([0.05, 0.05], rel=0.05)
+    assert s['area_std'] < 1e-9
+
+
+def test_processes_do_not_change_results():
+    model = ChannelModel(StatorComponent(30, 61.4, 100))
+    a = monte_carlo(model, Tolerances(), 3000, seed=7, processes=1, chunk_size=1000)
+    b = monte_carlo(model, Tolerances(), 3000, seed=7, processes=2, chunk_size=1000)
+    assert np.allclose(a[0], b[0], rtol=1e-12) and np.allclose(a[1], b[1], rtol=1e-12, atol=1e-12)
+
+    report = summarize(model, Tolerances(), *a)
+    assert report['samples'] == 3000
+    assert all(g['mismatch_max'] > 0 for g in report['groups'])